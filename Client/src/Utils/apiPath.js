@@ -7,6 +7,7 @@ export const API_PATH = {
     },
     USER:{
         ALL:'/api/auth/users/',
+        SEARCH:'/api/auth/users/search/',
         UPDATE:(id)=>`/api/auth/users/${id}/update/`,
         DELETE:(id)=>`/api/auth/users/${id}/delete/`,
         CREATE:'/api/auth/users/create/',
@@ -21,5 +22,14 @@ export const API_PATH = {
         HISTORY:'/api/tasks/history/',
         COMMENTS:'/api/tasks/comments/',
         TASK_COMMENTS:(id) => `/api/tasks/${id}/comments/`
-    }
+    },
+    RECURRING:{
+        ALL:'/api/tasks/recurring/',
+        DETAIL:(id) => `/api/tasks/recurring/${id}/`,
+        OCCURRENCES:'/api/tasks/recurring/occurrences/'
+    },
+    CALENDAR:{
+        SUBSCRIPTION:'/api/calendar/'
+    },
+    ANALYTICS:'/api/analytics/'
 }
\ No newline at end of file
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Django runs each request's sync code on a new thread here, so a persistent
+# (per-thread) connection would be left open behind every request. PostgreSQL
+# reuses connections through the psycopg pool instead; SQLite just opens the file.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
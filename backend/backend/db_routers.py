@@ -0,0 +1,155 @@
+"""
+Database routing for the optional read replica.
+
+Views decorated with ``use_replica`` read from the ``replica`` alias when it is
+configured. Writes always go to ``default``. After a user's write request they
+are pinned to ``default`` for REPLICA_STICKY_SECONDS so they read their own writes.
+The pins live in the "responses" cache, which the workers share (see CACHES).
+"""
+
+import asyncio
+import functools
+import os
+from contextvars import ContextVar
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = 'replica'
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def replica_available():
+    if REPLICA_DB_ALIAS not in connections.databases:
+        return False
+    # A SQLite snapshot only exists once refresh_replica has run
+    replica = connections[REPLICA_DB_ALIAS]
+    if replica.vendor == 'sqlite' and not replica.is_in_memory_db():
+        return os.path.exists(replica.settings_dict['NAME'])
+    return True
+
+
+def reading_from_replica():
+    """Whether this request's reads go to the replica"""
+    return _read_from_replica.get()
+
+
+def _pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def _pin_cache():
+    # The next request may reach any worker, so not the per-process default cache
+    return caches['responses']
+
+
+def pin_to_primary(user):
+    """Send this user's reads to the primary for the next few seconds"""
+    _pin_cache().set(_pin_key(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+
+
+async def apin_to_primary(user):
+    await _pin_cache().aset(_pin_key(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user):
+    return bool(_pin_cache().get(_pin_key(user.pk)))
+
+
+async def ais_pinned(user):
+    return bool(await _pin_cache().aget(_pin_key(user.pk)))
+
+
+def use_replica(view_func):
+    """Run a read-only view against the replica unless the user just wrote.
+    
+    Place it below @api_view/@permission_classes so request.user is the API user.
+    Works for sync and async views; the flag follows the view into sync_to_async.
+    """
+    if asyncio.iscoroutinefunction(view_func):
+        @functools.wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            user = request.user
+            if not replica_available() or (user.is_authenticated and await ais_pinned(user)):
+                return await view_func(request, *args, **kwargs)
+            
+            token = _read_from_replica.set(True)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _read_from_replica.reset(token)
+        return async_wrapper
+    
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        user = request.user
+        if not replica_available() or (user.is_authenticated and is_pinned(user)):
+            return view_func(request, *args, **kwargs)
+        
+        token = _read_from_replica.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _read_from_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Route reads inside use_replica views to the replica, everything else to default"""
+    
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get():
+            return REPLICA_DB_ALIAS
+        return None
+    
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+    
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DB_ALIAS:
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Pin users to the primary after a successful write request"""
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def _should_pin(self, request, response):
+        if request.method in ('GET', 'HEAD', 'OPTIONS') or response.status_code >= 400:
+            return None
+        # DRF sets request.user on the underlying request once it authenticates
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and replica_available():
+            return user
+        return None
+    
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user = self._should_pin(request, response)
+        if user is not None:
+            pin_to_primary(user)
+        return response
+    
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        user = self._should_pin(request, response)
+        if user is not None:
+            await apin_to_primary(user)
+        return response
@@ -0,0 +1,112 @@
+"""
+Dirty-field tracking for models.
+
+DirtyFieldsMixin remembers the column values an instance was loaded (or last
+saved) with. save() on an existing row then writes only the columns that
+changed, plus auto_now timestamps (a model without any skips the UPDATE
+when nothing changed), and get_changes() gives the
+{'field': {'old': ..., 'new': ...}} dict that goes into task history.
+"""
+
+import copy
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+
+def _display(value):
+    """History-friendly value: JSON scalars as they are, everything else as str()"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class DirtyFieldsMixin:
+    """Put before models.Model (or another model base) in the class bases"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._snapshot_fields()
+
+    def _snapshot_fields(self, fields=None):
+        """Remember the current value of the loaded (non-deferred) columns"""
+        if fields is None:
+            self._loaded_values = {}
+            fields = self._meta.concrete_fields
+        for field in fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            value = self.__dict__[field.attname]
+            # JSON values can be changed in place
+            self._loaded_values[field.attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def get_dirty_fields(self):
+        """{attname: loaded value} for every column changed since loading or saving"""
+        dirty = {}
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if field.attname not in self._loaded_values:
+                # Was deferred, then assigned
+                dirty[field.attname] = None
+                continue
+            old = self._loaded_values[field.attname]
+            new = self.__dict__[field.attname]
+            if new is old:
+                continue
+            # Views assign raw request values, e.g. ISO strings for dates
+            if self._normalized(field) != old:
+                dirty[field.attname] = old
+        return dirty
+
+    def _normalized(self, field):
+        """The current value of ``field`` as the column would store it"""
+        value = self.__dict__[field.attname]
+        try:
+            value = field.to_python(value)
+        except ValidationError:
+            return value
+        if settings.USE_TZ and isinstance(value, datetime.datetime) and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+    def get_changes(self, fields=None):
+        """{'field': {'old': ..., 'new': ...}} for the changed columns (limited to ``fields``)"""
+        return {
+            name: {'old': _display(old), 'new': _display(self._normalized(self._meta.get_field(name)))}
+            for name, old in self.get_dirty_fields().items()
+            if fields is None or name in fields
+        }
+
+    def save(self, *args, **kwargs):
+        if (kwargs.get('update_fields') is None and not args and not self._state.adding
+                and self.pk is not None and not kwargs.get('force_insert')):
+            update_fields = list(self.get_dirty_fields())
+            # auto_now timestamps move on every save, changes or not
+            update_fields.extend(
+                field.name for field in self._meta.concrete_fields
+                if getattr(field, 'auto_now', False) and field.attname not in update_fields
+            )
+            # Nothing to write at all: the UPDATE (and the save signals) are skipped
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self._snapshot_fields()
+        else:
+            self._snapshot_fields([self._meta.get_field(name) for name in update_fields])
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Also how deferred fields load: only the reloaded columns get a new
+        # snapshot, so unsaved changes to the others stay dirty
+        deferred = self.get_deferred_fields()
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None:
+            self._snapshot_fields([field for field in self._meta.concrete_fields if field.attname not in deferred])
+        else:
+            fields = set(fields)
+            self._snapshot_fields([
+                field for field in self._meta.concrete_fields if field.name in fields or field.attname in fields
+            ])
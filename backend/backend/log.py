@@ -0,0 +1,81 @@
+"""
+Logging plumbing used by settings.LOGGING.
+
+- QueueListenerHandler puts records on an in-memory queue; a background thread
+  formats and writes them, so request threads never wait on log I/O.
+- JSONFormatter renders one JSON object per line. Keyword data passed with
+  ``extra={...}`` becomes top-level fields, so hot paths log
+  ``logger.info('task updated', extra={'task_id': task.id})`` instead of
+  formatting f-strings.
+- SamplingFilter keeps a fraction of INFO/DEBUG records per logger
+  (LOG_SAMPLING="task.views=0.1"); warnings and errors are always kept.
+"""
+
+import atexit
+import json
+import logging
+import random
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+# Attributes every LogRecord has; anything else on a record came from ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of the INFO/DEBUG records of each configured logger (and its children).
+
+    ``rates`` is "logger=rate,..." as in LOG_SAMPLING, e.g. "task.views=0.1".
+    """
+
+    def __init__(self, rates=''):
+        super().__init__()
+        parsed = {}
+        for item in filter(None, (part.strip() for part in rates.split(','))):
+            name, _, rate = item.partition('=')
+            parsed[name.strip()] = float(rate)
+        # Longest prefix first so "task.views" wins over "task"
+        self.rates = sorted(parsed.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + '.'):
+                return random.random() < rate
+        return True
+
+
+class QueueListenerHandler(QueueHandler):
+    """QueueHandler that owns a QueueListener writing to ``handlers`` on a background thread.
+
+    In LOGGING, reference the target handlers as ``cfg://handlers.<name>``.
+    """
+
+    def __init__(self, handlers, respect_handler_level=True):
+        super().__init__(SimpleQueue())
+        self.listener = QueueListener(
+            self.queue, *[handlers[i] for i in range(len(handlers))],
+            respect_handler_level=respect_handler_level,
+        )
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # The queue never leaves the process, so skip QueueHandler's eager
+        # formatting; the listener thread formats the record instead.
+        return record
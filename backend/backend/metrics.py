@@ -0,0 +1,86 @@
+"""
+Prometheus metrics, exposed at /metrics.
+
+Under gunicorn every worker keeps its own counters, so set PROMETHEUS_MULTIPROC_DIR
+(an empty, writable directory shared by the workers and by management commands run
+in the same container) before the processes start. prometheus_client then keeps the
+values in files there and /metrics aggregates them across processes. Without it the
+metrics are per process, which is fine for runserver.
+"""
+
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+REQUEST_LATENCY = Histogram(
+    'task_schedule_http_request_duration_seconds',
+    'API request latency',
+    ['view', 'method', 'status'],
+)
+DB_QUERIES = Counter(
+    'task_schedule_db_queries_total',
+    'Database queries run while serving requests',
+    ['view'],
+)
+NOTIFICATIONS = Counter(
+    'task_schedule_notifications_total',
+    'Notification emails sent, by type (assignment, status, reminder, overdue, test)',
+    ['type'],
+)
+SMTP_LATENCY = Histogram(
+    'task_schedule_smtp_send_duration_seconds',
+    'Time to hand a message to the mail server',
+    ['type'],
+)
+SMTP_FAILURES = Counter(
+    'task_schedule_smtp_send_failures_total',
+    'Notification emails the mail server did not accept',
+    ['type'],
+)
+SCHEDULER_RUN_DURATION = Gauge(
+    'task_schedule_notification_run_duration_seconds',
+    'Duration of the last send_task_notifications run',
+    multiprocess_mode='mostrecent',
+)
+SCHEDULER_LAST_SUCCESS = Gauge(
+    'task_schedule_notification_last_success_timestamp_seconds',
+    'Unix time the last send_task_notifications run finished',
+    multiprocess_mode='mostrecent',
+)
+THROTTLED_REQUESTS = Counter(
+    'task_schedule_throttled_requests_total',
+    'Requests rejected by a rate limit, by throttle scope and role',
+    ['scope', 'role'],
+)
+THROTTLE_CACHE_ERRORS = Counter(
+    'task_schedule_throttle_cache_errors_total',
+    'Throttle cache operations that failed and fell back to the per-process cache',
+)
+REMINDER_LAG = Histogram(
+    'task_schedule_reminder_lag_seconds',
+    'Delay between a reminder time and the reminder being sent',
+    ['reminder'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+
+
+def metrics_view(request):
+    """Prometheus exposition endpoint; requires METRICS_TOKEN as a bearer token when set"""
+    token = settings.METRICS_TOKEN
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied, token):
+            return HttpResponseForbidden()
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
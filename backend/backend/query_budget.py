@@ -0,0 +1,141 @@
+"""
+Per-view query budgets.
+
+Views declare the most queries a request may run with ``query_budget``. In
+development QueryBudgetMiddleware counts the queries of every request and, when a
+view goes over its budget, logs (QUERY_BUDGET_MODE=warn) or raises
+(QUERY_BUDGET_MODE=raise) with each query and where in our code it was issued.
+``manage.py check_query_budgets`` runs every endpoint at two data sizes to prove
+the counts do not grow with rows.
+"""
+
+import asyncio
+import logging
+import traceback
+from contextvars import ContextVar
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# "module.view_name" -> max queries per request
+QUERY_BUDGETS = {}
+
+_tracker = ContextVar('query_budget_tracker', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of queries a request to this view may run.
+
+    Apply it outermost (above @api_view / @csrf_exempt).
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        QUERY_BUDGETS[f'{view.__module__}.{view_name(view)}'] = max_queries
+        return view
+    return decorator
+
+
+def view_name(view):
+    # @api_view returns a generic "view" function; the wrapped class carries the real name
+    return getattr(getattr(view, 'cls', None), '__name__', None) or getattr(view, '__name__', repr(view))
+
+
+def get_query_budget(view):
+    return getattr(view, 'query_budget', None)
+
+
+def _project_stack():
+    """Frames from our own code that led to the current query"""
+    base_dir = str(settings.BASE_DIR)
+    return [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+        and frame.filename not in (__file__, str(settings.BASE_DIR / 'manage.py'))
+    ]
+
+
+def _record_query(execute, sql, params, many, context):
+    tracker = _tracker.get()
+    if tracker is not None:
+        tracker.append((sql, _project_stack()))
+    return execute(sql, params, many, context)
+
+
+def _install_wrapper(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def format_queries(queries):
+    lines = []
+    for number, (sql, stack) in enumerate(queries, 1):
+        lines.append(f'{number}. {sql if len(sql) <= 500 else sql[:500] + "..."}')
+        lines.extend(f'     {frame.filename}:{frame.lineno} in {frame.name}' for frame in stack[-4:])
+    return '\n'.join(lines)
+
+
+class QueryBudgetMiddleware:
+    """Enforce query budgets in development (QUERY_BUDGET_MODE = warn | raise)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.mode = settings.QUERY_BUDGET_MODE
+        if self.mode not in ('warn', 'raise'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+        connection_created.connect(_install_wrapper)
+        for connection in connections.all(initialized_only=True):
+            _install_wrapper(connection)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = get_query_budget(view_func)
+        request._query_budget_view = view_name(view_func)
+
+    def _check(self, request, queries):
+        budget = getattr(request, '_query_budget', None)
+        if budget is None or len(queries) <= budget:
+            return
+        message = (
+            f'{request.method} {request.path} ({request._query_budget_view}) ran '
+            f'{len(queries)} queries, budget is {budget}:\n{format_queries(queries)}'
+        )
+        if self.mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = []
+        token = _tracker.set(queries)
+        try:
+            response = self.get_response(request)
+        finally:
+            _tracker.reset(token)
+        self._check(request, queries)
+        return response
+
+    async def __acall__(self, request):
+        queries = []
+        token = _tracker.set(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _tracker.reset(token)
+        self._check(request, queries)
+        return response
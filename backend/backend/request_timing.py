@@ -0,0 +1,154 @@
+"""
+Per-request timing.
+
+RequestTimingMiddleware measures total, DB (time and query count), serializer and
+email time for each request and reports them in a ``Server-Timing`` header, which
+browser devtools show under the request's Timing tab. Requests slower than
+SLOW_REQUEST_MS are written to the ``slow_requests`` log (logs/slow_requests.log)
+with the view, role and the most expensive queries. Latency and query counts
+also feed the /metrics histograms (backend/metrics.py).
+
+Code that wants its own phase in the header wraps it in ``timed('name')``.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import DB_QUERIES, REQUEST_LATENCY
+from .query_budget import view_name
+
+slow_logger = logging.getLogger('slow_requests')
+
+_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)  # phase -> seconds
+        self.queries = []  # (sql, seconds)
+
+    @property
+    def db_time(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def top_queries(self, limit=5):
+        """Queries grouped by SQL text, most total time first: [(sql, count, seconds)]"""
+        grouped = defaultdict(lambda: [0, 0.0])
+        for sql, seconds in self.queries:
+            grouped[sql][0] += 1
+            grouped[sql][1] += seconds
+        ranked = sorted(grouped.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sql, count, seconds) for sql, (count, seconds) in ranked[:limit]]
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to the current request's ``phase``"""
+    timings = _timings.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.phases[phase] += time.perf_counter() - started
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries.append((sql, time.perf_counter() - started))
+
+
+def _install_wrapper(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class RequestTimingMiddleware:
+    """Server-Timing header, slow-request log and request metrics"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+        connection_created.connect(_install_wrapper)
+        for connection in connections.all(initialized_only=True):
+            _install_wrapper(connection)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._timing_view = view_name(view_func)
+
+    def _finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+
+        # Unresolved URLs share one label so scanners can't blow up the series count
+        view = getattr(request, '_timing_view', None) or 'unresolved'
+        REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(total)
+        DB_QUERIES.labels(view).inc(len(timings.queries))
+
+        if settings.SERVER_TIMING_HEADER:
+            metrics = [
+                f'total;dur={total * 1000:.1f}',
+                f'db;dur={timings.db_time * 1000:.1f};desc="{len(timings.queries)} queries"',
+            ]
+            metrics.extend(f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in timings.phases.items())
+            response['Server-Timing'] = ', '.join(metrics)
+            # Cross-origin pages (the frontend) only see the timings when allowed explicitly
+            if response.has_header('Access-Control-Allow-Origin'):
+                response['Timing-Allow-Origin'] = response['Access-Control-Allow-Origin']
+
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            user = getattr(request, 'user', None)
+            role = getattr(user, 'role', None) if user is not None and user.is_authenticated else 'anonymous'
+            phases = ' '.join(f'{phase}={seconds * 1000:.1f}ms' for phase, seconds in timings.phases.items())
+            lines = [
+                f'{request.method} {request.get_full_path()} {response.status_code} '
+                f'{total * 1000:.1f}ms view={view} role={role} '
+                f'queries={len(timings.queries)} db={timings.db_time * 1000:.1f}ms {phases}'.rstrip()
+            ]
+            lines.extend(
+                f'    {count}x {seconds * 1000:.1f}ms {sql[:300]}'
+                for sql, count, seconds in timings.top_queries()
+            )
+            slow_logger.warning('\n'.join(lines))
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        self._finish(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        self._finish(request, response, timings)
+        return response
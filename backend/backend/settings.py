@@ -34,12 +34,14 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True').lower() == 'true'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')  # Gmail App Password from .env file
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
+# Concurrent SMTP sends from async views (per worker process)
+EMAIL_SEND_THREADS = int(os.getenv('EMAIL_SEND_THREADS', '20'))
 
 # Frontend URL for email links
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
@@ -64,7 +66,7 @@ INSTALLED_APPS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'staff.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -72,9 +74,29 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
+    # Reverse proxies in front of the backend whose X-Forwarded-For is trusted for
+    # the client IP of throttled anonymous requests (1 behind the bundled nginx,
+    # if port 8000 isn't reachable directly)
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
 }
 
+# Rate limits of expensive endpoints (backend/throttling.py): "requests/period"
+# (period s, m, h or d) per scope, optionally per role as "<scope>:<role>".
+# THROTTLE_RATES in the environment overrides entries, e.g.
+# "task_list:faculty=30/m,report=5/m"; a rate of "none" lifts the limit.
+THROTTLE_RATES = {
+    'login': '10/m',
+    'task_list': '60/m',
+    'report': '6/m',
+    'test_email': '5/h',
+}
+for _item in filter(None, os.getenv('THROTTLE_RATES', '').split(',')):
+    _scope, _, _rate = _item.partition('=')
+    THROTTLE_RATES[_scope.strip()] = None if _rate.strip().lower() == 'none' else _rate.strip()
+
 MIDDLEWARE = [
+    'backend.request_timing.RequestTimingMiddleware',  # Server-Timing, slow-request log, /metrics
+    'backend.query_budget.QueryBudgetMiddleware',  # Development only, see QUERY_BUDGET_MODE
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Added for static file serving
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -84,6 +106,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.db_routers.ReplicaPinMiddleware',
 ]
 
 from datetime import timedelta
@@ -95,6 +118,17 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# How long a worker trusts its cached copy of a user's token version.
+# Role changes made through another worker take effect within this window.
+JWT_TOKEN_VERSION_CACHE_SECONDS = int(os.getenv('JWT_TOKEN_VERSION_CACHE_SECONDS', '30'))
+
+# Longest a worker may serve a stale user directory (staff/directory.py) when the
+# cache is per process; with a shared cache user changes show up immediately
+USER_DIRECTORY_TTL = int(os.getenv('USER_DIRECTORY_TTL', '60'))
+
+# Processes hashing passwords during bulk user imports (staff/password_hashing.py)
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+
 # Custom User Model
 AUTH_USER_MODEL = 'staff.User'
 
@@ -160,13 +194,133 @@ import os
 data_dir = os.path.join(BASE_DIR, 'data')
 os.makedirs(data_dir, exist_ok=True)
 
-DATABASES = {
-    'default': {
+# SQLite tuning applied to every new connection. WAL lets readers run
+# alongside the single writer, and busy_timeout makes gunicorn workers wait
+# for the write lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'auto_vacuum': 'INCREMENTAL',  # must come first; only applies to new databases or after VACUUM
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024))),
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-20000')),  # negative = KiB
+    'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
+# DB_ENGINE=postgres switches to PostgreSQL so several backend containers
+# can share one database; SQLite stays the default for single-host setups.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite').lower()
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'task_schedule'),
+            'USER': os.getenv('POSTGRES_USER', 'task_schedule'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            # Connections come from the psycopg pool, which requires CONN_MAX_AGE=0
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('POSTGRES_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.getenv('POSTGRES_POOL_MAX_SIZE', '10')),
+                    'timeout': int(os.getenv('POSTGRES_POOL_TIMEOUT', '10')),
+                },
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(data_dir, 'db.sqlite3'),
+            # Keep connections open across requests instead of reconnecting each time
+            # (WSGI threads; backend/asgi.py turns this off under ASGI)
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ''.join(
+                    f'PRAGMA {name}={value};' for name, value in SQLITE_PRAGMAS.items()
+                ),
+                # Take the write lock at BEGIN so busy_timeout applies, rather than
+                # failing when a read transaction tries to upgrade to a write
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# Optional read replica for the report and list views (see backend/db_routers.py)
+if DB_ENGINE in ('postgres', 'postgresql') and os.getenv('POSTGRES_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('POSTGRES_REPLICA_HOST'),
+        'PORT': os.getenv('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif DB_ENGINE == 'sqlite' and os.getenv('SQLITE_REPLICA', 'False').lower() == 'true':
+    # Snapshot copy refreshed by `manage.py refresh_replica --interval N`.
+    # No persistent connections, so each request opens the latest snapshot.
+    DATABASES['replica'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(data_dir, 'db.sqlite3'),
+        'NAME': os.path.join(data_dir, 'db_replica.sqlite3'),
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {'init_command': 'PRAGMA query_only=1;'},
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['backend.db_routers.ReplicaRouter']
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',  # needs the redis package
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',  # needs pymemcache
 }
 
+# The "throttle" cache keeps the rate limit counters, which all gunicorn workers
+# must share: THROTTLE_CACHE_BACKEND=file (default; a directory on this host),
+# redis or memcached (THROTTLE_CACHE_LOCATION, e.g. redis://redis:6379/1), or
+# locmem (per process).
+THROTTLE_CACHE_BACKEND = os.getenv('THROTTLE_CACHE_BACKEND', 'file')
+# The "responses" cache keeps cached task lists, dashboards and calendar feeds
+# with the scope versions that invalidate them (task/cache_versions.py), and the
+# read replica pins of users who just wrote (backend/db_routers.py); same
+# choices via RESPONSE_CACHE_BACKEND / RESPONSE_CACHE_LOCATION. With locmem each
+# worker builds its own copy and may serve it for up to RESPONSE_CACHE_TTL after
+# a change made through another worker.
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'file')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS['locmem'],
+    },
+    'throttle': {
+        'BACKEND': CACHE_BACKENDS[THROTTLE_CACHE_BACKEND],
+        'LOCATION': os.getenv('THROTTLE_CACHE_LOCATION', os.path.join(data_dir, 'cache', 'throttle')),
+        'KEY_PREFIX': 'task_schedule',
+        # Culling would drop live counters; entries expire with their rate period
+        'OPTIONS': {'MAX_ENTRIES': 10000} if THROTTLE_CACHE_BACKEND in ('file', 'locmem') else {},
+    },
+    'responses': {
+        'BACKEND': CACHE_BACKENDS[RESPONSE_CACHE_BACKEND],
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', os.path.join(data_dir, 'cache', 'responses')),
+        'KEY_PREFIX': 'task_schedule',
+        'OPTIONS': {'MAX_ENTRIES': 5000} if RESPONSE_CACHE_BACKEND in ('file', 'locmem') else {},
+    },
+}
+
+# Seconds a user keeps reading from the primary after a write
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '5'))
+
+# Rows fetched per round trip by the report/export iterators
+# (server-side cursors on PostgreSQL)
+DB_ITERATOR_CHUNK_SIZE = int(os.getenv('DB_ITERATOR_CHUNK_SIZE', '500'))
+
+# What to do when a view runs more queries than its @query_budget:
+# 'warn' (log), 'raise' (error response) or 'off'. Only enforced in DEBUG.
+QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'warn') if DEBUG else 'off'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -214,7 +368,125 @@ WHITENOISE_MAX_AGE = 31536000  # 1 year in seconds
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads stream to disk in chunks while being hashed, and task attachments are
+# stored once per content (task/upload_handlers.py, task/storage.py). The temp dir
+# sits inside MEDIA_ROOT so filing an upload is a rename, not a copy.
+FILE_UPLOAD_HANDLERS = ['task.upload_handlers.HashingFileUploadHandler']
+FILE_UPLOAD_TEMP_DIR = os.path.join(MEDIA_ROOT, 'tmp')
+os.makedirs(FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+
+# Behind nginx, let it send attachment downloads from an internal location mapped
+# to MEDIA_ROOT (task/downloads.py); empty streams them from Django
+ATTACHMENT_ACCEL_REDIRECT = os.getenv('ATTACHMENT_ACCEL_REDIRECT', '')
+
+# manage.py snapshot: where database/media backups go and how many to keep
+BACKUP_DIR = os.getenv('BACKUP_DIR', os.path.join(BASE_DIR, 'backups'))
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '7'))
+
+# WebP thumbnails of image/PDF attachments (task/thumbnails.py): longest side in
+# pixels, and background render processes per server process
+THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', '256'))
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', '1'))
+
+# Recurring task templates (task/recurring.py): occurrences due within this many
+# days exist as tasks; later ones are only computed for calendars
+RECURRING_TASK_HORIZON_DAYS = int(os.getenv('RECURRING_TASK_HORIZON_DAYS', '14'))
+
+# iCalendar feeds (task/ical.py): seconds a generated feed is reused (and other
+# workers may lag behind a change), and how many days of past tasks it includes
+CALENDAR_FEED_TTL = int(os.getenv('CALENDAR_FEED_TTL', '300'))
+CALENDAR_FEED_PAST_DAYS = int(os.getenv('CALENDAR_FEED_PAST_DAYS', '90'))
+
+# Task analytics (task/analytics.py): days up to today that each
+# rollup_task_analytics run recomputes
+ANALYTICS_ROLLUP_DAYS = int(os.getenv('ANALYTICS_ROLLUP_DAYS', '7'))
+
+# Task list and dashboard response cache (task/response_cache.py): seconds an
+# entry is served without checking the database, and how long other requests
+# wait for the one rebuilding a missing or outdated entry before building it
+# themselves (keep it short, the wait holds a thread)
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '60'))
+RESPONSE_CACHE_LOCK_WAIT = float(os.getenv('RESPONSE_CACHE_LOCK_WAIT', '0.5'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+# Request timing (backend/request_timing.py)
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'True').lower() == 'true'
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', '1000'))
+
+# Bearer token required to scrape /metrics (backend/metrics.py); open when empty
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+log_dir = os.path.join(BASE_DIR, 'logs')
+os.makedirs(log_dir, exist_ok=True)
+
+# Application logs are JSON lines written by a background thread (backend/log.py).
+# LOG_SAMPLING keeps a fraction of INFO/DEBUG records per logger, e.g. "task.views=0.1".
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'backend.log.JSONFormatter',
+        },
+        'timestamped': {
+            'format': '{asctime} {message}',
+            'style': '{',
+        },
+    },
+    'filters': {
+        'sampling': {
+            '()': 'backend.log.SamplingFilter',
+            'rates': os.getenv('LOG_SAMPLING', ''),
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
+        'queue': {
+            '()': 'backend.log.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console'],
+            'filters': ['sampling'],
+        },
+        'slow_requests_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(log_dir, 'slow_requests.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'timestamped',
+        },
+        'slow_requests_queue': {
+            '()': 'backend.log.QueueListenerHandler',
+            'handlers': ['cfg://handlers.slow_requests_file'],
+        },
+    },
+    'loggers': {
+        'backend': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'staff': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'task': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'slow_requests': {
+            'handlers': ['slow_requests_queue'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
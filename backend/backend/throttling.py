@@ -0,0 +1,113 @@
+"""
+Rate limits for expensive endpoints.
+
+Each limited view names a scope (see the throttle classes below); its rate comes
+from THROTTLE_RATES, where "<scope>:<role>" overrides "<scope>" for users of
+that role. Requests are counted per user, or per client IP before login.
+
+The counters live in the "throttle" cache (CACHES in settings), which has to be
+shared by the gunicorn workers for a limit to hold across them. If that cache
+fails (e.g. Redis is down), requests are counted in a per-process memory cache
+instead of being rejected or let through unchecked.
+"""
+
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.throttling import SimpleRateThrottle
+
+from .metrics import THROTTLED_REQUESTS, THROTTLE_CACHE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Warn about a failing throttle cache at most this often (seconds) per process
+_WARNING_INTERVAL = 60
+
+
+class FallbackCache:
+    """The shared throttle cache, or a local one while it is failing"""
+
+    def __init__(self):
+        self.local = LocMemCache('throttle-fallback', {'OPTIONS': {'MAX_ENTRIES': 10000}})
+        self.warned_at = 0
+
+    def _call(self, method, *args):
+        try:
+            return getattr(caches['throttle'], method)(*args)
+        except Exception:
+            THROTTLE_CACHE_ERRORS.inc()
+            if time.monotonic() - self.warned_at > _WARNING_INTERVAL:
+                self.warned_at = time.monotonic()
+                logger.warning("throttle cache unavailable, counting locally", exc_info=True)
+            return getattr(self.local, method)(*args)
+
+    def get(self, key, default=None):
+        return self._call('get', key, default)
+
+    def set(self, key, value, timeout):
+        return self._call('set', key, value, timeout)
+
+
+class ScopedRoleRateThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle with the rate looked up per request from ``scope`` and the user's role"""
+
+    cache = FallbackCache()
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        # The rate depends on the user; see allow_request
+        pass
+
+    def get_rate(self, role=None):
+        rates = settings.THROTTLE_RATES
+        return rates.get(f'{self.scope}:{role}', rates.get(self.scope))
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        user = request.user
+        self.role = getattr(user, 'role', None) if user and user.is_authenticated else 'anonymous'
+        self.rate = self.get_rate(self.role)
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def throttle_failure(self):
+        THROTTLED_REQUESTS.labels(scope=self.scope, role=self.role).inc()
+        logger.info("request throttled", extra={'scope': self.scope, 'throttle_key': self.key})
+        return False
+
+    def wait(self):
+        """Whole seconds until the oldest request that still counts expires (the Retry-After)"""
+        if len(self.history) < self.num_requests:
+            return 0
+        oldest = self.history[self.num_requests - 1]
+        return max(math.ceil(oldest + self.duration - self.now), 1)
+
+
+class LoginThrottle(ScopedRoleRateThrottle):
+    # A full password hash per attempt
+    scope = 'login'
+
+
+class TaskListThrottle(ScopedRoleRateThrottle):
+    # The whole visible task list, plus overdue status writes
+    scope = 'task_list'
+
+
+class ReportThrottle(ScopedRoleRateThrottle):
+    # PDF rendering of every task
+    scope = 'report'
+
+
+class TestEmailThrottle(ScopedRoleRateThrottle):
+    # One SMTP send per request
+    scope = 'test_email'
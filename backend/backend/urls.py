@@ -20,6 +20,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenRefreshView
 from django.http import JsonResponse
+from backend.metrics import metrics_view
 
 def api_root(request):
     return JsonResponse({
@@ -38,8 +39,9 @@ urlpatterns = [
     path('api/auth/', include('staff.urls')),
     path('api/', include('task.urls')),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
-# Always serve media and static files (for development and when DEBUG=True)
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Serve static files when DEBUG=True. Media is not served directly: attachments
+# go through the permission-checked /api/tasks/<id>/attachments/<id>/ download.
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
@@ -0,0 +1,84 @@
+# staff/authentication.py
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User
+
+VERSION_CLAIM = 'ver'
+
+# user_id -> (token_version or None when revoked, expires_at)
+_token_versions = {}
+
+
+def _cache_version(user_id, version):
+    expires_at = time.monotonic() + settings.JWT_TOKEN_VERSION_CACHE_SECONDS
+    _token_versions[user_id] = (version, expires_at)
+
+
+def get_token_version(user_id):
+    """Current token version for a user, or None if the user is gone or inactive"""
+    entry = _token_versions.get(user_id)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    
+    version = User.objects.filter(
+        pk=user_id, is_active=True
+    ).values_list('token_version', flat=True).first()
+    _cache_version(user_id, version)
+    return version
+
+
+def remember_token_version(user):
+    """Record a saved user's token version in this process"""
+    _cache_version(user.pk, user.token_version if user.is_active else None)
+
+
+def revoke_tokens(user_id):
+    """Reject a deleted user's tokens in this process without a lookup"""
+    _cache_version(user_id, None)
+
+
+def token_for_user(user):
+    """Refresh token carrying the user's claims; access tokens derived from it inherit them"""
+    refresh = RefreshToken.for_user(user)
+    for field, value in user.token_claims().items():
+        refresh[field] = value
+    refresh[VERSION_CLAIM] = user.token_version
+    return refresh
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT authentication that builds request.user from token claims instead of a DB row.
+    
+    The claims are only trusted while their version matches the user's current
+    token_version, which is cached in-process for JWT_TOKEN_VERSION_CACHE_SECONDS.
+    """
+    
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            # Token issued before claims were embedded
+            return super().get_user(validated_token)
+        
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        
+        if get_token_version(user_id) != validated_token[VERSION_CLAIM]:
+            raise AuthenticationFailed(
+                _("Token is no longer valid, please log in again"), code="token_revoked"
+            )
+        
+        claims = {'id': user_id, 'is_active': True}
+        claims.update((field, validated_token.get(field)) for field in User.TOKEN_CLAIM_FIELDS)
+        
+        # Fields not carried in the token stay deferred and load on first access
+        field_names = [f.attname for f in User._meta.concrete_fields if f.attname in claims]
+        return User.from_db(DEFAULT_DB_ALIAS, field_names, [claims[f] for f in field_names])
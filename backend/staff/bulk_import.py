@@ -0,0 +1,124 @@
+"""
+Bulk user import (POST /api/auth/users/bulk-import/ and ``manage.py import_users``).
+
+Rows carry the same fields as create_user: name, email, role, department and
+password (required except for faculty, who get unusable passwords). Every row is
+validated first, existing emails are checked with one query, passwords are hashed
+in parallel (staff.password_hashing) and the users are inserted with bulk_create
+in a single transaction.
+"""
+
+import csv
+import io
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .directory import invalidate_directory
+from .models import User
+from .password_hashing import hash_passwords
+from .serializers import UserCreateSerializer
+
+BATCH_SIZE = 500
+
+
+class BulkImportError(Exception):
+    pass
+
+
+class BulkUserRowSerializer(UserCreateSerializer):
+    # No per-row UniqueValidator query; import_users checks all emails at once
+    email = serializers.EmailField(max_length=254)
+
+    def validate(self, attrs):
+        # role is optional like the model field; import_users reads it from here
+        attrs.setdefault('role', 'staff')
+        if attrs['role'] != 'faculty' and not attrs.get('password'):
+            raise serializers.ValidationError({'password': 'Password is required for this role'})
+        return attrs
+
+
+def parse_rows(content, fmt):
+    """Rows (dicts) from CSV text with a header line, or a JSON list / {"users": [...]}"""
+    if fmt == 'csv':
+        reader = csv.DictReader(io.StringIO(content))
+        return [
+            {key.strip(): (value or '').strip() for key, value in row.items() if key}
+            for row in reader
+            if any((value or '').strip() for value in row.values())
+        ]
+    if fmt == 'json':
+        try:
+            data = json.loads(content)
+        except ValueError as e:
+            raise BulkImportError(f'Invalid JSON: {e}')
+        if isinstance(data, dict):
+            data = data.get('users')
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise BulkImportError('Expected a list of user objects')
+        return data
+    raise BulkImportError(f'Unsupported format: {fmt}')
+
+
+def import_users(rows, skip_invalid=False, dry_run=False):
+    """Validate and create users; returns {'total', 'created', 'errors', 'dry_run'}.
+
+    Errors are reported per row (1-based). Unless ``skip_invalid`` is set, any
+    error means nothing is imported.
+    """
+    errors = []
+    valid = []
+    seen = {}
+    for number, row in enumerate(rows, 1):
+        serializer = BulkUserRowSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({'row': number, 'email': row.get('email'), 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        data['email'] = User.objects.normalize_email(data['email'])
+        if data['email'] in seen:
+            errors.append({'row': number, 'email': data['email'],
+                           'errors': {'email': [f"Duplicate of row {seen[data['email']]}"]}})
+            continue
+        seen[data['email']] = number
+        valid.append((number, data))
+
+    existing = set(User.objects.filter(email__in=seen).values_list('email', flat=True))
+    if existing:
+        errors.extend(
+            {'row': number, 'email': data['email'], 'errors': {'email': ['User with this email already exists']}}
+            for number, data in valid if data['email'] in existing
+        )
+        valid = [(number, data) for number, data in valid if data['email'] not in existing]
+    errors.sort(key=lambda error: error['row'])
+
+    result = {'total': len(rows), 'created': 0, 'errors': errors, 'dry_run': dry_run}
+    if (errors and not skip_invalid) or dry_run or not valid:
+        return result
+
+    with_password = [data for _, data in valid if data['role'] != 'faculty']
+    hashes = iter(hash_passwords(data['password'] for data in with_password))
+    users = []
+    for _, data in valid:
+        first_name, _, last_name = data['name'].partition(' ')
+        users.append(User(
+            email=data['email'],
+            first_name=first_name,
+            last_name=last_name,
+            role=data['role'],
+            department=data.get('department') or None,
+            # Faculty can't log in
+            password=make_password(None) if data['role'] == 'faculty' else next(hashes),
+        ))
+
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+            # bulk_create skips the signals that refresh the cached user directory
+            transaction.on_commit(invalidate_directory)
+    except IntegrityError:
+        raise BulkImportError('Some of these emails were registered while importing; run the import again')
+    result['created'] = len(users)
+    return result
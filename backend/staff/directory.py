@@ -0,0 +1,96 @@
+"""
+In-memory user directory for the assignee picker.
+
+Each process keeps a snapshot of all users plus a sorted index of lowercase
+search terms (email, first name, last name, full name), so a prefix search is a
+bisect instead of a table scan. The snapshot is tagged with a version stored in
+the cache; saving or deleting a user replaces the version (see staff.signals),
+and every process rebuilds its snapshot (one query) on its next search. With a
+shared cache (Redis/Memcached) that happens everywhere at once; with the default
+per-process cache other workers catch up within USER_DIRECTORY_TTL seconds.
+"""
+
+import bisect
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import User
+
+VERSION_KEY = 'staff:directory:version'
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+class Directory:
+    def __init__(self, version, users):
+        self.version = version
+        # Same order as get_all_users
+        self.users = [
+            {
+                'id': user.id,
+                'name': f"{user.first_name} {user.last_name}".strip() or user.email,
+                'email': user.email,
+                'role': user.role,
+                'department': user.department,
+            }
+            for user in users
+        ]
+        terms = []
+        for position, user in enumerate(users):
+            full_name = f"{user.first_name} {user.last_name}".strip()
+            for term in {user.email, user.first_name, user.last_name, full_name}:
+                if term:
+                    terms.append((term.lower(), position))
+        terms.sort()
+        self.terms = [term for term, _ in terms]
+        self.positions = [position for _, position in terms]
+
+    def search(self, query='', department=None, role=None):
+        """Matching users in directory order"""
+        query = query.strip().lower()
+        if query:
+            start = bisect.bisect_left(self.terms, query)
+            # Every term sharing the prefix sorts before query + U+FFFF
+            end = bisect.bisect_left(self.terms, query + '\uffff', start)
+            positions = sorted(set(self.positions[start:end]))
+            users = [self.users[position] for position in positions]
+        else:
+            users = self.users
+        if department:
+            users = [user for user in users if user['department'] == department]
+        if role:
+            users = [user for user in users if user['role'] == role]
+        return users
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # add() so concurrent first requests agree on one version
+        cache.add(VERSION_KEY, uuid.uuid4().hex, settings.USER_DIRECTORY_TTL)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_directory():
+    global _snapshot
+    version = _current_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _lock:
+            if _snapshot is None or _snapshot.version != version:
+                users = User.objects.only(
+                    'id', 'email', 'first_name', 'last_name', 'role', 'department'
+                ).order_by('role', 'department', 'pk')
+                _snapshot = Directory(version, list(users))
+            snapshot = _snapshot
+    return snapshot
+
+
+def invalidate_directory():
+    """Make every process rebuild its snapshot on the next search"""
+    cache.delete(VERSION_KEY)
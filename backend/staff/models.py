@@ -3,6 +3,8 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from backend.dirty_fields import DirtyFieldsMixin
+
 class UserManager(BaseUserManager):
     """Custom user manager where email is the unique identifier"""
     
@@ -28,7 +30,7 @@ class UserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
-class User(AbstractUser):
+class User(DirtyFieldsMixin, AbstractUser):
     """Custom user model with email as login field"""
     
     ROLE_CHOICES = [
@@ -61,10 +63,19 @@ class User(AbstractUser):
     email = models.EmailField(_('email address'), unique=True)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='staff')
     department = models.CharField(max_length=50, choices=DEPARTMENT_CHOICES, null=True, blank=True)
+    token_version = models.PositiveIntegerField(
+        default=0,
+        help_text="Bumped whenever claims embedded in issued tokens go stale"
+    )
+    # Secret part of the user's iCalendar feed URL (task/ical.py); None until first requested
+    calendar_token = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []  # Email & Password are required by default
     
+    # Everything permission classes and views read from request.user
+    TOKEN_CLAIM_FIELDS = ['email', 'role', 'department', 'is_superuser', 'first_name', 'last_name']
+    
     objects = UserManager()
     
     class Meta:
@@ -77,6 +88,10 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.get_full_name()} ({self.email})"
     
+    def token_claims(self):
+        """Values embedded in access tokens (see staff.authentication)"""
+        return {field: getattr(self, field) for field in self.TOKEN_CLAIM_FIELDS}
+    
 class UserManager(BaseUserManager):
     """Custom user manager where email is the unique identifier"""
     
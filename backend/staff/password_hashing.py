@@ -0,0 +1,38 @@
+"""
+Parallel password hashing for bulk user imports.
+
+PBKDF2 is deliberately slow (about half a second per password with Django's
+defaults), so hashing is spread over a process pool of PASSWORD_HASH_WORKERS.
+The pool is started with "spawn" so it doesn't inherit the server's threads;
+each worker sets Django up once and then hashes its share of the passwords.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+
+def _init_worker(settings_module):
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    import django
+    django.setup()
+
+
+def hash_passwords(passwords):
+    """make_password() for each password, in order"""
+    passwords = list(passwords)
+    workers = min(settings.PASSWORD_HASH_WORKERS, len(passwords))
+    if workers <= 1:
+        # Starting a worker costs more than hashing one password
+        return [make_password(password) for password in passwords]
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(os.environ['DJANGO_SETTINGS_MODULE'],),
+    ) as executor:
+        return list(executor.map(make_password, passwords, chunksize=max(len(passwords) // (workers * 4), 1)))
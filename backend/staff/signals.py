@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .directory import invalidate_directory
+from .models import User
+
+# Saves that don't change anything the directory shows
+_IGNORED_UPDATES = {'last_login', 'password', 'token_version', 'calendar_token'}
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= _IGNORED_UPDATES:
+        return
+    # After commit, so no process rebuilds from data that isn't visible yet
+    transaction.on_commit(invalidate_directory)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_directory)
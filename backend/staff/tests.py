@@ -1,3 +1,113 @@
-from django.test import TestCase
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .bulk_import import BulkImportError, import_users, parse_rows
+from .models import User
+
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+    for alias in ('default', 'throttle', 'responses')
+}
+
+
+class ParseRowsTests(SimpleTestCase):
+    def test_csv(self):
+        content = 'name,email ,role\n Ann Lee , ann@example.com,staff\n,,\nBo,bo@example.com,faculty\n'
+        self.assertEqual(parse_rows(content, 'csv'), [
+            {'name': 'Ann Lee', 'email': 'ann@example.com', 'role': 'staff'},
+            {'name': 'Bo', 'email': 'bo@example.com', 'role': 'faculty'},
+        ])
+
+    def test_json(self):
+        rows = [{'name': 'Ann', 'email': 'ann@example.com'}]
+        self.assertEqual(parse_rows('[{"name": "Ann", "email": "ann@example.com"}]', 'json'), rows)
+        self.assertEqual(parse_rows('{"users": [{"name": "Ann", "email": "ann@example.com"}]}', 'json'), rows)
+
+    def test_invalid_input(self):
+        for content, fmt in [('[{"name": ', 'json'), ('{"name": "Ann"}', 'json'), ('[1, 2]', 'json'), ('', 'xlsx')]:
+            with self.subTest(content=content, fmt=fmt), self.assertRaises(BulkImportError):
+                parse_rows(content, fmt)
+
+
+@override_settings(
+    CACHES=TEST_CACHES, THROTTLE_RATES={}, PASSWORD_HASH_WORKERS=1,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class BulkImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin@example.com', 'pw', role='admin')
+        cls.faculty = User.objects.create_user('faculty@example.com', 'pw', role='faculty', department='CSE')
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def rows(self):
+        return [
+            {'name': 'Ann Lee', 'email': 'ann@example.com', 'role': 'staff', 'password': 'secret-pw'},
+            {'name': 'Bo', 'email': 'bo@example.com', 'role': 'faculty', 'department': 'ECE'},
+        ]
+
+    def test_creates_users(self):
+        result = import_users(self.rows())
+        self.assertEqual((result['total'], result['created'], result['errors']), (2, 2, []))
+        ann = User.objects.get(email='ann@example.com')
+        self.assertEqual((ann.first_name, ann.last_name, ann.role), ('Ann', 'Lee', 'staff'))
+        self.assertTrue(ann.check_password('secret-pw'))
+        bo = User.objects.get(email='bo@example.com')
+        self.assertEqual(bo.department, 'ECE')
+        self.assertFalse(bo.has_usable_password())
+
+    def test_role_defaults_to_staff(self):
+        rows = [{'name': 'No role', 'email': 'dee@example.com', 'password': 'secret-pw'},
+                {'name': 'No password', 'email': 'eve@example.com'}]
+        result = import_users(rows, skip_invalid=True)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(User.objects.get(email='dee@example.com').role, 'staff')
+        self.assertEqual([(error['row'], list(error['errors'])) for error in result['errors']], [(2, ['password'])])
+
+    def test_row_errors(self):
+        rows = self.rows() + [
+            {'name': 'No password', 'email': 'cy@example.com', 'role': 'hod'},
+            {'name': 'Bad email', 'email': 'not-an-email', 'role': 'faculty'},
+            {'name': 'Again', 'email': 'ann@EXAMPLE.COM', 'role': 'faculty'},
+            {'name': 'Exists', 'email': 'faculty@example.com', 'role': 'faculty'},
+        ]
+        result = import_users(rows)
+        self.assertEqual(result['created'], 0)
+        self.assertEqual([(error['row'], list(error['errors'])) for error in result['errors']],
+                         [(3, ['password']), (4, ['email']), (5, ['email']), (6, ['email'])])
+        self.assertIn('Duplicate of row 1', result['errors'][2]['errors']['email'][0])
+        self.assertFalse(User.objects.filter(email__in=['ann@example.com', 'bo@example.com']).exists())
+
+    def test_skip_invalid(self):
+        rows = self.rows() + [{'name': 'Exists', 'email': 'faculty@example.com', 'role': 'faculty'}]
+        result = import_users(rows, skip_invalid=True)
+        self.assertEqual((result['created'], len(result['errors'])), (2, 1))
+        self.assertEqual(User.objects.filter(email__in=['ann@example.com', 'bo@example.com']).count(), 2)
+
+    def test_dry_run(self):
+        result = import_users(self.rows(), dry_run=True)
+        self.assertEqual((result['created'], result['errors'], result['dry_run']), (0, [], True))
+        self.assertFalse(User.objects.filter(email='ann@example.com').exists())
+
+    def test_csv_upload(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile('users.csv', b'\xef\xbb\xbfname,email,role,department\nBo,bo@example.com,faculty,ECE\n')
+        response = client.post('/api/auth/users/bulk-import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 1)
+
+        response = client.post('/api/auth/users/bulk-import/', {'users': self.rows()}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['row'], 2)
+
+    def test_faculty_cannot_import(self):
+        client = APIClient()
+        client.force_authenticate(self.faculty)
+        response = client.post('/api/auth/users/bulk-import/', self.rows(), format='json')
+        self.assertEqual(response.status_code, 403)
@@ -1,17 +1,23 @@
 # staff/views.py
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.views.decorators.csrf import csrf_exempt
 from .models import User
+from .bulk_import import BulkImportError, import_users, parse_rows
+from .directory import get_directory
 from .serializers import UserSerializer, UserCreateSerializer, LoginSerializer
+from .authentication import token_for_user, remember_token_version, revoke_tokens
 from task.permissions import IsAdmin, IsAdminOrStaff
+from backend.query_budget import query_budget
+from backend.throttling import LoginThrottle
 
+@query_budget(3)
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginThrottle])
 @csrf_exempt
 def login_view(request):
     """Login endpoint with JWT token generation using email"""
@@ -25,7 +31,7 @@ def login_view(request):
     )
     
     if user:
-        refresh = RefreshToken.for_user(user)
+        refresh = token_for_user(user)
         return Response({
             'token': str(refresh.access_token),
             'refresh': str(refresh),
@@ -38,6 +44,7 @@ def login_view(request):
     )
 
 
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_info_view(request):
@@ -46,15 +53,47 @@ def user_info_view(request):
     return Response(serializer.data)
 
 
+@query_budget(3)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_all_users(request):
     """Get all users - All authenticated users can see user list for task assignment"""
-    users = User.objects.all().order_by('role', 'department')
-    serializer = UserSerializer(users, many=True)
-    return Response({'users': serializer.data})
+    # Served from the cached directory snapshot (same fields as UserSerializer)
+    directory = get_directory()
+    return Response({'users': directory.users})
 
 
+@query_budget(2)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_users(request):
+    """Assignee picker typeahead: prefix match on email, first or last name
+
+    Query params: q, department, role, limit (default 20, max 100), offset
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        offset = max(int(request.query_params.get('offset', 0)), 0)
+    except ValueError:
+        return Response(
+            {'error': 'limit and offset must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    matches = get_directory().search(
+        request.query_params.get('q', ''),
+        department=request.query_params.get('department'),
+        role=request.query_params.get('role'),
+    )
+    return Response({
+        'users': matches[offset:offset + limit],
+        'total': len(matches),
+        'limit': limit,
+        'offset': offset,
+    })
+
+
+@query_budget(4)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsAdminOrStaff])
 def create_user(request):
@@ -68,6 +107,45 @@ def create_user(request):
     )
 
 
+# One INSERT per 500 rows (bulk_import.BATCH_SIZE): covers imports of ~3,000 users
+@query_budget(10)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdminOrStaff])
+def bulk_import_users(request):
+    """Admin/Staff: Create many users from an uploaded CSV/JSON file or a JSON body
+
+    Query params: skip_invalid=true imports the valid rows even when others have
+    errors, dry_run=true only validates.
+    """
+    upload = request.FILES.get('file')
+    try:
+        if upload:
+            fmt = 'json' if upload.name.lower().endswith('.json') else 'csv'
+            rows = parse_rows(upload.read().decode('utf-8-sig'), fmt)
+        else:
+            rows = request.data if isinstance(request.data, list) else request.data.get('users')
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise BulkImportError('Upload a CSV/JSON file or send a list of user objects')
+        result = import_users(
+            rows,
+            skip_invalid=request.query_params.get('skip_invalid', '').lower() == 'true',
+            dry_run=request.query_params.get('dry_run', '').lower() == 'true',
+        )
+    except UnicodeDecodeError:
+        return Response({'error': 'The file must be UTF-8 encoded'}, status=status.HTTP_400_BAD_REQUEST)
+    except BulkImportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if result['created']:
+        response_status = status.HTTP_201_CREATED
+    elif result['errors']:
+        response_status = status.HTTP_400_BAD_REQUEST
+    else:
+        response_status = status.HTTP_200_OK
+    return Response(result, status=response_status)
+
+
+@query_budget(4)
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated, IsAdminOrStaff])
 def update_user(request, user_id):
@@ -94,10 +172,17 @@ def update_user(request, user_id):
     if 'email' in request.data:
         user.email = request.data['email']
     
+    # Role/department/email live in issued tokens, so invalidate them on change
+    if user.get_dirty_fields().keys() & set(User.TOKEN_CLAIM_FIELDS):
+        user.token_version += 1
+    
     user.save()
+    remember_token_version(user)
     return Response(UserSerializer(user).data)
 
 
+# Assignments are loaded before they are deleted, for the calendar feed signals
+@query_budget(11)
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated, IsAdminOrStaff])
 def delete_user(request, user_id):
@@ -105,6 +190,7 @@ def delete_user(request, user_id):
     try:
         user = User.objects.get(id=user_id)
         user.delete()
+        revoke_tokens(user_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
     except User.DoesNotExist:
         return Response(
@@ -113,6 +199,7 @@ def delete_user(request, user_id):
         )
 
 
+@query_budget(4)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsAdminOrStaff])
 def reset_password(request, user_id):
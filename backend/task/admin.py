@@ -1,6 +1,6 @@
 # task/admin.py
 from django.contrib import admin
-from .models import Task, TaskAssignment, TaskHistory, TaskAttachment
+from .models import Task, TaskAssignment, TaskHistory, TaskAttachment, RecurringTaskTemplate, TaskDailyStats
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
@@ -44,6 +44,23 @@ class TaskHistoryAdmin(admin.ModelAdmin):
 class TaskAttachmentAdmin(admin.ModelAdmin):
     list_display = ['task', 'file_name', 'uploaded_by', 'uploaded_at', 'file_size']
     list_filter = ['uploaded_at']
-    search_fields = ['task__title', 'file_name']
+    search_fields = ['task__title', 'file_name', 'sha256']
     date_hierarchy = 'uploaded_at'
-    readonly_fields = ['uploaded_at']
+    readonly_fields = ['uploaded_at', 'sha256']
+
+
+@admin.register(RecurringTaskTemplate)
+class RecurringTaskTemplateAdmin(admin.ModelAdmin):
+    list_display = ['title', 'recurrence', 'dtstart', 'is_active', 'materialized_until']
+    list_filter = ['is_active', 'priority']
+    search_fields = ['title', 'description']
+    filter_horizontal = ['assignees']
+    readonly_fields = ['materialized_until', 'created_at']
+
+
+@admin.register(TaskDailyStats)
+class TaskDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'dimension', 'key', 'created', 'completed', 'completed_on_time', 'overdue']
+    list_filter = ['dimension', 'date']
+    search_fields = ['key', 'department']
+    date_hierarchy = 'date'
@@ -0,0 +1,210 @@
+"""
+Daily task analytics rollups (TaskDailyStats), served by /api/analytics/.
+
+``rollup_days`` loads the columns it needs once with values_list() into NumPy
+arrays and computes every day and group with array operations: bincount for
+counts and means, one lexsort per statistic for the p90s. The result replaces
+the stored rows of those days, so the endpoint only reads a small table and
+re-running a day is harmless.
+
+Per day and group (all tasks, priority, department, assignee):
+
+- created, completed and completed on time (completed_at <= due_date)
+- mean and p90 hours from created_at to completed_at of the completed tasks
+- tasks overdue at the end of the day, with their mean and p90 age in days
+
+Completed tasks without completed_at (from before it was recorded) use the time
+of the history entry that set their status to completed, or updated_at.
+"""
+
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Task, TaskAssignment, TaskDailyStats, TaskHistory
+
+QUANTILE = 0.9
+BATCH_SIZE = 1000
+
+
+def _epoch(values):
+    """Aware datetimes (or None) as float seconds, NaN for None"""
+    return np.fromiter((value.timestamp() if value is not None else np.nan for value in values),
+                       dtype=np.float64, count=len(values))
+
+
+def _factorize(labels):
+    """(codes, unique labels) with codes indexing the labels in first-seen order"""
+    index = {}
+    codes = np.fromiter((index.setdefault(label, len(index)) for label in labels), dtype=np.int64, count=len(labels))
+    return codes, list(index)
+
+
+def _grouped(cells, values, size):
+    """Count, mean and p90 of ``values`` per cell (0 <= cells < size); NaN where empty"""
+    counts = np.bincount(cells, minlength=size)
+    means = np.full(size, np.nan)
+    quantiles = np.full(size, np.nan)
+    filled = counts > 0
+    if not filled.any():
+        return counts, means, quantiles
+    means[filled] = np.bincount(cells, weights=values, minlength=size)[filled] / counts[filled]
+    # Sort by cell, then value; each cell's values are then a contiguous run
+    ordered = values[np.lexsort((values, cells))]
+    starts = np.cumsum(counts) - counts
+    # Linear interpolation between the closest ranks, as np.quantile does
+    position = starts[filled] + QUANTILE * (counts[filled] - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    quantiles[filled] = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+    return counts, means, quantiles
+
+
+def _day_bounds(start, end, now):
+    """Epoch seconds of local midnights from ``start`` to the day after ``end``; today ends now"""
+    bounds = []
+    day = start
+    while day <= end + timedelta(days=1):
+        bounds.append(timezone.make_aware(datetime.combine(day, time.min)).timestamp())
+        day += timedelta(days=1)
+    bounds = np.array(bounds)
+    return np.minimum(bounds, now.timestamp())
+
+
+def _load(window_start, window_end):
+    """Task and assignment columns of every task that can count in the window"""
+    # Created before the end and not completed before the start
+    counted = Q(created_at__lt=window_end) & (Q(completed_at__isnull=True) | Q(completed_at__gte=window_start))
+    rows = list(
+        Task.objects.filter(counted)
+        .order_by('pk')
+        .values_list('id', 'priority', 'status', 'created_at', 'due_date', 'completed_at', 'updated_at')
+    )
+    ids, priorities, statuses, created, due, completed, updated = zip(*rows) if rows else ((),) * 7
+    tasks = {
+        'id': np.array(ids, dtype=np.int64),
+        'priority': list(priorities),
+        'created': _epoch(created),
+        'due': _epoch(due),
+        'completed': _epoch(completed),
+    }
+
+    # Completed before completed_at was recorded: when did the status change?
+    missing = np.flatnonzero((np.array(statuses, dtype=object) == 'completed') & np.isnan(tasks['completed']))
+    if len(missing):
+        missing_ids = tasks['id'][missing]
+        changed = dict(
+            TaskHistory.objects.filter(task_id__in=missing_ids.tolist(), details__changes__status__new='completed')
+            .order_by('task_id', 'timestamp').values_list('task_id', 'timestamp')
+        )
+        tasks['completed'][missing] = _epoch([changed.get(task_id, updated[i]) for task_id, i in
+                                              zip(missing_ids.tolist(), missing.tolist())])
+
+    assignments = list(
+        TaskAssignment.objects.filter(task__in=Task.objects.filter(counted))
+        .values_list('task_id', 'department', 'assignee__email')
+    )
+    task_ids, departments, emails = zip(*assignments) if assignments else ((),) * 3
+    # Position of each assignment's task in the (sorted) task arrays; tasks
+    # created between the two queries are left out
+    task_ids = np.array(task_ids, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(tasks['id'], task_ids), max(len(tasks['id']) - 1, 0))
+    known = np.flatnonzero(tasks['id'][positions] == task_ids) if len(tasks['id']) else np.empty(0, np.int64)
+    return (tasks, positions[known], [departments[i] for i in known.tolist()],
+            [emails[i] for i in known.tolist()])
+
+
+def _dimensions(tasks, positions, departments, emails):
+    """(dimension, task position per row, key per row, department per row)"""
+    count = len(tasks['id'])
+    yield 'all', np.arange(count), [''] * count, [''] * count
+    yield 'priority', np.arange(count), tasks['priority'], [''] * count
+    yield 'department', positions, departments, departments
+    yield 'assignee', positions, emails, departments
+
+
+def compute_rollups(start, end, now=None):
+    """TaskDailyStats (unsaved) for the local dates ``start``..``end``"""
+    now = now or timezone.now()
+    end = min(end, timezone.localdate(now))
+    bounds = _day_bounds(start, end, now)
+    days = len(bounds) - 1
+    window_start = datetime.fromtimestamp(bounds[0], tz=timezone.get_current_timezone())
+    window_end = datetime.fromtimestamp(bounds[-1], tz=timezone.get_current_timezone())
+    tasks, positions, departments, emails = _load(window_start, window_end)
+
+    def day_of(timestamps):
+        # -1 / days for times outside the window (and NaN)
+        return np.searchsorted(bounds, np.nan_to_num(timestamps, nan=np.inf), side='right') - 1
+
+    stats = []
+    for dimension, rows, keys, row_departments in _dimensions(tasks, positions, departments, emails):
+        codes, labels = _factorize(list(zip(keys, row_departments)))
+        groups = len(labels)
+        size = days * groups
+        created = tasks['created'][rows]
+        due = tasks['due'][rows]
+        completed = tasks['completed'][rows]
+
+        created_day = day_of(created)
+        in_window = (created_day >= 0) & (created_day < days)
+        created_counts = np.bincount(created_day[in_window] * groups + codes[in_window], minlength=size)
+
+        completed_day = day_of(completed)
+        in_window = (completed_day >= 0) & (completed_day < days)
+        cells = completed_day[in_window] * groups + codes[in_window]
+        on_time = np.bincount(cells, weights=(completed[in_window] <= due[in_window]).astype(np.float64),
+                              minlength=size)
+        completed_counts, hours_mean, hours_p90 = _grouped(
+            cells, (completed[in_window] - created[in_window]) / 3600, size
+        )
+
+        # Open past the due date at the end of each day
+        overdue_cells, overdue_ages = [], []
+        for day in range(days):
+            end_of_day = bounds[day + 1]
+            overdue = (created < end_of_day) & (due < end_of_day) & ~(completed <= end_of_day)
+            overdue_cells.append(day * groups + codes[overdue])
+            overdue_ages.append((end_of_day - due[overdue]) / 86400)
+        overdue_counts, age_mean, age_p90 = _grouped(
+            np.concatenate(overdue_cells) if overdue_cells else np.empty(0, np.int64),
+            np.concatenate(overdue_ages) if overdue_ages else np.empty(0), size
+        )
+
+        for cell in np.flatnonzero(created_counts + completed_counts + overdue_counts):
+            day, group = divmod(int(cell), groups)
+            key, department = labels[group]
+            stats.append(TaskDailyStats(
+                date=start + timedelta(days=day),
+                dimension=dimension,
+                key=key,
+                department=department,
+                created=int(created_counts[cell]),
+                completed=int(completed_counts[cell]),
+                completed_on_time=int(on_time[cell]),
+                hours_to_complete_mean=_float(hours_mean[cell]),
+                hours_to_complete_p90=_float(hours_p90[cell]),
+                overdue=int(overdue_counts[cell]),
+                overdue_age_days_mean=_float(age_mean[cell]),
+                overdue_age_days_p90=_float(age_p90[cell]),
+                computed_at=now,
+            ))
+    return stats
+
+
+def _float(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def rollup_days(start, end, now=None):
+    """Recompute and store the rollups of ``start``..``end``; returns the number of rows"""
+    now = now or timezone.now()
+    end = min(end, timezone.localdate(now))
+    stats = compute_rollups(start, end, now)
+    with transaction.atomic():
+        TaskDailyStats.objects.filter(date__gte=start, date__lte=end).delete()
+        TaskDailyStats.objects.bulk_create(stats, batch_size=BATCH_SIZE)
+    return len(stats)
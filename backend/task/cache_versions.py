@@ -0,0 +1,89 @@
+"""
+Versions of the task data each group of users sees, for the caches built from it
+(task list and dashboard responses, calendar feeds).
+
+Users who see the same tasks share a scope (see task_visibility_filter): "all"
+for admin/staff, "dept:<department>" for a HOD and "user:<id>" for faculty. Each
+scope has a random version in the "responses" cache, dropped whenever a task,
+assignment or history entry it can see changes (task.signals; bulk_create
+callers invalidate explicitly), plus a global one for bulk changes. Cached data
+records the version it was built from and is stale once that differs.
+
+With the per-process locmem backend other workers can't see the drop, so there
+versions expire after RESPONSE_CACHE_TTL seconds; shared backends keep them.
+"""
+
+import uuid
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import TaskAssignment
+
+VERSION_PREFIX = 'version:'
+GLOBAL_SCOPE = 'global'
+ALL_SCOPE = 'all'
+
+
+def response_cache():
+    return caches['responses']
+
+
+def user_scope(user):
+    """The scope of the tasks ``user`` can see, or None if they see none"""
+    if user.role in ['admin', 'staff'] or user.is_superuser:
+        return ALL_SCOPE
+    if user.role == 'hod':
+        return f'dept:{quote(str(user.department))}'
+    if user.role == 'faculty':
+        return f'user:{user.pk}'
+    return None
+
+
+def _timeout():
+    if isinstance(response_cache(), LocMemCache):
+        return settings.RESPONSE_CACHE_TTL
+    return None
+
+
+def scope_version(user):
+    """Version of the data visible to ``user`` as of the last invalidation of their scope"""
+    cache = response_cache()
+    keys = [VERSION_PREFIX + scope for scope in (GLOBAL_SCOPE, user_scope(user) or f'none:{user.pk}')]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() so concurrent first requests agree on one version
+            cache.add(key, uuid.uuid4().hex, _timeout())
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+async def ascope_version(user):
+    return await sync_to_async(scope_version)(user)
+
+
+def invalidate(departments=(), user_ids=()):
+    """Scopes that may see tasks of these departments/assignees (and admin/staff)"""
+    scopes = [ALL_SCOPE]
+    scopes += [f'dept:{quote(str(department))}' for department in set(departments)]
+    scopes += [f'user:{user_id}' for user_id in set(user_ids)]
+    response_cache().delete_many([VERSION_PREFIX + scope for scope in scopes])
+
+
+def invalidate_tasks(task_ids):
+    """invalidate() for everyone assigned to these tasks"""
+    assignments = TaskAssignment.objects.filter(task_id__in=task_ids).values_list('department', 'assignee_id')
+    departments, user_ids = set(), set()
+    for department, user_id in assignments:
+        departments.add(department)
+        user_ids.add(user_id)
+    invalidate(departments, user_ids)
+
+
+def invalidate_all():
+    """After bulk changes (imports, generated data)"""
+    response_cache().delete(VERSION_PREFIX + GLOBAL_SCOPE)
@@ -0,0 +1,148 @@
+"""
+Attachment download responses.
+
+When ATTACHMENT_ACCEL_REDIRECT is set (e.g. "/protected-media/"), the response is
+empty apart from an ``X-Accel-Redirect`` header and nginx sends the file itself
+from an ``internal`` location, so the worker is free as soon as the permission
+check is done. Otherwise the file is streamed from Python with single-range
+``Range`` support, an ``ETag`` and ``Cache-Control``, so browsers can resume and
+re-validate large PDFs instead of downloading them again. Under ASGI the chunks
+are read in worker threads by an async iterator (Django buffers a sync iterator
+whole before sending it there); under WSGI a plain generator streams them.
+Thumbnails (task/thumbnails.py) are sent the same way.
+"""
+
+import mimetypes
+import os
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header
+
+from .thumbnails import thumbnail_path
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def attachment_etag(attachment):
+    # Content-addressed files never change; legacy ones are keyed by row and size
+    if attachment.sha256:
+        return f'"{attachment.sha256}"'
+    return f'"{attachment.pk}-{attachment.file_size}"'
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable byte range, None to send the
+    whole file (no/unsupported header), or False when the range is unsatisfiable"""
+    match = _RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # "bytes=-500" is the last 500 bytes
+        start, end = max(size - int(last), 0), size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def _stream(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def _astream(path, start, length):
+    # Not thread-sensitive: reads run in any free thread, not the one serving sync views
+    def run(func, *args):
+        return sync_to_async(func, thread_sensitive=False)(*args)
+
+    f = await run(open, path, 'rb')
+    try:
+        await run(f.seek, start)
+        while length > 0:
+            chunk = await run(f.read, min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await run(f.close)
+
+
+def attachment_response(request, attachment, thumbnail=False):
+    """The attachment's file, or with ``thumbnail`` its cached WebP thumbnail"""
+    etag = attachment_etag(attachment)
+    name, path = attachment.file.name, attachment.file.path
+    if thumbnail:
+        if not attachment.has_thumbnail:
+            raise FileNotFoundError(thumbnail_path(path))
+        etag = etag[:-1] + '-thumb"'
+        name, path = thumbnail_path(name), thumbnail_path(path)
+        content_type = 'image/webp'
+    else:
+        content_type = mimetypes.guess_type(attachment.file_name)[0] or 'application/octet-stream'
+
+    # 304 for a matching If-None-Match
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        prefix = settings.ATTACHMENT_ACCEL_REDIRECT
+        if prefix:
+            # nginx handles Range and the transfer itself
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name
+        else:
+            response = _file_response(request, path, etag, content_type)
+        if not thumbnail:
+            response['Content-Disposition'] = content_disposition_header(True, attachment.file_name)
+
+    response['ETag'] = etag
+    # The download is permission-checked, so only the user's own browser may cache it
+    if attachment.sha256:
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _file_response(request, path, etag, content_type):
+    size = os.path.getsize(path)
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    # A stale If-Range means the client's partial copy is outdated: send everything
+    if range_header and request.headers.get('If-Range', etag) == etag:
+        byte_range = _parse_range(range_header, size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    # request may be a DRF Request wrapping the HttpRequest
+    stream = _astream if isinstance(getattr(request, '_request', request), ASGIRequest) else _stream
+    if byte_range is None:
+        start, length = 0, size
+        response = StreamingHttpResponse(stream(path, start, length), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(stream(path, start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    return response
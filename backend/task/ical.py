@@ -0,0 +1,150 @@
+"""
+Per-user iCalendar feeds (GET /api/calendar/<token>.ics).
+
+A feed lists the tasks the user can see (same scoping as the task list) due
+within the last CALENDAR_FEED_PAST_DAYS days or later, one VEVENT per due date
+with a VALARM per reminder. Calendar apps poll feeds constantly, so:
+
+- The ETag is built from the version of the user's scope (task.cache_versions),
+  without touching the database.
+- A matching If-None-Match gets a 304, a matching cached body is sent as is,
+  and anything else is streamed from the database and cached on the way out.
+"""
+
+import hashlib
+import secrets
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache_versions import ascope_version, response_cache
+from .models import Task
+
+FEED_PREFIX = 'calendar:feed:'
+# Larger feeds (admins with years of tasks) are regenerated rather than cached
+MAX_CACHED_FEED_BYTES = 2 * 1024 * 1024
+CHUNK_SIZE = 500
+UID_DOMAIN = 'task-schedule'
+
+# iCalendar PRIORITY: 1 highest .. 9 lowest
+PRIORITIES = {'urgent': 1, 'high': 3, 'medium': 5, 'low': 9}
+
+
+def new_calendar_token():
+    return secrets.token_urlsafe(32)
+
+
+async def feed_etag(user):
+    """ETag of the user's feed as of the last invalidation of its scope"""
+    version = await ascope_version(user)
+    digest = hashlib.sha256(
+        '|'.join([str(user.pk), user.role, str(user.department), str(user.is_superuser), version]).encode()
+    ).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+async def get_cached_feed(user, etag):
+    cached = await response_cache().aget(FEED_PREFIX + str(user.pk))
+    if cached is not None and cached[0] == etag:
+        return cached[1]
+    return None
+
+
+# Rendering (RFC 5545)
+
+def _escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _line(text):
+    """Content line folded at 75 octets, CRLF-terminated"""
+    data = text.encode()
+    if len(data) <= 75:
+        return data + b'\r\n'
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        # Don't split a UTF-8 sequence
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+    return b'\r\n '.join(parts) + b'\r\n'
+
+
+def _event(id, title, description, priority, status, due_date, reminder1, reminder2, updated_at):
+    completed = status == 'completed'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:task-{id}@{UID_DOMAIN}',
+        f'DTSTAMP:{_utc(updated_at)}',
+        f'LAST-MODIFIED:{_utc(updated_at)}',
+        f'DTSTART:{_utc(due_date)}',
+        f'SUMMARY:{_escape(("[Completed] " if completed else "") + title)}',
+        f'DESCRIPTION:{_escape(description)}',
+        f'PRIORITY:{PRIORITIES.get(priority, 0)}',
+        'TRANSP:TRANSPARENT',
+    ]
+    if not completed:
+        for reminder in (reminder1, reminder2):
+            if reminder:
+                lines += [
+                    'BEGIN:VALARM',
+                    'ACTION:DISPLAY',
+                    f'DESCRIPTION:{_escape("Reminder: " + title)}',
+                    f'TRIGGER;VALUE=DATE-TIME:{_utc(reminder)}',
+                    'END:VALARM',
+                ]
+    lines.append('END:VEVENT')
+    return b''.join(_line(line) for line in lines)
+
+
+def _header(user):
+    name = f"{user.first_name} {user.last_name}".strip() or user.email
+    refresh = f'PT{max(settings.CALENDAR_FEED_TTL // 60, 1)}M'
+    return b''.join(_line(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Task Schedule//Tasks//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(f"Tasks - {name}")}',
+        f'REFRESH-INTERVAL;VALUE=DURATION:{refresh}',
+        f'X-PUBLISHED-TTL:{refresh}',
+    ])
+
+
+async def stream_feed(user, etag):
+    """Yield the feed in chunks; the complete body is cached under ``etag``"""
+    since = timezone.now() - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS)
+    # values() rather than values_list(): the latter's aiterator() runs its query in the event loop
+    rows = (Task.objects.visible_to(user).filter(due_date__gte=since).order_by('due_date', 'pk')
+            .values('id', 'title', 'description', 'priority', 'status', 'due_date',
+                    'reminder1', 'reminder2', 'updated_at'))
+    body = [_header(user)]
+    size = len(body[0])
+    yield body[0]
+    chunk = []
+    async for row in rows.aiterator(chunk_size=CHUNK_SIZE):
+        event = _event(**row)
+        chunk.append(event)
+        if len(chunk) >= CHUNK_SIZE:
+            data = b''.join(chunk)
+            chunk = []
+            size += len(data)
+            if size <= MAX_CACHED_FEED_BYTES:
+                body.append(data)
+            yield data
+    data = b''.join(chunk) + _line('END:VCALENDAR')
+    size += len(data)
+    yield data
+    if size <= MAX_CACHED_FEED_BYTES:
+        body.append(data)
+        await response_cache().aset(FEED_PREFIX + str(user.pk), (etag, b''.join(body)), settings.CALENDAR_FEED_TTL)
@@ -0,0 +1,247 @@
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from contextlib import ExitStack, redirect_stdout
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+import staff.urls
+import task.urls
+from staff.authentication import token_for_user
+from staff.models import User
+from task.ical import new_calendar_token
+from task.models import RecurringTaskTemplate, Task
+
+ROLES = ['admin', 'hod', 'staff', 'faculty']
+
+# Requests issued per URL name; anything in task/urls.py or staff/urls.py without an
+# entry here is benchmarked as a plain GET (if it takes no URL arguments).
+# Each entry is (method, url kwargs, body), where kwargs/body are built from the context.
+ENDPOINTS = {
+    'get-task': [
+        ('GET', lambda ctx: {'task_id': ctx['task_id']}, None),
+        ('PUT', lambda ctx: {'task_id': ctx['task_id']},
+         lambda ctx: {'priority': 'high', 'follow_comment': 'Benchmark follow-up'}),
+        ('DELETE', lambda ctx: {'task_id': ctx['task_id']}, None),
+    ],
+    'get-task-comments': [('GET', lambda ctx: {'task_id': ctx['task_id']}, None)],
+    'download-attachment': [('GET', lambda ctx: {'task_id': ctx['task_id'],
+                                                 'attachment_id': ctx['attachment_id']}, None)],
+    'attachment-thumbnail': [('GET', lambda ctx: {'task_id': ctx['task_id'],
+                                                  'attachment_id': ctx['attachment_id']}, None)],
+    'create-task': [('POST', None, lambda ctx: {
+        'title': 'Benchmark task',
+        'description': 'Created by manage.py bench',
+        'department': [ctx['assignee'].department or 'CSE'],
+        'assignee': [ctx['assignee'].email],
+        'priority': 'medium',
+        'created_by': ctx['user'].get_full_name(),
+        'due_date': (timezone.now() + timezone.timedelta(days=7)).isoformat(),
+    })],
+    'recurring-templates': [
+        ('GET', None, None),
+        ('POST', None, lambda ctx: {
+            'title': 'Benchmark report',
+            'description': 'Created by manage.py bench',
+            'created_by': ctx['user'].get_full_name(),
+            'recurrence': 'FREQ=WEEKLY;BYDAY=MO',
+            'dtstart': timezone.now().isoformat(),
+            'assignees': [ctx['assignee'].email],
+            'departments': [ctx['assignee'].department or 'CSE'],
+        }),
+    ],
+    'recurring-template-detail': [
+        ('GET', lambda ctx: {'template_id': ctx['template_id']}, None),
+        ('PUT', lambda ctx: {'template_id': ctx['template_id']}, lambda ctx: {'priority': 'high'}),
+        ('DELETE', lambda ctx: {'template_id': ctx['template_id']}, None),
+    ],
+    'calendar-subscription': [('GET', None, None), ('POST', None, None)],
+    'calendar-feed': [('GET', lambda ctx: {'token': ctx['calendar_token']}, None)],
+    'test-email': [('POST', None, lambda ctx: {'email': ctx['user'].email})],
+    'login': [('POST', None, lambda ctx: {'email': ctx['user'].email, 'password': ctx['password']})],
+    'create-user': [('POST', None, lambda ctx: {
+        'name': 'Bench User', 'email': 'bench-user@load.test', 'role': 'faculty',
+        'department': 'CSE', 'password': 'bench123',
+    })],
+    'bulk-import-users': [('POST', None, lambda ctx: [
+        {'name': 'Bench Import', 'email': 'bench-import@load.test', 'role': 'faculty', 'department': 'CSE'},
+    ])],
+    'update-user': [('PUT', lambda ctx: {'user_id': ctx['assignee'].pk},
+                     lambda ctx: {'name': ctx['assignee'].get_full_name()})],
+    'delete-user': [('DELETE', lambda ctx: {'user_id': ctx['assignee'].pk}, None)],
+    'reset-password': [('POST', lambda ctx: {'user_id': ctx['user'].pk},
+                        lambda ctx: {'password': ctx['password']})],
+}
+
+
+def iter_routes():
+    """(url name, method, kwargs builder, body builder) for every route in task and staff urls"""
+    for module in (task.urls, staff.urls):
+        for pattern in module.urlpatterns:
+            name = pattern.name
+            for method, kwargs, body in ENDPOINTS.get(name, [('GET', None, None)]):
+                if kwargs is None and pattern.pattern.converters:
+                    raise CommandError(f'No URL arguments for {name}; add it to bench.ENDPOINTS')
+                yield name, method, kwargs, body
+
+
+def prepare_environment():
+    """Run requests against the configured database without touching the outside world"""
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.dummy.EmailBackend'
+    if '*' not in settings.ALLOWED_HOSTS:
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    # Repeated requests are the point here, not something to rate limit
+    settings.THROTTLE_RATES = {}
+    # Measure the views themselves, not cached copies of their responses
+    settings.RESPONSE_CACHE_ENABLED = False
+    # 4xx responses are expected for roles without access; don't log each one
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+
+def role_contexts(roles, password):
+    """Yield (role, auth headers, builder context) for the first user of each role"""
+    assignee = User.objects.filter(role='faculty').order_by('-pk').first()
+    for role in roles:
+        user = User.objects.filter(role=role).order_by('pk').first()
+        if user is None:
+            yield role, None, None
+            continue
+        # A task this role can see, so detail endpoints measure real work rather than a 403
+        sample_task = (Task.objects.visible_to(user).order_by('pk').first()
+                       or Task.objects.order_by('pk').first())
+        # Generated data has no attachments or templates; a missing one still exercises the lookup
+        attachment = sample_task.attachments.order_by('pk').first()
+        template = RecurringTaskTemplate.objects.visible_to(user).order_by('pk').first()
+        # Feeds are looked up by token; give the user one (as GET /api/calendar/ would)
+        if not user.calendar_token:
+            user.calendar_token = new_calendar_token()
+            user.save(update_fields=['calendar_token'])
+        headers = {'Authorization': f'Bearer {token_for_user(user).access_token}'}
+        yield role, headers, {'user': user, 'assignee': assignee or user,
+                              'task_id': sample_task.pk, 'password': password,
+                              'attachment_id': attachment.pk if attachment else 0,
+                              'template_id': template.pk if template else 0,
+                              'calendar_token': user.calendar_token}
+
+
+def run_request(client, method, url, body, headers):
+    """Issue one request inside a rolled-back transaction; returns (seconds, queries, bytes, response)"""
+    queries = 0
+    
+    def count_query(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+    
+    with ExitStack() as stack:
+        # Keep stdout clean for reports
+        stack.enter_context(redirect_stdout(sys.stderr))
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(count_query))
+        stack.enter_context(transaction.atomic())
+        started = time.perf_counter()
+        response = getattr(client, method.lower())(
+            url, data=json.dumps(body) if body is not None else None,
+            content_type='application/json', headers=headers,
+        )
+        # Streamed bodies are generated while they are read; async ones (the calendar
+        # feed) are consumed synchronously here, as under WSGI
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Warning)
+            size = len(b''.join(response))
+        elapsed = time.perf_counter() - started
+        # Keep the dataset identical across iterations, roles and runs
+        transaction.set_rollback(True)
+    return elapsed, queries, size, response
+
+
+def percentile(samples, pct):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+class Command(BaseCommand):
+    help = ('Benchmark every API endpoint through the Django test client as each role and '
+            'report latency percentiles, queries per request and response size as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--roles', nargs='+', choices=ROLES, default=ROLES)
+        parser.add_argument('--endpoints', nargs='+', help='Only benchmark these URL names')
+        parser.add_argument('--password', default='loadtest123',
+                            help='Password of the benchmark users (see seed_load), used by login')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        prepare_environment()
+        if not Task.objects.exists():
+            raise CommandError('No tasks found; run "manage.py seed_load" first')
+        
+        client = Client()
+        results = []
+        for role, headers, ctx in role_contexts(options['roles'], options['password']):
+            if headers is None:
+                self.stderr.write(f'No {role} user found, skipping role')
+                continue
+            
+            for name, method, kwargs, body in iter_routes():
+                if options['endpoints'] and name not in options['endpoints']:
+                    continue
+                url = reverse(name, kwargs=kwargs(ctx) if kwargs else None)
+                payload = body(ctx) if body else None
+                
+                run_request(client, method, url, payload, headers)  # warm-up
+                samples = []
+                for _ in range(options['iterations']):
+                    elapsed, queries, size, response = run_request(client, method, url, payload, headers)
+                    samples.append(elapsed * 1000)
+                
+                results.append({
+                    'endpoint': name,
+                    'method': method,
+                    'path': url,
+                    'role': role,
+                    'status': response.status_code,
+                    'p50_ms': round(percentile(samples, 50), 2),
+                    'p95_ms': round(percentile(samples, 95), 2),
+                    'p99_ms': round(percentile(samples, 99), 2),
+                    'queries': queries,
+                    'bytes': size,
+                })
+                self.stderr.write(f'{role:8} {method:6} {url:45} {results[-1]["p50_ms"]:>9.2f} ms '
+                                  f'{queries:>4} queries')
+        
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                    text=True, cwd=settings.BASE_DIR).stdout.strip() or None
+        except OSError:
+            commit = None
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'commit': commit,
+            'database': connections['default'].vendor,
+            'python': sys.version.split()[0],
+            'iterations': options['iterations'],
+            'dataset': {
+                'users': User.objects.count(),
+                'tasks': Task.objects.count(),
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Wrote {len(results)} results to {options["output"]}'))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,73 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from backend.query_budget import get_query_budget
+from task.management.commands.bench import ROLES, iter_routes, prepare_environment, role_contexts, run_request
+from task.models import Task
+
+
+class Command(BaseCommand):
+    help = ('Run every endpoint as each role against a small and a large dataset (in a test '
+            'database) and fail if a view exceeds its @query_budget or its query count grows with rows')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, nargs=2, default=[40, 50], metavar=('USERS', 'TASKS'))
+        parser.add_argument('--large', type=int, nargs=2, default=[200, 1000], metavar=('USERS', 'TASKS'))
+        parser.add_argument('--history-per-task', type=int, default=3)
+
+    def measure(self, users, tasks, history_per_task):
+        """Query count per (endpoint, method, role) on a freshly seeded dataset"""
+        call_command('seed_load', users=users, tasks=tasks, history_per_task=history_per_task,
+                     clear=True, stdout=StringIO())
+        # Settle overdue tasks up front; the first read would otherwise save each one
+        Task.objects.filter(due_date__lt=timezone.now()).exclude(
+            status__in=['completed', 'overdue']
+        ).update(status='overdue')
+
+        client = Client()
+        counts = {}
+        for role, headers, ctx in role_contexts(ROLES, 'loadtest123'):
+            if headers is None:
+                raise CommandError(f'Seeded dataset has no {role} user; increase the user count')
+            for name, method, kwargs, body in iter_routes():
+                url = reverse(name, kwargs=kwargs(ctx) if kwargs else None)
+                payload = body(ctx) if body else None
+                run_request(client, method, url, payload, headers)  # warm caches
+                _, queries, _, response = run_request(client, method, url, payload, headers)
+                counts[name, method, role] = (queries, response.status_code, resolve(url).func)
+        return counts
+
+    def handle(self, *args, **options):
+        prepare_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            small = self.measure(*options['small'], options['history_per_task'])
+            large = self.measure(*options['large'], options['history_per_task'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        failures = []
+        for key, (queries, status_code, view) in large.items():
+            name, method, role = key
+            small_queries, small_status, _ = small[key]
+            budget = get_query_budget(view)
+            line = f'{role:8} {method:6} {name:25} {small_queries:>4} -> {queries:>4} queries (budget {budget})'
+
+            if budget is None:
+                failures.append(f'{line}: view has no @query_budget')
+            elif max(queries, small_queries) > budget:
+                failures.append(f'{line}: over budget')
+            elif status_code == small_status and queries > small_queries:
+                failures.append(f'{line}: grows with the number of rows')
+            else:
+                self.stdout.write(line)
+
+        if failures:
+            raise CommandError('Query budget check failed:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'{len(large)} endpoint/role combinations within budget'))
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'Run SQLite maintenance: ANALYZE, PRAGMA optimize, incremental vacuum and WAL checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database alias to maintain (default: "default")'
+        )
+        parser.add_argument(
+            '--vacuum-pages', type=int, default=0,
+            help='Maximum free pages to reclaim; 0 reclaims all of them'
+        )
+        parser.add_argument(
+            '--checkpoint', default='TRUNCATE',
+            choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'],
+            help='WAL checkpoint mode (default: TRUNCATE)'
+        )
+        parser.add_argument(
+            '--convert-auto-vacuum', action='store_true',
+            help='Switch an existing database to auto_vacuum=INCREMENTAL (runs a full VACUUM once)'
+        )
+
+    def pragma(self, cursor, statement):
+        cursor.execute(f'PRAGMA {statement}')
+        return cursor.fetchall()
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"db_maintenance only supports SQLite, not {connection.vendor}")
+        
+        with connection.cursor() as cursor:
+            # Refresh planner statistics
+            cursor.execute('ANALYZE')
+            self.pragma(cursor, 'optimize')
+            self.stdout.write('ANALYZE and PRAGMA optimize done')
+            
+            # Reclaim free pages
+            auto_vacuum = self.pragma(cursor, 'auto_vacuum')[0][0]
+            free_before = self.pragma(cursor, 'freelist_count')[0][0]
+            if auto_vacuum != 2 and options['convert_auto_vacuum']:
+                self.pragma(cursor, 'auto_vacuum=INCREMENTAL')
+                cursor.execute('VACUUM')
+                self.stdout.write('Converted database to auto_vacuum=INCREMENTAL')
+            elif auto_vacuum == 2:
+                self.pragma(cursor, f"incremental_vacuum({options['vacuum_pages']})")
+            else:
+                self.stdout.write(self.style.WARNING(
+                    'auto_vacuum is not INCREMENTAL; rerun with --convert-auto-vacuum to enable it'
+                ))
+            free_after = self.pragma(cursor, 'freelist_count')[0][0]
+            self.stdout.write(f'Free pages: {free_before} -> {free_after}')
+            
+            # Fold the WAL back into the main database file
+            if self.pragma(cursor, 'journal_mode')[0][0] == 'wal':
+                busy, wal_pages, checkpointed = self.pragma(
+                    cursor, f"wal_checkpoint({options['checkpoint']})"
+                )[0]
+                if busy:
+                    self.stdout.write(self.style.WARNING(
+                        f'WAL checkpoint incomplete ({checkpointed}/{wal_pages} pages), readers were active'
+                    ))
+                else:
+                    self.stdout.write(f'WAL checkpoint: {checkpointed}/{wal_pages} pages')
+        
+        self.stdout.write(self.style.SUCCESS('Database maintenance completed'))
@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Baseline mirrors the previous settings: rollback journal, deferred
+# transactions and a new connection per request
+PROFILES = {
+    'baseline': {'pragmas': {}, 'transaction_mode': 'DEFERRED', 'persistent': False},
+    'tuned': {'pragmas': None, 'transaction_mode': 'IMMEDIATE', 'persistent': True},
+}
+
+
+def _connect(path, pragmas):
+    conn = sqlite3.connect(path, isolation_level=None)
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name}={value}')
+    return conn
+
+
+def _worker(path, profile, seconds, worker_id, results):
+    """Simulate request handlers updating a task and appending history"""
+    pragmas = profile['pragmas']
+    conn = _connect(path, pragmas) if profile['persistent'] else None
+    ok = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if not profile['persistent']:
+            conn = _connect(path, pragmas)
+        try:
+            conn.execute(f"BEGIN {profile['transaction_mode']}")
+            task_id = (ok + worker_id) % 100 + 1
+            conn.execute('SELECT status FROM bench_tasks WHERE id = ?', (task_id,)).fetchone()
+            conn.execute('UPDATE bench_tasks SET status = ?, updated = ? WHERE id = ?',
+                         ('ongoing', time.time(), task_id))
+            conn.execute('INSERT INTO bench_history (task_id, details) VALUES (?, ?)',
+                         (task_id, '{"changes": {}}'))
+            conn.execute('COMMIT')
+            ok += 1
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            locked += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+        finally:
+            if not profile['persistent']:
+                conn.close()
+    results.put((ok, locked))
+
+
+class Command(BaseCommand):
+    help = 'Measure concurrent SQLite write throughput for the baseline and tuned settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent writer processes')
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each run')
+
+    def run_profile(self, name, profile, workers, seconds):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            conn = _connect(path, profile['pragmas'])
+            conn.execute('CREATE TABLE bench_tasks (id INTEGER PRIMARY KEY, status TEXT, updated REAL)')
+            conn.execute('CREATE TABLE bench_history (id INTEGER PRIMARY KEY, task_id INTEGER, details TEXT)')
+            conn.executemany('INSERT INTO bench_tasks (id, status, updated) VALUES (?, ?, 0)',
+                             [(i, 'pending') for i in range(1, 101)])
+            conn.close()
+            
+            results = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(target=_worker, args=(path, profile, seconds, i, results))
+                for i in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            totals = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+        
+        ok = sum(t[0] for t in totals)
+        locked = sum(t[1] for t in totals)
+        self.stdout.write(
+            f'{name:<9} {ok / seconds:>10.1f} writes/s {ok:>8} committed {locked:>6} "database is locked"'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{options['workers']} writer processes, {options['seconds']}s per profile")
+        for name, profile in PROFILES.items():
+            if profile['pragmas'] is None:
+                profile = dict(profile, pragmas=settings.SQLITE_PRAGMAS)
+            self.run_profile(name, profile, options['workers'], options['seconds'])
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from task.models import TaskAttachment
+from task.storage import store_attachment
+
+
+class Command(BaseCommand):
+    help = 'Move attachments uploaded before content-addressed storage into it, dropping duplicate files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many attachments would move')
+
+    def handle(self, *args, **options):
+        legacy = TaskAttachment.objects.filter(sha256='').order_by('pk')
+        if options['dry_run']:
+            self.stdout.write(f'{legacy.count()} attachments to move')
+            return
+
+        moved = missing = freed = 0
+        for attachment in legacy.iterator():
+            old_name = attachment.file.name
+            storage = attachment.file.storage
+            if not storage.exists(old_name):
+                missing += 1
+                continue
+            with transaction.atomic():
+                with attachment.file.open('rb'):
+                    name, sha256, size = store_attachment(attachment.file)
+                TaskAttachment.objects.filter(pk=attachment.pk).update(file=name, sha256=sha256, file_size=size)
+            if not TaskAttachment.objects.filter(file=old_name).exists():
+                storage.delete(old_name)
+                freed += size
+            moved += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} attachments ({freed / 1024 / 1024:.1f} MB of old files removed), {missing} files missing'
+        ))
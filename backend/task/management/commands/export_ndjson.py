@@ -0,0 +1,124 @@
+import datetime
+import gzip
+import sys
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.migrations.recorder import MigrationRecorder
+
+FORMAT = 'task-schedule-ndjson'
+VERSION = 1
+
+# Recreated by migrate with database-specific ids, so they (and anything pointing
+# at them, e.g. user permissions and admin log entries) are not carried over
+EXCLUDED_MODELS = {'contenttypes.contenttype', 'auth.permission', 'sessions.session'}
+
+
+class DumpEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # Full precision; DjangoJSONEncoder rounds times to milliseconds
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def open_dump(path, mode):
+    """Text stream for path ('-' for stdin/stdout); .gz files are (de)compressed"""
+    if path == '-':
+        return sys.stdin if mode == 'r' else sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def dump_models():
+    """Models to dump, each after the models its foreign keys point to"""
+    excluded = set(EXCLUDED_MODELS)
+    candidates = {}
+    for model in apps.get_models(include_auto_created=True):
+        if model._meta.proxy or not model._meta.managed:
+            continue
+        candidates[model._meta.label_lower] = model
+
+    # Anything referencing an excluded model goes too
+    changed = True
+    while changed:
+        changed = False
+        for label, model in candidates.items():
+            if label not in excluded and any(
+                field.related_model._meta.label_lower in excluded
+                for field in model._meta.concrete_fields if field.is_relation
+            ):
+                excluded.add(label)
+                changed = True
+
+    ordered = []
+    visiting = set()
+
+    def visit(label):
+        if label in excluded or label in ordered:
+            return
+        if label in visiting:
+            raise CommandError(f'Circular foreign keys involving {label}')
+        visiting.add(label)
+        model = candidates[label]
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model is not model:
+                visit(field.related_model._meta.label_lower)
+        visiting.discard(label)
+        ordered.append(label)
+
+    for label in sorted(candidates):
+        visit(label)
+    return [candidates[label] for label in ordered]
+
+
+def applied_migrations(using, models):
+    """Applied migrations of the apps the models belong to, as sorted 'app.name' strings"""
+    app_labels = {model._meta.app_label for model in models}
+    return sorted(
+        f'{app}.{name}' for app, name in MigrationRecorder(connections[using]).applied_migrations()
+        if app in app_labels
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream every table as newline-delimited JSON in foreign-key order, for '
+        'import_ndjson on another database (SQLite or PostgreSQL)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write ("-" for stdout; .gz is compressed)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        models = dump_models()
+        out = open_dump(options['output'], 'w')
+        encoder = DumpEncoder(separators=(',', ':'), ensure_ascii=False)
+        try:
+            # The importing database must be migrated to the same state
+            out.write(encoder.encode({
+                'format': FORMAT,
+                'version': VERSION,
+                'vendor': connections[options['database']].vendor,
+                'migrations': applied_migrations(options['database'], models),
+                'models': [model._meta.label_lower for model in models],
+            }) + '\n')
+            for model in models:
+                label = model._meta.label_lower
+                columns = [field.attname for field in model._meta.concrete_fields]
+                # Plain tuples straight from the cursor, no model instances
+                rows = (model._base_manager.using(options['database'])
+                        .order_by('pk').values_list(*columns).iterator(chunk_size=options['chunk_size']))
+                count = 0
+                for row in rows:
+                    out.write(encoder.encode({'model': label, 'fields': dict(zip(columns, row))}) + '\n')
+                    count += 1
+                self.stderr.write(f'{label}: {count} rows')
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,32 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from task.models import TaskAttachment
+from task.thumbnails import mark_thumbnail_ready, render_thumbnail, thumbnail_kind, thumbnail_path
+
+
+class Command(BaseCommand):
+    help = 'Create missing attachment thumbnails (e.g. for files uploaded before thumbnails existed)'
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        done = set()
+        for attachment in TaskAttachment.objects.filter(has_thumbnail=False).order_by('pk').iterator():
+            kind = thumbnail_kind(attachment.file_name)
+            path = attachment.file.path
+            if kind is None or path in done or not os.path.exists(path):
+                continue
+            done.add(path)
+            if not os.path.exists(thumbnail_path(path)):
+                try:
+                    render_thumbnail(path, settings.THUMBNAIL_SIZE, kind)
+                    created += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{attachment.file_name} (attachment {attachment.pk}): {e}')
+                    continue
+            mark_thumbnail_ready(attachment.file.name)
+
+        self.stdout.write(self.style.SUCCESS(f'Created {created} thumbnails, {failed} failed'))
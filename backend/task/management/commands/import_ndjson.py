@@ -0,0 +1,138 @@
+import json
+import time
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+
+from staff.directory import invalidate_directory
+from task.cache_versions import invalidate_all
+
+from .export_ndjson import EXCLUDED_MODELS, FORMAT, VERSION, applied_migrations, open_dump
+
+
+@contextmanager
+def keep_timestamps(models):
+    """Stop auto_now/auto_now_add fields overwriting the dumped values in bulk_create"""
+    changed = []
+    try:
+        for model in models:
+            for field in model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                    changed.append((field, field.auto_now, field.auto_now_add))
+                    field.auto_now = field.auto_now_add = False
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Load an export_ndjson dump with batched bulk_create (no signals, emails or history '
+        'entries) in one transaction, then reset the primary key sequences'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Dump to read ("-" for stdin; .gz is decompressed)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--flush', action='store_true',
+                            help='Delete the existing rows first instead of requiring empty tables')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        batch_size = options['batch_size']
+        source = open_dump(options['input'], 'r')
+        started = time.perf_counter()
+        try:
+            header = json.loads(source.readline() or '{}')
+            if header.get('format') != FORMAT or header.get('version') != VERSION:
+                raise CommandError(f'{options["input"]} is not a version {VERSION} export_ndjson dump')
+            try:
+                models = [apps.get_model(label) for label in header['models']]
+            except LookupError as e:
+                raise CommandError(str(e))
+
+            applied = applied_migrations(using, models)
+            if applied != header['migrations']:
+                missing = sorted(set(header['migrations']) - set(applied))
+                extra = sorted(set(applied) - set(header['migrations']))
+                raise CommandError(
+                    'The database is not migrated to the same state as the dump '
+                    f'(missing: {", ".join(missing) or "none"}; not in the dump: {", ".join(extra) or "none"})'
+                )
+
+            counts = {}
+            with transaction.atomic(using=using), keep_timestamps(models):
+                if options['flush']:
+                    self.flush(using)
+                else:
+                    populated = [model._meta.label_lower for model in models
+                                 if model._base_manager.using(using).exists()]
+                    if populated:
+                        raise CommandError(f'Tables are not empty: {", ".join(populated)} (use --flush)')
+
+                fields = {
+                    model._meta.label_lower: {field.attname: field for field in model._meta.concrete_fields}
+                    for model in models
+                }
+                by_label = {model._meta.label_lower: model for model in models}
+                label, batch = None, []
+                for number, line in enumerate(source, 2):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record['model'] != label:
+                        self.insert(by_label.get(label), batch, using)
+                        label, batch = record['model'], []
+                        if label not in by_label:
+                            raise CommandError(f'Line {number}: {label} is not listed in the dump header')
+                    model_fields = fields[label]
+                    try:
+                        values = {name: model_fields[name].to_python(value)
+                                  for name, value in record['fields'].items()}
+                    except Exception as e:
+                        raise CommandError(f'Line {number}: {e}')
+                    batch.append(by_label[label](**values))
+                    counts[label] = counts.get(label, 0) + 1
+                    if len(batch) >= batch_size:
+                        self.insert(by_label[label], batch, using)
+                        batch = []
+                self.insert(by_label.get(label), batch, using)
+
+                # Rows were inserted with their original ids; move the sequences past them
+                connection = connections[using]
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                        cursor.execute(sql)
+                # bulk_create skips the signals that refresh the cached user directory and task views
+                transaction.on_commit(invalidate_directory, using=using)
+                transaction.on_commit(invalidate_all, using=using)
+        finally:
+            if options['input'] != '-':
+                source.close()
+
+        for label in header['models']:
+            self.stdout.write(f'{label}: {counts.get(label, 0)} rows')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {sum(counts.values())} rows in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def flush(self, using):
+        # What manage.py flush runs (TRUNCATE ... CASCADE on PostgreSQL), limited to
+        # the tables the dump replaces plus those pointing at them, e.g. admin log
+        # entries and user permissions. Permissions and content types stay; they
+        # belong to the migrated schema.
+        connection = connections[using]
+        tables = [
+            model._meta.db_table for model in apps.get_models(include_auto_created=True)
+            if not model._meta.proxy and model._meta.managed and model._meta.label_lower not in EXCLUDED_MODELS
+        ]
+        connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables, allow_cascade=True))
+
+    def insert(self, model, batch, using):
+        if batch:
+            model._base_manager.using(using).bulk_create(batch, batch_size=len(batch))
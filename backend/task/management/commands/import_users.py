@@ -0,0 +1,43 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from staff.bulk_import import BulkImportError, import_users, parse_rows
+
+
+class Command(BaseCommand):
+    help = 'Create users from a CSV (with a header line) or JSON file: name, email, role, department, password'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'],
+                            help='Defaults to the file extension')
+        parser.add_argument('--skip-invalid', action='store_true',
+                            help='Import the valid rows even when others have errors')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('json' if path.lower().endswith('.json') else 'csv')
+        try:
+            with open(path, encoding='utf-8-sig') as f:
+                rows = parse_rows(f.read(), fmt)
+            started = time.perf_counter()
+            result = import_users(rows, skip_invalid=options['skip_invalid'], dry_run=options['dry_run'])
+        except (OSError, BulkImportError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            details = '; '.join(f'{field}: {" ".join(map(str, messages))}' for field, messages in error['errors'].items())
+            self.stderr.write(f"Row {error['row']} ({error['email']}): {details}")
+
+        if result['errors'] and not options['skip_invalid']:
+            raise CommandError(f"{len(result['errors'])} of {result['total']} rows have errors; nothing was imported")
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"{result['total'] - len(result['errors'])} rows are valid"))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} users from {os.path.basename(path)} "
+            f"in {time.perf_counter() - started:.1f}s ({len(result['errors'])} rows skipped)"
+        ))
@@ -0,0 +1,82 @@
+import json
+import statistics
+import threading
+import time
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Hammer a running server with concurrent requests and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Endpoint path, e.g. /api/tasks/')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--email', help='Log in as this user to get a token')
+        parser.add_argument('--password')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--seconds', type=float, default=10)
+
+    def login(self, base, email, password):
+        conn = HTTPConnection(base.hostname, base.port or 80, timeout=30)
+        conn.request('POST', '/api/auth/login/', json.dumps({'email': email, 'password': password}),
+                     {'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise CommandError(f'Login failed ({response.status}): {body[:200]!r}')
+        return json.loads(body)['token']
+
+    def handle(self, *args, **options):
+        base = urlsplit(options['base_url'])
+        headers = {'Content-Type': 'application/json'}
+        if options['email']:
+            headers['Authorization'] = f"Bearer {self.login(base, options['email'], options['password'])}"
+        
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+        
+        def client():
+            conn = HTTPConnection(base.hostname, base.port or 80, timeout=60)
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                try:
+                    conn.request(options['method'], options['path'], headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    ok = response.status < 500
+                except Exception as e:
+                    conn.close()
+                    conn = HTTPConnection(base.hostname, base.port or 80, timeout=60)
+                    ok = False
+                    response = e
+                elapsed = time.monotonic() - started
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        errors.append(getattr(response, 'status', repr(response)))
+            conn.close()
+        
+        threads = [threading.Thread(target=client) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        if not latencies:
+            raise CommandError(f'No successful requests ({len(errors)} errors, e.g. {errors[:3]})')
+        
+        latencies.sort()
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(
+            f"{options['method']} {options['path']} x{options['concurrency']}: "
+            f"{len(latencies) / options['seconds']:.1f} req/s, "
+            f"p50 {quantiles[49] * 1000:.0f} ms, p95 {quantiles[94] * 1000:.0f} ms, "
+            f"{len(errors)} errors"
+        )
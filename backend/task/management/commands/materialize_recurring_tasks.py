@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from task.models import TaskAssignment
+from task.recurring import materialize_due_templates
+from task.utils import send_task_assignment_email
+
+
+class Command(BaseCommand):
+    help = ('Create tasks for recurring template occurrences due within '
+            'RECURRING_TASK_HORIZON_DAYS and email their assignees')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep running every N seconds instead of once'
+        )
+        parser.add_argument('--no-email', action='store_true', help="Don't send assignment emails")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            tasks = materialize_due_templates()
+            if tasks and not options['no_email']:
+                assignments = TaskAssignment.objects.filter(task__in=tasks).select_related('task', 'assignee')
+                for assignment in assignments:
+                    send_task_assignment_email(assignment.task, assignment.assignee)
+            self.stdout.write(self.style.SUCCESS(
+                f"Created {len(tasks)} recurring tasks in {time.monotonic() - started:.2f}s"
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
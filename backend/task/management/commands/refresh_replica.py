@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+from backend.db_routers import REPLICA_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'Refresh the SQLite read-replica snapshot from the primary database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep refreshing every N seconds instead of running once'
+        )
+
+    def refresh(self, source_path, replica_path):
+        tmp_path = f'{replica_path}.tmp'
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(tmp_path)
+        try:
+            # Online backup API: consistent copy without blocking writers for long
+            source.backup(target, pages=1024)
+            # Single-file snapshot, no -wal/-shm next to it
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+            source.close()
+        # Atomic swap; open replica connections keep reading the old file
+        os.replace(tmp_path, replica_path)
+
+    def handle(self, *args, **options):
+        if REPLICA_DB_ALIAS not in connections.databases:
+            raise CommandError('No replica database configured (set SQLITE_REPLICA=True)')
+        
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        replica = connections[REPLICA_DB_ALIAS].settings_dict
+        if primary['ENGINE'] != replica['ENGINE'] or replica['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('refresh_replica only manages SQLite snapshot replicas')
+        
+        while True:
+            started = time.monotonic()
+            self.refresh(primary['NAME'], replica['NAME'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Replica refreshed in {time.monotonic() - started:.2f}s"
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,45 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.utils import timezone
+
+from task.analytics import rollup_days
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily task analytics served by /api/analytics/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ANALYTICS_ROLLUP_DAYS,
+            help='Recompute this many days up to today (default: ANALYTICS_ROLLUP_DAYS)'
+        )
+        parser.add_argument('--since', help='Recompute from this date (YYYY-MM-DD) instead, e.g. to backfill')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep running every N seconds instead of once'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date like 2025-01-31')
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+
+        while True:
+            started = time.monotonic()
+            today = timezone.localdate()
+            start = since or today - timedelta(days=options['days'] - 1)
+            rows = rollup_days(start, today)
+            self.stdout.write(self.style.SUCCESS(
+                f"Stored {rows} rollup rows for {start} to {today} in {time.monotonic() - started:.2f}s"
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
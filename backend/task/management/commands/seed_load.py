@@ -0,0 +1,145 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from staff.directory import invalidate_directory
+from staff.models import User
+from task.cache_versions import invalidate_all
+from task.models import RecurringTaskTemplate, Task, TaskAssignment, TaskHistory
+
+SEED_EMAIL_DOMAIN = 'load.test'
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic dataset (users, tasks, assignments, history) for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--tasks', type=int, default=2000)
+        parser.add_argument('--history-per-task', type=int, default=5)
+        parser.add_argument('--templates', type=int, default=10, help='Recurring task templates')
+        parser.add_argument('--password', default='loadtest123',
+                            help='Password shared by all generated users')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for repeatable data')
+        parser.add_argument('--clear', action='store_true',
+                            help=f'Delete previously generated data (@{SEED_EMAIL_DOMAIN} users and their tasks) first')
+
+    def clear(self):
+        seeded = User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}')
+        Task.objects.filter(assignments__assignee__in=seeded).delete()
+        RecurringTaskTemplate.objects.filter(assignees__in=seeded).delete()
+        deleted, _ = seeded.delete()
+        self.stdout.write(f'Removed previously generated data ({deleted} rows)')
+
+    def create_users(self, count, password):
+        departments = [code for code, _ in User.DEPARTMENT_CHOICES]
+        # Hash once; PBKDF2 per user would dominate the runtime
+        password_hash = make_password(password)
+        start = User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}').count()
+        
+        users = []
+        for i in range(start, start + count):
+            department = departments[i % len(departments)]
+            if i < len(departments):
+                role = 'hod'  # one HOD per department first
+            elif i % 20 == 0:
+                role = 'admin'
+            elif i % 5 == 0:
+                role = 'staff'
+            else:
+                role = 'faculty'
+            users.append(User(
+                email=f'{role}{i}@{SEED_EMAIL_DOMAIN}',
+                first_name=f'{role.title()}{i}',
+                last_name=department.title(),
+                role=role,
+                department=department,
+                password=password_hash,
+            ))
+        users = User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        # bulk_create skips the signals that refresh the cached user directory
+        invalidate_directory()
+        return users
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        
+        with transaction.atomic():
+            if options['clear']:
+                self.clear()
+            
+            users = self.create_users(options["users"], options["password"])
+            assignable = [u for u in users if u.role in ('faculty', 'staff', 'hod')] or users
+            actors = [u for u in users if u.role in ('admin', 'staff')] or users
+            
+            priorities = [code for code, _ in Task.PRIORITY_CHOICES]
+            statuses = [code for code, _ in Task.STATUS_CHOICES]
+            tasks = []
+            for i in range(options['tasks']):
+                due_date = now + timedelta(hours=rng.randint(-24 * 30, 24 * 60))
+                status = rng.choice(statuses)
+                tasks.append(Task(
+                    title=f'Load task {i}',
+                    description=' '.join(['Synthetic task description.'] * rng.randint(1, 20)),
+                    priority=rng.choice(priorities),
+                    status=status,
+                    due_date=due_date,
+                    completed_at=due_date - timedelta(hours=rng.randint(1, 72)) if status == 'completed' else None,
+                    created_by=rng.choice(actors).get_full_name(),
+                    reminder1=due_date - timedelta(days=1) if rng.random() < 0.5 else None,
+                ))
+            tasks = Task.objects.bulk_create(tasks, batch_size=BATCH_SIZE)
+            
+            assignments = []
+            history = []
+            for task in tasks:
+                for assignee in rng.sample(assignable, k=min(len(assignable), rng.randint(1, 3))):
+                    assignments.append(TaskAssignment(
+                        task=task, assignee=assignee, department=assignee.department or 'GENERAL'
+                    ))
+                for j in range(options['history_per_task']):
+                    follow_comment = f'Follow-up note {j}' if rng.random() < 0.3 else None
+                    details = {'changes': {}, 'updated_fields': []}
+                    if follow_comment:
+                        details['follow_comment'] = follow_comment
+                    history.append(TaskHistory(
+                        task=task,
+                        action='created' if j == 0 else 'updated',
+                        performed_by=rng.choice(actors),
+                        details=details,
+                        comment=follow_comment,
+                    ))
+            TaskAssignment.objects.bulk_create(assignments, batch_size=BATCH_SIZE)
+            TaskHistory.objects.bulk_create(history, batch_size=BATCH_SIZE)
+            
+            rules = ['FREQ=DAILY', 'FREQ=WEEKLY;BYDAY=MO', 'FREQ=WEEKLY;BYDAY=MO,TH', 'FREQ=MONTHLY;BYMONTHDAY=-1']
+            templates = RecurringTaskTemplate.objects.bulk_create([
+                RecurringTaskTemplate(
+                    title=f'Load recurring task {i}',
+                    description='Synthetic recurring duty.',
+                    priority=rng.choice(priorities),
+                    created_by=rng.choice(actors).get_full_name(),
+                    recurrence=rules[i % len(rules)],
+                    dtstart=now.replace(hour=9, minute=0, second=0, microsecond=0),
+                )
+                for i in range(options['templates'])
+            ])
+            RecurringTaskTemplate.assignees.through.objects.bulk_create([
+                RecurringTaskTemplate.assignees.through(recurringtasktemplate=template, user=assignee)
+                for template in templates
+                for assignee in rng.sample(assignable, k=min(len(assignable), rng.randint(1, 3)))
+            ])
+        # Nor the ones that refresh cached task lists and calendar feeds
+        invalidate_all()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users, {len(tasks)} tasks, {len(assignments)} assignments, '
+            f'{len(history)} history entries and {len(templates)} recurring templates '
+            f'(password: {options["password"]})'
+        ))
@@ -1,15 +1,17 @@
+import time
+
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from task.models import Task
-from task.utils import send_deadline_reminder_email, send_overdue_notification
+from task.utils import send_deadline_reminder_email, send_overdue_notification, send_mail
+from backend.metrics import REMINDER_LAG, SCHEDULER_LAST_SUCCESS, SCHEDULER_RUN_DURATION
 from datetime import timedelta
-from django.core.mail import send_mail
 from django.conf import settings
 
 class Command(BaseCommand):
     help = 'Send deadline reminder emails for tasks'
 
-    def send_custom_reminder_email(self, task, assignee, reminder_type):
+    def send_custom_reminder_email(self, task, assignee, reminder_type, reminder_at):
         """Send custom reminder email for reminder1 or reminder2"""
         try:
             subject = f"Reminder: {task.title}"
@@ -33,6 +35,7 @@ class Command(BaseCommand):
             """
             
             send_mail(
+                notification='reminder',
                 subject=subject,
                 message='',
                 html_message=html_message,
@@ -40,6 +43,8 @@ class Command(BaseCommand):
                 recipient_list=[assignee.email],
                 fail_silently=True
             )
+            # How late the reminder went out relative to its scheduled time
+            REMINDER_LAG.labels(reminder_type).observe(max((timezone.now() - reminder_at).total_seconds(), 0))
             
             self.stdout.write(
                 self.style.SUCCESS(f"Sent {reminder_type} email for task '{task.title}' to {assignee.email}")
@@ -50,6 +55,7 @@ class Command(BaseCommand):
             )
 
     def handle(self, *args, **options):
+        started = time.monotonic()
         now = timezone.now()
         
         # Get tasks that are due within next 24 hours
@@ -57,10 +63,10 @@ class Command(BaseCommand):
             status='pending',
             due_date__gt=now,
             due_date__lte=now + timedelta(hours=24)
-        ).select_related('created_by').prefetch_related('assignments__assignee')
+        ).prefetch_related('assignments__assignee')
 
         # Send reminders for upcoming deadlines
-        for task in upcoming_tasks:
+        for task in upcoming_tasks.iterator(chunk_size=settings.DB_ITERATOR_CHUNK_SIZE):
             for assignment in task.assignments.all():
                 hours_until_deadline = (task.due_date - now).total_seconds() / 3600
                 # Send reminder every 4 hours when deadline is within 24 hours
@@ -71,10 +77,10 @@ class Command(BaseCommand):
         overdue_tasks = Task.objects.filter(
             status='pending',
             due_date__lt=now
-        ).select_related('created_by').prefetch_related('assignments__assignee')
+        ).prefetch_related('assignments__assignee')
 
         # Send overdue notifications
-        for task in overdue_tasks:
+        for task in overdue_tasks.iterator(chunk_size=settings.DB_ITERATOR_CHUNK_SIZE):
             for assignment in task.assignments.all():
                 send_overdue_notification(task, assignment.assignee)
         
@@ -86,12 +92,12 @@ class Command(BaseCommand):
             reminder1__isnull=False,
             reminder1__lte=now + reminder1_buffer,
             reminder1__gte=now - reminder1_buffer
-        ).select_related('created_by').prefetch_related('assignments__assignee')
+        ).prefetch_related('assignments__assignee')
         
         # Send reminder1 notifications
-        for task in reminder1_tasks:
+        for task in reminder1_tasks.iterator(chunk_size=settings.DB_ITERATOR_CHUNK_SIZE):
             for assignment in task.assignments.all():
-                self.send_custom_reminder_email(task, assignment.assignee, "First Reminder")
+                self.send_custom_reminder_email(task, assignment.assignee, "First Reminder", task.reminder1)
         
         # Check for custom reminder2 tasks
         reminder2_tasks = Task.objects.filter(
@@ -99,16 +105,19 @@ class Command(BaseCommand):
             reminder2__isnull=False,
             reminder2__lte=now + reminder1_buffer,
             reminder2__gte=now - reminder1_buffer
-        ).select_related('created_by').prefetch_related('assignments__assignee')
+        ).prefetch_related('assignments__assignee')
         
         # Send reminder2 notifications
-        for task in reminder2_tasks:
+        for task in reminder2_tasks.iterator(chunk_size=settings.DB_ITERATOR_CHUNK_SIZE):
             for assignment in task.assignments.all():
-                self.send_custom_reminder_email(task, assignment.assignee, "Second Reminder")
+                self.send_custom_reminder_email(task, assignment.assignee, "Second Reminder", task.reminder2)
                 
         self.stdout.write(
             self.style.SUCCESS(
                 f'Successfully processed: {upcoming_tasks.count()} upcoming, {overdue_tasks.count()} overdue, ' +
                 f'{reminder1_tasks.count()} first reminders, and {reminder2_tasks.count()} second reminders'
             )
-        )
\ No newline at end of file
+        )
+        
+        SCHEDULER_RUN_DURATION.set(time.monotonic() - started)
+        SCHEDULER_LAST_SUCCESS.set_to_current_time()
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_follow_comments(apps, schema_editor):
+    """Mirror details['follow_comment'] into the comment column for older rows"""
+    TaskHistory = apps.get_model('task', 'TaskHistory')
+    batch = []
+    rows = TaskHistory.objects.filter(
+        action='updated', comment__isnull=True
+    ).only('id', 'details').iterator(chunk_size=500)
+    for entry in rows:
+        follow_comment = (entry.details or {}).get('follow_comment')
+        if follow_comment:
+            entry.comment = follow_comment
+            batch.append(entry)
+        if len(batch) >= 500:
+            TaskHistory.objects.bulk_update(batch, ['comment'])
+            batch = []
+    if batch:
+        TaskHistory.objects.bulk_update(batch, ['comment'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0002_taskassignment_visibility_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_follow_comments, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='taskhistory',
+            name='task_histor_details_a49ddc_idx',
+        ),
+        migrations.AddIndex(
+            model_name='taskhistory',
+            index=models.Index(condition=models.Q(('comment__isnull', False)), fields=['-timestamp'], name='task_history_comments_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0004_attachment_blobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringTaskTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('priority', models.CharField(choices=[('urgent', 'Urgent'), ('high', 'High'), ('medium', 'Medium'), ('low', 'Low')], default='medium', max_length=20)),
+                ('created_by', models.CharField(help_text='Name of the person who requested these tasks', max_length=255)),
+                ('recurrence', models.CharField(help_text='e.g. "FREQ=WEEKLY;BYDAY=MO"', max_length=255)),
+                ('dtstart', models.DateTimeField(help_text='First occurrence; later ones keep its time of day')),
+                ('departments', models.JSONField(blank=True, default=list)),
+                ('is_active', models.BooleanField(default=True)),
+                ('materialized_until', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('assignees', models.ManyToManyField(blank=True, related_name='recurring_tasks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'recurring_task_templates',
+                'ordering': ['title'],
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurring_template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tasks', to='task.recurringtasktemplate'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurring_template__isnull', False)), fields=('recurring_template', 'due_date'), name='tasks_one_per_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringtasktemplate',
+            index=models.Index(fields=['is_active', 'materialized_until'], name='recurring_t_is_acti_05e5d1_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0005_recurring_task_templates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('dimension', models.CharField(choices=[('all', 'All tasks'), ('priority', 'Priority'), ('department', 'Department'), ('assignee', 'Assignee')], max_length=20)),
+                ('key', models.CharField(blank=True, max_length=255)),
+                ('department', models.CharField(blank=True, max_length=50)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('completed_on_time', models.PositiveIntegerField(default=0)),
+                ('hours_to_complete_mean', models.FloatField(blank=True, null=True)),
+                ('hours_to_complete_p90', models.FloatField(blank=True, null=True)),
+                ('overdue', models.PositiveIntegerField(default=0)),
+                ('overdue_age_days_mean', models.FloatField(blank=True, null=True)),
+                ('overdue_age_days_p90', models.FloatField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'task_daily_stats',
+                'ordering': ['date', 'key'],
+                'indexes': [models.Index(fields=['dimension', 'date'], name='task_daily__dimensi_149730_idx'), models.Index(fields=['dimension', 'department', 'date'], name='task_daily__dimensi_4b5451_idx')],
+                'unique_together': {('dimension', 'key', 'department', 'date')},
+            },
+        ),
+    ]
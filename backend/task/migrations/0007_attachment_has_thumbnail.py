@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:23
+
+import os
+
+from django.db import migrations, models
+
+
+def mark_existing_thumbnails(apps, schema_editor):
+    # Thumbnails rendered before the flag existed (task.thumbnails.thumbnail_path)
+    TaskAttachment = apps.get_model('task', 'TaskAttachment')
+    ready = [
+        attachment.pk for attachment in TaskAttachment.objects.only('file').iterator()
+        if attachment.file and os.path.exists(attachment.file.path + '.webp')
+    ]
+    TaskAttachment.objects.filter(pk__in=ready).update(has_thumbnail=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0006_task_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskattachment',
+            name='has_thumbnail',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_existing_thumbnails, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,41 @@
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q, Exists, OuterRef
+import logging
 
-class Task(models.Model):
+from backend.dirty_fields import DirtyFieldsMixin
+
+logger = logging.getLogger(__name__)
+
+
+def task_visibility_filter(user, task_ref='pk'):
+    """Return the filter limiting tasks to what ``user`` may see, or None for everything.
+
+    ``task_ref`` names the task column on the outer query ('pk' for Task,
+    'task' for models with a task foreign key). HOD and faculty scoping is an
+    EXISTS probe on task_assignments, so no join or DISTINCT is needed.
+    """
+    if user.role in ['admin', 'staff'] or user.is_superuser:
+        return None
+    if user.role == 'hod':
+        scope = {'department': user.department}
+    elif user.role == 'faculty':
+        scope = {'assignee_id': user.pk}
+    else:
+        return Q(pk__in=[])
+    return Exists(TaskAssignment.objects.filter(task_id=OuterRef(task_ref), **scope))
+
+
+class TaskQuerySet(models.QuerySet):
+    """Role-scoped access path shared by the views and permission classes"""
+
+    def visible_to(self, user):
+        condition = task_visibility_filter(user)
+        return self if condition is None else self.filter(condition)
+
+
+class Task(DirtyFieldsMixin, models.Model):
     """Main task model with hierarchical delegation support"""
     
     PRIORITY_CHOICES = [
@@ -44,13 +76,16 @@ class Task(models.Model):
         related_name='subtasks'
     )
     
-    # Keep track of previous status to detect changes
-    _original_status = None
+    # Set on occurrences materialized from a recurring template (task.recurring)
+    recurring_template = models.ForeignKey(
+        'RecurringTaskTemplate',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='tasks'
+    )
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Store the original status when instance is loaded
-        self._original_status = self.status
+    objects = TaskQuerySet.as_manager()
     
     class Meta:
         db_table = 'tasks'
@@ -64,26 +99,35 @@ class Task(models.Model):
             models.Index(fields=['reminder1']),  # NEW: Index for reminders
             models.Index(fields=['reminder2']),  # NEW: Index for reminders
         ]
+        constraints = [
+            # One task per template occurrence, however often the generator runs
+            models.UniqueConstraint(
+                fields=['recurring_template', 'due_date'],
+                condition=Q(recurring_template__isnull=False),
+                name='tasks_one_per_occurrence',
+            ),
+        ]
     
     def __str__(self):
         return self.title
     
     def save(self, *args, **kwargs):
-        """Override save method to handle status change emails"""
+        """Write the changed columns in one statement and send status change emails"""
         from .utils import send_status_update_email
         
         # Detect if status has changed
-        status_changed = self.pk is not None and self._original_status != self.status
-        
-        # Perform standard save
-        result = super().save(*args, **kwargs)
+        dirty = self.get_dirty_fields() if self.pk is not None else {}
+        status_changed = 'status' in dirty
+        old_status = dirty.get('status')
         
-        # Handle completion logic
+        # Completion time goes into the same UPDATE
         if self.status == 'completed' and not self.completed_at:
             self.completed_at = timezone.now()
-            # Save again if we updated completed_at
-            if 'update_fields' not in kwargs or 'completed_at' not in kwargs['update_fields']:
-                super().save(update_fields=['completed_at'])
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'completed_at' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'completed_at']
+        
+        result = super().save(*args, **kwargs)
         
         # Send notifications if status changed
         if status_changed:
@@ -93,21 +137,35 @@ class Task(models.Model):
                     send_status_update_email(
                         task=self,
                         assignee=assignment.assignee,
-                        old_status=self._original_status,
+                        old_status=old_status,
                         new_status=self.status
                     )
-            except Exception as e:
-                print(f"Error sending status change email: {str(e)}")
-        
-        # Update our status tracker
-        self._original_status = self.status
+            except Exception:
+                logger.warning("error sending status change email", extra={'task_id': self.pk}, exc_info=True)
         
         return result
     
+    def is_visible_to(self, user):
+        """Check role visibility, using prefetched assignments when available"""
+        if user.role in ['admin', 'staff'] or user.is_superuser:
+            return True
+        if user.role not in ['hod', 'faculty']:
+            return False
+        
+        if 'assignments' in getattr(self, '_prefetched_objects_cache', {}):
+            if user.role == 'hod':
+                return any(a.department == user.department for a in self.assignments.all())
+            return any(a.assignee_id == user.pk for a in self.assignments.all())
+        
+        if user.role == 'hod':
+            return self.assignments.filter(department=user.department).exists()
+        return self.assignments.filter(assignee_id=user.pk).exists()
+    
     def update_status(self):
         """Auto-update status based on due date"""
         try:
-            if self.status != 'completed' and self.due_date:
+            # Already-overdue tasks are skipped so list reads don't rewrite them
+            if self.status not in ('completed', 'overdue') and self.due_date:
                 # Ensure both datetimes are timezone-aware
                 now = timezone.now()
                 due_date = self.due_date
@@ -123,12 +181,12 @@ class Task(models.Model):
                     
                     # Status updated notification happens in save method
             
-        except Exception as e:
+        except Exception:
             # Log the error but don't break the API
-            print(f"Error updating task status for task {self.id}: {str(e)}")
+            logger.warning("error updating task status", extra={'task_id': self.pk}, exc_info=True)
 
 
-class TaskAssignment(models.Model):
+class TaskAssignment(DirtyFieldsMixin, models.Model):
     """Many-to-many relationship between tasks and assignees with departments"""
     
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='assignments')
@@ -147,12 +205,22 @@ class TaskAssignment(models.Model):
         indexes = [
             models.Index(fields=['task', 'assignee']),
             models.Index(fields=['department']),
+            # Covering indexes for the role visibility EXISTS probes
+            models.Index(fields=['department', 'task']),
+            models.Index(fields=['assignee', 'task']),
         ]
     
     def __str__(self):
         return f"{self.task.title} -> {self.assignee.get_full_name()}"
 
 
+class TaskHistoryQuerySet(models.QuerySet):
+    
+    def visible_to(self, user):
+        condition = task_visibility_filter(user, task_ref='task')
+        return self if condition is None else self.filter(condition)
+
+
 class TaskHistory(models.Model):
     """Complete audit trail for all task changes"""
     
@@ -176,27 +244,55 @@ class TaskHistory(models.Model):
     details = models.JSONField(default=dict)  # Store change details, including follow_comment
     comment = models.TextField(null=True, blank=True, help_text="Dedicated follow-up comment or note")
     
+    objects = TaskHistoryQuerySet.as_manager()
+    
     class Meta:
         db_table = 'task_history'
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['task', '-timestamp']),
-            models.Index(fields=['details']),  # NEW: Index on JSON details for follow_comment queries
+            # Follow-up comments live in the plain comment column so the lookup
+            # works the same on SQLite and PostgreSQL
+            models.Index(
+                fields=['-timestamp'],
+                condition=Q(comment__isnull=False),
+                name='task_history_comments_idx',
+            ),
         ]
     
     def __str__(self):
         return f"{self.task.title} - {self.action} by {self.performed_by}"
 
 
+class AttachmentBlob(models.Model):
+    """A stored attachment file, kept once per distinct content (see task/storage.py)"""
+    
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()  # in bytes
+    ref_count = models.PositiveIntegerField(default=0)  # TaskAttachment rows using this blob
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'attachment_blobs'
+    
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} refs)"
+
+
 class TaskAttachment(models.Model):
     """File attachments for tasks"""
     
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='attachments')
+    # New uploads are stored by content under attachments/ (task.storage.store_attachment);
+    # upload_to only applies to files saved through the field directly
     file = models.FileField(upload_to='task_attachments/%Y/%m/%d/')
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     file_name = models.CharField(max_length=255)
     file_size = models.IntegerField()  # in bytes
+    sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True)  # empty for legacy files
+    # Set once task.thumbnails has rendered the file's thumbnail
+    has_thumbnail = models.BooleanField(default=False)
     
     class Meta:
         db_table = 'task_attachments'
@@ -206,4 +302,112 @@ class TaskAttachment(models.Model):
         ]
     
     def __str__(self):
-        return f"Attachment for {self.task.title} - {self.file.name}"
\ No newline at end of file
+        return f"Attachment for {self.task.title} - {self.file.name}"
+
+
+class RecurringTaskTemplateQuerySet(models.QuerySet):
+    
+    def visible_to(self, user):
+        """Templates assigned to someone the user may see tasks of (see task_visibility_filter)"""
+        if user.role in ['admin', 'staff'] or user.is_superuser:
+            return self
+        if user.role == 'hod':
+            scope = {'user__department': user.department}
+        elif user.role == 'faculty':
+            scope = {'user_id': user.pk}
+        else:
+            return self.none()
+        return self.filter(Exists(
+            RecurringTaskTemplate.assignees.through.objects.filter(recurringtasktemplate_id=OuterRef('pk'), **scope)
+        ))
+
+
+class RecurringTaskTemplate(models.Model):
+    """A task that repeats on a schedule (see task/recurrence.py for the rule syntax).
+
+    Only occurrences inside the rolling horizon (RECURRING_TASK_HORIZON_DAYS) are
+    stored as Task rows, by ``manage.py materialize_recurring_tasks``; later ones
+    are computed on demand for calendars.
+    """
+    
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    priority = models.CharField(max_length=20, choices=Task.PRIORITY_CHOICES, default='medium')
+    created_by = models.CharField(max_length=255, help_text="Name of the person who requested these tasks")
+    recurrence = models.CharField(max_length=255, help_text='e.g. "FREQ=WEEKLY;BYDAY=MO"')
+    dtstart = models.DateTimeField(help_text="First occurrence; later ones keep its time of day")
+    assignees = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='recurring_tasks', blank=True)
+    departments = models.JSONField(default=list, blank=True)
+    is_active = models.BooleanField(default=True)
+    # Occurrences up to here exist as tasks
+    materialized_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = RecurringTaskTemplateQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'recurring_task_templates'
+        ordering = ['title']
+        indexes = [
+            models.Index(fields=['is_active', 'materialized_until']),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} ({self.recurrence})"
+    
+    @property
+    def rule(self):
+        from .recurrence import RecurrenceRule
+        return RecurrenceRule.parse(self.recurrence)
+    
+    def occurrences(self, after, before):
+        """Due dates in (after, before]"""
+        return self.rule.between(self.dtstart, after, before)
+
+
+class TaskDailyStats(models.Model):
+    """Task analytics for one day and group, rolled up by manage.py rollup_task_analytics.
+
+    Counts are of tasks created/completed that day and of tasks overdue at the
+    end of it (or at the time of the rollup, for today). Rows for departments
+    and assignees count each assignment, so a task assigned to two departments
+    counts in both.
+    """
+    
+    DIMENSION_CHOICES = [
+        ('all', 'All tasks'),
+        ('priority', 'Priority'),
+        ('department', 'Department'),
+        ('assignee', 'Assignee'),
+    ]
+    
+    date = models.DateField()
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    # The priority, department or assignee email; empty for 'all'
+    key = models.CharField(max_length=255, blank=True)
+    # Department of department/assignee rows, for HOD scoping
+    department = models.CharField(max_length=50, blank=True)
+    
+    created = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    completed_on_time = models.PositiveIntegerField(default=0)
+    # created_at -> completed_at of the tasks completed that day
+    hours_to_complete_mean = models.FloatField(null=True, blank=True)
+    hours_to_complete_p90 = models.FloatField(null=True, blank=True)
+    overdue = models.PositiveIntegerField(default=0)
+    # Days past the due date of the overdue tasks
+    overdue_age_days_mean = models.FloatField(null=True, blank=True)
+    overdue_age_days_p90 = models.FloatField(null=True, blank=True)
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'task_daily_stats'
+        ordering = ['date', 'key']
+        unique_together = ['dimension', 'key', 'department', 'date']
+        indexes = [
+            models.Index(fields=['dimension', 'date']),
+            models.Index(fields=['dimension', 'department', 'date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.dimension} {self.key}"
@@ -33,8 +33,8 @@ class IsHOD(permissions.BasePermission):
     
     def has_object_permission(self, request, view, obj):
         # For tasks, check if task is assigned to someone in HOD's department
-        if hasattr(obj, 'assignments'):
-            return obj.assignments.filter(department=request.user.department).exists()
+        if hasattr(obj, 'is_visible_to'):
+            return obj.is_visible_to(request.user)
         return False
 
 class IsFaculty(permissions.BasePermission):
@@ -45,6 +45,6 @@ class IsFaculty(permissions.BasePermission):
     
     def has_object_permission(self, request, view, obj):
         # For tasks, check if faculty is assigned to the task
-        if hasattr(obj, 'assignments'):
-            return obj.assignments.filter(assignee=request.user).exists()
+        if hasattr(obj, 'is_visible_to'):
+            return obj.is_visible_to(request.user)
         return False
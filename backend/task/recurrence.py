@@ -0,0 +1,182 @@
+"""
+Recurrence rules for recurring task templates.
+
+A small subset of RFC 5545 RRULEs, enough for departmental duties:
+
+    FREQ=DAILY|WEEKLY|MONTHLY       required
+    INTERVAL=n                      every n days/weeks/months (default 1)
+    BYDAY=MO,WE,FR                  weekly: weekdays (default: the start's weekday)
+    BYDAY=1MO,-1FR                  monthly: first Monday, last Friday, ...
+    BYMONTHDAY=1,15,-1              monthly: days of the month, -1 is the last day
+    COUNT=n / UNTIL=YYYYMMDD[THHMMSSZ]
+
+e.g. "FREQ=WEEKLY;BYDAY=MO" or "FREQ=MONTHLY;BYMONTHDAY=-1". Occurrences keep
+the wall-clock time of the start in the project time zone (TIME_ZONE), and are
+computed on demand: the first period that can contain the requested range is
+calculated directly, so a range far in the future costs the same as next week.
+"""
+
+import calendar
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+FREQUENCIES = ['DAILY', 'WEEKLY', 'MONTHLY']
+
+
+class RecurrenceRule:
+    def __init__(self, freq, interval=1, weekdays=None, monthdays=None, count=None, until=None):
+        self.freq = freq
+        self.interval = interval
+        # [(ordinal or None, weekday index)]
+        self.weekdays = weekdays or []
+        self.monthdays = monthdays or []
+        self.count = count
+        self.until = until
+
+    @classmethod
+    def parse(cls, text):
+        """RecurrenceRule from "FREQ=...;..." text; raises ValueError with a readable message"""
+        parts = {}
+        for part in text.strip().upper().removeprefix('RRULE:').split(';'):
+            if not part:
+                continue
+            key, sep, value = part.partition('=')
+            if not sep or not value:
+                raise ValueError(f'Expected NAME=value, got "{part}"')
+            parts[key] = value
+
+        freq = parts.pop('FREQ', None)
+        if freq not in FREQUENCIES:
+            raise ValueError(f'FREQ must be one of {", ".join(FREQUENCIES)}')
+        rule = cls(freq)
+        try:
+            rule.interval = int(parts.pop('INTERVAL', 1))
+            if 'COUNT' in parts:
+                rule.count = int(parts.pop('COUNT'))
+        except ValueError:
+            raise ValueError('INTERVAL and COUNT must be whole numbers')
+        if rule.interval < 1 or (rule.count is not None and rule.count < 1):
+            raise ValueError('INTERVAL and COUNT must be at least 1')
+
+        if 'UNTIL' in parts:
+            until = parts.pop('UNTIL')
+            try:
+                if 'T' in until:
+                    rule.until = datetime.strptime(until.rstrip('Z'), '%Y%m%dT%H%M%S')
+                    if until.endswith('Z'):
+                        rule.until = rule.until.replace(tzinfo=dt_timezone.utc)
+                else:
+                    # Whole day, inclusive
+                    rule.until = datetime.combine(datetime.strptime(until, '%Y%m%d'), time.max)
+            except ValueError:
+                raise ValueError('UNTIL must look like 20251231 or 20251231T170000Z')
+            if timezone.is_naive(rule.until):
+                rule.until = timezone.make_aware(rule.until)
+
+        for day in filter(None, parts.pop('BYDAY', '').split(',')):
+            ordinal, code = day[:-2], day[-2:]
+            if code not in WEEKDAYS or (ordinal and freq != 'MONTHLY'):
+                raise ValueError(f'Invalid BYDAY value "{day}"')
+            try:
+                ordinal = int(ordinal) if ordinal else None
+            except ValueError:
+                raise ValueError(f'Invalid BYDAY value "{day}"')
+            if ordinal is not None and not (1 <= abs(ordinal) <= 5):
+                raise ValueError(f'Invalid BYDAY value "{day}"')
+            rule.weekdays.append((ordinal, WEEKDAYS.index(code)))
+
+        for day in filter(None, parts.pop('BYMONTHDAY', '').split(',')):
+            try:
+                day = int(day)
+            except ValueError:
+                raise ValueError(f'Invalid BYMONTHDAY value "{day}"')
+            if freq != 'MONTHLY' or not (1 <= abs(day) <= 31):
+                raise ValueError(f'Invalid BYMONTHDAY value "{day}"')
+            rule.monthdays.append(day)
+
+        if freq == 'DAILY' and rule.weekdays:
+            raise ValueError('BYDAY is not supported with FREQ=DAILY')
+        if rule.weekdays and rule.monthdays:
+            raise ValueError('Use either BYDAY or BYMONTHDAY')
+        if parts:
+            raise ValueError(f'Unsupported rule parts: {", ".join(sorted(parts))}')
+        return rule
+
+    # Periods: the n-th day, week or month (n = 0, interval, 2*interval, ...) after the start
+
+    def _period_index(self, start, day):
+        """Index of the period containing ``day``, counted from the start's period"""
+        if self.freq == 'DAILY':
+            return (day - start).days
+        if self.freq == 'WEEKLY':
+            return ((day - timedelta(days=day.weekday())) - (start - timedelta(days=start.weekday()))).days // 7
+        return (day.year - start.year) * 12 + day.month - start.month
+
+    def _period_start(self, start, index):
+        if self.freq == 'DAILY':
+            return start + timedelta(days=index)
+        if self.freq == 'WEEKLY':
+            return start - timedelta(days=start.weekday()) + timedelta(weeks=index)
+        year, month = divmod(start.month - 1 + index, 12)
+        return start.replace(year=start.year + year, month=month + 1, day=1)
+
+    def _period_days(self, start, index):
+        """Candidate dates of period ``index``, in order"""
+        period_start = self._period_start(start, index)
+        if self.freq == 'DAILY':
+            return [period_start]
+        if self.freq == 'WEEKLY':
+            weekdays = sorted({weekday for _, weekday in self.weekdays}) or [start.weekday()]
+            return [period_start + timedelta(days=weekday) for weekday in weekdays]
+
+        year, month = period_start.year, period_start.month
+        first_weekday, length = calendar.monthrange(year, month)
+        days = set()
+        if self.weekdays:
+            for ordinal, weekday in self.weekdays:
+                matches = list(range((weekday - first_weekday) % 7 + 1, length + 1, 7))
+                if ordinal is None:
+                    days.update(matches)
+                elif ordinal <= len(matches) and -ordinal <= len(matches):
+                    days.add(matches[ordinal - 1 if ordinal > 0 else ordinal])
+        else:
+            for day in self.monthdays or [start.day]:
+                # Months without that day are skipped, as in RFC 5545
+                day = day if day > 0 else length + day + 1
+                if 1 <= day <= length:
+                    days.add(day)
+        return [period_start.replace(day=day) for day in sorted(days)]
+
+    def between(self, dtstart, after, before):
+        """Occurrences in (after, before], as aware datetimes"""
+        local_start = timezone.localtime(dtstart)
+        start_day = local_start.date()
+        clock = local_start.time().replace(tzinfo=None)
+        end = min(before, self.until) if self.until else before
+
+        if self.count is None:
+            # Jump straight to the period that can contain ``after``
+            first = max(self._period_index(start_day, timezone.localtime(after).date()), 0)
+            index = first - first % self.interval
+        else:
+            # COUNT numbers occurrences from the start
+            index = 0
+        seen = 0
+        while True:
+            # Periods without a matching day (e.g. the 31st in June) still end the search
+            if timezone.make_aware(datetime.combine(self._period_start(start_day, index), time.min)) > end:
+                return
+            for day in self._period_days(start_day, index):
+                occurrence = timezone.make_aware(datetime.combine(day, clock))
+                if occurrence < dtstart:
+                    continue
+                seen += 1
+                if self.count is not None and seen > self.count:
+                    return
+                if occurrence > end:
+                    return
+                if occurrence > after:
+                    yield occurrence
+            index += self.interval
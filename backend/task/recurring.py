@@ -0,0 +1,140 @@
+"""
+Materializing recurring task templates.
+
+Occurrences due within RECURRING_TASK_HORIZON_DAYS become ordinary Task rows
+(with assignments and a 'created' history entry), inserted with bulk_create.
+Each template remembers how far it has been materialized, so every run only
+creates the occurrences that entered the horizon since the last one, and the
+tasks table holds about a horizon's worth of future tasks per template no
+matter how long the template runs. Anything later is computed on demand by
+``upcoming_occurrences`` for calendar views.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache_versions import invalidate
+from .models import RecurringTaskTemplate, Task, TaskAssignment, TaskHistory
+
+logger = logging.getLogger(__name__)
+
+
+def horizon_end(now=None):
+    return (now or timezone.now()) + timedelta(days=settings.RECURRING_TASK_HORIZON_DAYS)
+
+
+def materialize_template(template_id, now=None):
+    """Create the template's tasks due up to the horizon; returns the new tasks"""
+    now = now or timezone.now()
+    until = horizon_end(now)
+    with transaction.atomic():
+        # Re-read under the row lock (PostgreSQL) / write lock (SQLite) so
+        # concurrent runs don't create the same occurrences
+        template = (RecurringTaskTemplate.objects.select_for_update()
+                    .filter(pk=template_id, is_active=True).first())
+        if template is None:
+            return []
+        # Never backfill past occurrences, e.g. of a template that was paused
+        after = max(template.materialized_until or now, now)
+        if after >= until:
+            return []
+
+        tasks = [
+            Task(
+                title=template.title,
+                description=template.description,
+                priority=template.priority,
+                status='pending',
+                due_date=due_date,
+                created_by=template.created_by,
+                recurring_template=template,
+            )
+            for due_date in template.occurrences(after, until)
+        ]
+        if tasks:
+            assignees = list(template.assignees.all())
+            try:
+                with transaction.atomic():
+                    Task.objects.bulk_create(tasks)
+            except IntegrityError:
+                # Materialized meanwhile by a run that didn't record it; keep the existing tasks
+                existing = set(Task.objects.filter(recurring_template=template, due_date__gt=after,
+                                                   due_date__lte=until).values_list('due_date', flat=True))
+                tasks = [task for task in tasks if task.due_date not in existing]
+                Task.objects.bulk_create(tasks)
+            TaskAssignment.objects.bulk_create([
+                TaskAssignment(task=task, assignee=assignee, department=assignee.department or 'GENERAL')
+                for task in tasks for assignee in assignees
+            ])
+            TaskHistory.objects.bulk_create([
+                TaskHistory(
+                    task=task,
+                    action='created',
+                    details={
+                        'departments': template.departments,
+                        'assignees': [assignee.email for assignee in assignees],
+                        'recurring_template': template.pk,
+                    },
+                )
+                for task in tasks
+            ])
+            # bulk_create sends no signals; refresh the assignees' cached task views
+            transaction.on_commit(lambda: invalidate(
+                [assignee.department or 'GENERAL' for assignee in assignees],
+                [assignee.pk for assignee in assignees],
+            ))
+
+        template.materialized_until = until
+        template.save(update_fields=['materialized_until'])
+
+    logger.info("recurring tasks materialized", extra={'template_id': template.pk, 'tasks_created': len(tasks)})
+    return tasks
+
+
+def materialize_due_templates(now=None):
+    """materialize_template() for every active template behind the horizon; returns the new tasks"""
+    now = now or timezone.now()
+    templates = RecurringTaskTemplate.objects.filter(
+        Q(materialized_until__isnull=True) | Q(materialized_until__lt=horizon_end(now)),
+        is_active=True,
+    )
+    created = []
+    for template_id in list(templates.values_list('pk', flat=True)):
+        try:
+            created.extend(materialize_template(template_id, now))
+        except ValueError:
+            # An invalid rule in one template must not hold up the others
+            logger.exception("invalid recurrence rule", extra={'template_id': template_id})
+    return created
+
+
+def upcoming_occurrences(templates, start, end):
+    """Occurrences in (start, end] that are not tasks yet, ordered by due date.
+
+    Occurrences up to a template's materialized_until are regular tasks and are
+    listed with the other tasks, and past ones are never created, so both are
+    left out here.
+    """
+    now = timezone.now()
+    occurrences = []
+    for template in templates:
+        after = max(start, template.materialized_until or now, now)
+        try:
+            due_dates = list(template.occurrences(after, end))
+        except ValueError:
+            logger.exception("invalid recurrence rule", extra={'template_id': template.pk})
+            continue
+        for due_date in due_dates:
+            occurrences.append({
+                'template_id': template.pk,
+                'title': template.title,
+                'priority': template.priority,
+                'due_date': due_date,
+            })
+    occurrences.sort(key=lambda occurrence: (occurrence['due_date'], occurrence['template_id']))
+    return occurrences
@@ -0,0 +1,120 @@
+"""
+Server-side cache of task list and dashboard responses.
+
+Users who see the same tasks share entries (the scopes of task.cache_versions),
+keyed by view and query string. An entry is fresh while its scope version is
+unchanged and it is younger than RESPONSE_CACHE_TTL, or until the time the view
+set as ``response.cache_until`` (e.g. the next due date, when a task turns
+overdue) if that is sooner. Entries built from the read replica are kept at most
+REPLICA_STICKY_SECONDS, the lag the replica is allowed.
+
+Rebuilds are single-flight: the request that takes the entry's lock rebuilds
+it, while concurrent ones serve the expired entry (stale) if it is of the
+current scope version and at most STALE_SECONDS past its freshness. After a
+change (a new version) nobody is served the old data: they wait for the rebuild
+up to RESPONSE_CACHE_LOCK_WAIT seconds (a fraction of a second, as the wait
+holds a thread) before building it themselves. The lock is an add() on the "responses" cache, which is atomic on
+redis, memcached and locmem but only best effort on the file backend, where two
+workers may occasionally both rebuild.
+
+Responses carry X-Cache: hit, stale or miss.
+"""
+
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from backend.db_routers import reading_from_replica
+from .cache_versions import response_cache, scope_version, user_scope
+
+RESPONSE_PREFIX = 'response:'
+# Longest a rebuild may hold its lock (a crashed worker's lock expires)
+LOCK_TIMEOUT = 30
+# How long past its freshness an entry may still be served while it is rebuilt
+STALE_SECONDS = 300
+POLL_INTERVAL = 0.05
+
+
+def _cache_key(name, scope, request):
+    query = sorted((key, value) for key, values in request.GET.lists() for value in values)
+    digest = hashlib.sha256(repr(query).encode()).hexdigest()[:32]
+    return f'{RESPONSE_PREFIX}{name}:{scope}:{digest}'
+
+
+def _fresh(entry, version):
+    return entry is not None and entry['version'] == version and entry['expires'] > time.time()
+
+
+def _servable_stale(entry, version):
+    # Only expired by time: data of an older version may predate the user's own change
+    return entry is not None and entry['version'] == version and entry['expires'] + STALE_SECONDS > time.time()
+
+
+def _response(entry, state):
+    response = HttpResponse(entry['content'], content_type='application/json')
+    response['X-Cache'] = state
+    return response
+
+
+def _expires(response):
+    expires = time.time() + settings.RESPONSE_CACHE_TTL
+    if reading_from_replica():
+        expires = min(expires, time.time() + settings.REPLICA_STICKY_SECONDS)
+    cache_until = getattr(response, 'cache_until', None)
+    if cache_until is not None:
+        expires = min(expires, cache_until.timestamp())
+    return expires
+
+
+def cache_scoped_response(name):
+    """Cache a GET view's 200 responses per visibility scope.
+
+    Place it below @use_replica, so rebuilds know which database they read.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            user = request.user
+            scope = user_scope(user) if user.is_authenticated else None
+            if not settings.RESPONSE_CACHE_ENABLED or request.method != 'GET' or scope is None:
+                return view_func(request, *args, **kwargs)
+
+            cache = response_cache()
+            key = _cache_key(name, scope, request)
+            version = scope_version(user)
+            entry = cache.get(key)
+            if _fresh(entry, version):
+                return _response(entry, 'hit')
+
+            locked = cache.add(key + ':lock', 1, LOCK_TIMEOUT)
+            if not locked:
+                if _servable_stale(entry, version):
+                    return _response(entry, 'stale')
+                deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(POLL_INTERVAL)
+                    entry = cache.get(key)
+                    if entry is not None and entry['version'] == version:
+                        return _response(entry, 'hit')
+                # The rebuild is taking too long; build our own copy
+
+            try:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                entry = {
+                    'version': version,
+                    'expires': _expires(response),
+                    'content': JSONRenderer().render(response.data),
+                }
+                cache.set(key, entry, max(entry['expires'] - time.time(), 0) + STALE_SECONDS)
+                return _response(entry, 'miss')
+            finally:
+                if locked:
+                    cache.delete(key + ':lock')
+        return wrapper
+    return decorator
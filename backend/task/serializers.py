@@ -1,6 +1,13 @@
 # task/serializers.py
+from django.db import transaction
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Task, TaskAssignment, TaskHistory, TaskAttachment
+from .models import Task, TaskAssignment, TaskHistory, TaskAttachment, RecurringTaskTemplate
+from .cache_versions import invalidate
+from .recurrence import RecurrenceRule
+from .storage import store_attachment
+from .thumbnails import schedule_thumbnail
+from staff.models import User
 from staff.serializers import UserSerializer
 
 class TaskHistorySerializer(serializers.ModelSerializer):
@@ -17,7 +24,73 @@ class TaskHistorySerializer(serializers.ModelSerializer):
             return obj.performed_by.get_full_name() or obj.performed_by.email
         return None
 
-class TaskSerializer(serializers.ModelSerializer):
+def parse_field_params(request):
+    """?fields=a,b and ?expand=x,y as sets (None when the parameter is absent)"""
+    def split(name):
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        return {item.strip() for item in value.split(',') if item.strip()}
+    return {'fields': split('fields'), 'expand': split('expand')}
+
+
+class SparseFieldsMixin:
+    """Sparse fieldsets for task serializers.
+
+    ``fields`` limits the output to the named fields (``id`` is always kept).
+    Nested data is grouped under ``expandable`` names; when ``expand`` is given
+    only the listed groups are embedded, otherwise they follow ``fields``.
+    ``optimize_queryset`` trims the query to match with ``only()`` and only the
+    prefetches the remaining fields read.
+    """
+
+    # expand name -> serializer fields it embeds
+    expandable = {}
+    # serializer field -> prefetch lookups it reads
+    prefetches = {}
+    # Model fields every instance needs (update_status and Task.save read these)
+    always_loaded = ['id', 'title', 'status', 'due_date', 'updated_at']
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.selected_fields(fields, expand)
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, fields=None, expand=None):
+        groups = {name: group for group, names in cls.expandable.items() for name in names}
+        unknown = (fields or set()) - set(cls.Meta.fields)
+        unknown_expand = (expand or set()) - set(cls.expandable)
+        if unknown or unknown_expand:
+            errors = {}
+            if unknown:
+                errors['fields'] = f"Unknown fields: {', '.join(sorted(unknown))}"
+            if unknown_expand:
+                errors['expand'] = f"Unknown expansions: {', '.join(sorted(unknown_expand))}"
+            raise serializers.ValidationError(errors)
+
+        selected = []
+        for name in cls.Meta.fields:
+            if name in groups and expand is not None:
+                keep = groups[name] in expand
+            else:
+                keep = fields is None or name in fields or name == 'id'
+            if keep:
+                selected.append(name)
+        return selected
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None, expand=None):
+        selected = cls.selected_fields(fields, expand)
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+        only = dict.fromkeys(cls.always_loaded + [name for name in selected if name in model_fields])
+        lookups = dict.fromkeys(lookup for name in selected for lookup in cls.prefetches.get(name, ()))
+        return queryset.only(*only).prefetch_related(*lookups)
+
+
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     department = serializers.SerializerMethodField()
     assignee = serializers.SerializerMethodField()
     reminder1 = serializers.DateTimeField(required=False, allow_null=True)
@@ -28,22 +101,25 @@ class TaskSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'department', 'assignee',
             'priority', 'status', 'due_date', 'created_by', 'created_at', 
-            'completed_at', 'reminder1', 'reminder2'
+            'completed_at', 'reminder1', 'reminder2', 'recurring_template'
         ]
     
+    expandable = {'assignees': ['department', 'assignee']}
+    prefetches = {'department': ['assignments'], 'assignee': ['assignments__assignee']}
+    
     def get_department(self, obj):
-        departments = obj.assignments.values_list('department', flat=True).distinct()
-        return list(departments)
+        # Iterate assignments.all() so prefetched assignments are used
+        return list(dict.fromkeys(a.department for a in obj.assignments.all()))
     
     def get_assignee(self, obj):
-        assignments = obj.assignments.select_related('assignee').all()
+        assignments = obj.assignments.all()
         return [{
             'email': assignment.assignee.email,
             'full_name': assignment.assignee.get_full_name(),
             'department': assignment.department
         } for assignment in assignments]
 
-class TaskDetailSerializer(serializers.ModelSerializer):
+class TaskDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     department = serializers.SerializerMethodField()
     assignee = serializers.SerializerMethodField()
     history = serializers.SerializerMethodField()
@@ -54,17 +130,29 @@ class TaskDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'department', 'assignee',
             'priority', 'status', 'due_date', 'created_by', 'created_at',
-            'completed_at', 'reminder1', 'reminder2', 'history', 'attachments'
+            'completed_at', 'reminder1', 'reminder2', 'recurring_template', 'history', 'attachments'
         ]
     
+    expandable = {
+        'assignees': ['department', 'assignee'],
+        'history': ['history'],
+        'attachments': ['attachments'],
+    }
+    prefetches = {
+        'department': ['assignments'],
+        'assignee': ['assignments__assignee'],
+        'history': ['history__performed_by'],
+        'attachments': ['attachments__uploaded_by'],
+    }
+    
     def get_department(self, obj):
-        return list(obj.assignments.values_list('department', flat=True).distinct())
+        return list(dict.fromkeys(a.department for a in obj.assignments.all()))
     
     def get_assignee(self, obj):
-        return list(obj.assignments.values_list('assignee__email', flat=True))
+        return [a.assignee.email for a in obj.assignments.all()]
     
     def get_history(self, obj):
-        history = obj.history.select_related('performed_by')[:10]
+        history = obj.history.all()[:10]
         return [{
             'action': h.action,
             'performed_by': h.performed_by.get_full_name() if h.performed_by else None,
@@ -76,7 +164,11 @@ class TaskDetailSerializer(serializers.ModelSerializer):
         return [{
             'id': att.id,
             'file_name': att.file_name,
-            'file_url': att.file.url,
+            'file_url': reverse('download-attachment', args=[obj.id, att.id]),
+            'file_size': att.file_size,
+            # Until the background render finishes (or for other file types) there is none
+            'thumbnail_url': (reverse('attachment-thumbnail', args=[obj.id, att.id])
+                              if att.has_thumbnail else None),
             'uploaded_by': att.uploaded_by.get_full_name(),
             'uploaded_at': att.uploaded_at
         } for att in obj.attachments.all()]
@@ -123,9 +215,12 @@ class TaskCreateSerializer(serializers.ModelSerializer):
         task = Task.objects.create(**validated_data)
         
         # Create assignments
+        users = User.objects.in_bulk(assignees, field_name='email')
         assignments = []
         for email in assignees:
-            assignee = User.objects.get(email=email)
+            assignee = users.get(email)
+            if assignee is None:
+                raise User.DoesNotExist(f"User with email {email} does not exist")
             assignment = TaskAssignment(
                 task=task,
                 assignee=assignee,
@@ -135,6 +230,11 @@ class TaskCreateSerializer(serializers.ModelSerializer):
         
         # Bulk create assignments
         TaskAssignment.objects.bulk_create(assignments)
+        # bulk_create sends no signals; refresh the assignees' cached task views
+        transaction.on_commit(lambda: invalidate(
+            [assignment.department for assignment in assignments],
+            [assignment.assignee_id for assignment in assignments],
+        ))
         
         # Record creation history
         TaskHistory.objects.create(
@@ -144,13 +244,46 @@ class TaskCreateSerializer(serializers.ModelSerializer):
             details={'departments': departments, 'assignees': assignees}
         )
         
-        # Handle attachment if provided
+        # Handle attachment if provided (stored once per distinct content)
         if attachment:
-            TaskAttachment.objects.create(
+            name, sha256, size = store_attachment(attachment)
+            task_attachment = TaskAttachment.objects.create(
                 task=task,
-                file=attachment,
+                file=name,
                 uploaded_by=self.context['request'].user,
-                file_name=attachment.name
+                file_name=attachment.name,
+                file_size=size,
+                sha256=sha256,
             )
+            transaction.on_commit(lambda: schedule_thumbnail(task_attachment))
         
-        return task
\ No newline at end of file
+        return task
+
+
+class RecurringTaskTemplateSerializer(serializers.ModelSerializer):
+    assignees = serializers.SlugRelatedField(
+        slug_field='email', many=True, queryset=User.objects.all(), required=False
+    )
+    departments = serializers.ListField(child=serializers.CharField(), required=False)
+    
+    class Meta:
+        model = RecurringTaskTemplate
+        fields = [
+            'id', 'title', 'description', 'priority', 'created_by', 'recurrence', 'dtstart',
+            'assignees', 'departments', 'is_active', 'materialized_until', 'created_at'
+        ]
+        read_only_fields = ['materialized_until', 'created_at']
+    
+    def validate_recurrence(self, value):
+        try:
+            RecurrenceRule.parse(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value.strip().upper()
+    
+    def validate_departments(self, value):
+        valid_departments = dict(User.DEPARTMENT_CHOICES).keys()
+        for dept in value:
+            if dept not in valid_departments:
+                raise serializers.ValidationError(f"Invalid department '{dept}'")
+        return value
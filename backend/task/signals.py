@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache_versions import invalidate, invalidate_tasks
+from .models import Task, TaskAssignment, TaskAttachment, TaskHistory
+from .storage import release_attachment
+
+
+@receiver(post_delete, sender=TaskAttachment)
+def release_attachment_blob(sender, instance, **kwargs):
+    """Deleting an attachment (directly or with its task) drops its blob reference"""
+    if instance.sha256:
+        release_attachment(instance.sha256)
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, **kwargs):
+    if created:
+        # Only admin/staff see it until it is assigned
+        transaction.on_commit(invalidate)
+        return
+    task_id = instance.pk
+    transaction.on_commit(lambda: invalidate_tasks([task_id]))
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    # The assignments are gone by now; admin/staff scopes here, the
+    # assignees' via their assignments' post_delete
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=TaskAssignment)
+@receiver(post_delete, sender=TaskAssignment)
+def assignment_changed(sender, instance, **kwargs):
+    department, user_id = instance.department, instance.assignee_id
+    transaction.on_commit(lambda: invalidate([department], [user_id]))
+
+
+@receiver(post_save, sender=TaskHistory)
+def history_added(sender, instance, created, **kwargs):
+    # Comments and activity shown with the task
+    task_id = instance.task_id
+    transaction.on_commit(lambda: invalidate_tasks([task_id]))
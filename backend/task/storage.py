@@ -0,0 +1,100 @@
+"""
+Content-addressed attachment storage.
+
+Each distinct file is stored once under attachments/<aa>/<bb>/<sha256> in the
+default storage, with an AttachmentBlob row counting the TaskAttachment rows that
+use it. Uploads arrive already hashed and on disk (task.upload_handlers), so storing
+a new blob is a rename and storing a duplicate is just a ref-count bump.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import AttachmentBlob
+from .thumbnails import thumbnail_path
+
+BLOB_DIR = 'attachments'
+CHUNK_SIZE = 64 * 1024
+
+
+def blob_name(digest):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def _spool(upload):
+    """Copy an upload that wasn't hashed on arrival to a temp file, hashing as it goes"""
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(suffix='.upload', dir=settings.FILE_UPLOAD_TEMP_DIR)
+    with os.fdopen(fd, 'wb') as out:
+        for chunk in upload.chunks(CHUNK_SIZE):
+            sha256.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return temp_path, sha256.hexdigest(), size
+
+
+def _retain(digest, size):
+    if AttachmentBlob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            AttachmentBlob.objects.create(sha256=digest, size=size, ref_count=1)
+    except IntegrityError:
+        # Another upload of the same content created it first
+        AttachmentBlob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1)
+
+
+def store_attachment(upload):
+    """Store an uploaded file by content; returns (name, sha256, size).
+
+    Increments the blob's reference count, so every call must be matched by a
+    TaskAttachment row (whose deletion calls release_attachment).
+    """
+    digest = getattr(upload, 'sha256', None)
+    if digest and hasattr(upload, 'temporary_file_path'):
+        temp_path, size, owned = upload.temporary_file_path(), upload.size, False
+    else:
+        temp_path, digest, size = _spool(upload)
+        owned = True
+
+    name = blob_name(digest)
+    # Count the reference before placing the file, so a concurrent release of the
+    # same blob sees it in use and leaves the file alone
+    _retain(digest, size)
+    try:
+        path = default_storage.path(name)
+        if os.path.exists(path):
+            if owned:
+                os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Same content either way if another upload just placed it
+            file_move_safe(temp_path, path, allow_overwrite=True)
+            os.chmod(path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+    except Exception:
+        release_attachment(digest)
+        raise
+    return name, digest, size
+
+
+def _remove_blob(digest):
+    # A new upload may have brought the blob back since it was released
+    if not AttachmentBlob.objects.filter(pk=digest).exists():
+        default_storage.delete(blob_name(digest))
+        default_storage.delete(thumbnail_path(blob_name(digest)))
+
+
+def release_attachment(digest):
+    """Drop one reference to a blob, deleting the file once nothing uses it"""
+    AttachmentBlob.objects.filter(pk=digest, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    deleted, _ = AttachmentBlob.objects.filter(pk=digest, ref_count__lte=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: _remove_blob(digest))
@@ -1,16 +1,22 @@
-from django.core.mail import send_mail
 from django.conf import settings
-from rest_framework.decorators import api_view, permission_classes
+from adrf.decorators import api_view
+from rest_framework.decorators import permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from .utils import asend_mail
+from backend.query_budget import query_budget
+from backend.throttling import TestEmailThrottle
 
+@query_budget(2)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def test_email(request):
+@throttle_classes([TestEmailThrottle])
+async def test_email(request):
     """Test email functionality"""
     try:
-        send_mail(
+        await asend_mail(
+            notification='test',
             subject='Test Email from Task Schedule',
             message='This is a test email from your Task Schedule application.',
             html_message="""
@@ -1,3 +1,472 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import tempfile
+from io import StringIO
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from staff.models import User
+from .cache_versions import invalidate, invalidate_all, scope_version, user_scope
+from .downloads import attachment_response
+from .response_cache import _cache_key
+from .models import RecurringTaskTemplate, Task, TaskAssignment, TaskAttachment, TaskHistory
+from .recurrence import RecurrenceRule
+from .recurring import materialize_template
+
+# Per-test caches, so nothing from a server's file caches leaks into a run
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+    for alias in ('default', 'throttle', 'responses')
+}
+
+
+@override_settings(CACHES=TEST_CACHES, THROTTLE_RATES={})
+class TaskTestCase(TestCase):
+    """Users of every role and helpers to create tasks and call the API as them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin@example.com', 'pw', role='admin')
+        cls.staff = User.objects.create_user('staff@example.com', 'pw', role='staff', department='ECE')
+        cls.hod = User.objects.create_user('hod@example.com', 'pw', role='hod', department='CSE')
+        cls.faculty = User.objects.create_user('faculty@example.com', 'pw', role='faculty', department='CSE')
+        cls.other_faculty = User.objects.create_user('other@example.com', 'pw', role='faculty', department='ECE')
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def make_task(self, title='Task', assignees=(), due_in=timedelta(days=3), **fields):
+        task = Task.objects.create(
+            title=title, description='', priority=fields.pop('priority', 'medium'),
+            due_date=timezone.now() + due_in, created_by='Tester', **fields
+        )
+        for assignee in assignees:
+            TaskAssignment.objects.create(task=task, assignee=assignee, department=assignee.department)
+        return task
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+
+class FollowCommentTests(TaskTestCase):
+    """Comment lookups use the comment column, not JSON paths, so they behave alike on SQLite and PostgreSQL"""
+
+    def setUp(self):
+        super().setUp()
+        self.task = self.make_task('Mine', [self.faculty])
+        self.other_task = self.make_task('Theirs', [self.other_faculty])
+        now = timezone.now()
+        for minutes, task, comment in [(3, self.task, 'first'), (2, self.task, 'second'), (1, self.other_task, 'other')]:
+            entry = TaskHistory.objects.create(task=task, action='updated', performed_by=self.staff,
+                                               details={'follow_comment': comment}, comment=comment)
+            TaskHistory.objects.filter(pk=entry.pk).update(timestamp=now - timedelta(minutes=minutes))
+        # Neither is a follow-up comment
+        TaskHistory.objects.create(task=self.task, action='updated', performed_by=self.staff,
+                                   details={'changes': {'title': {'old': 'a', 'new': 'b'}}})
+        TaskHistory.objects.create(task=self.task, action='created', performed_by=self.staff, comment='note')
+
+    def test_task_comments_newest_first(self):
+        response = self.client_for(self.staff).get(f'/api/tasks/{self.task.pk}/comments/')
+        self.assertEqual([c['comment'] for c in response.json()['follow_comments']], ['second', 'first'])
+
+    def test_hod_cannot_read_comments(self):
+        response = self.client_for(self.hod).get(f'/api/tasks/{self.task.pk}/comments/')
+        self.assertEqual(response.status_code, 403)
+        response = self.client_for(self.hod).get('/api/tasks/comments/')
+        self.assertEqual(response.json()['follow_comments'], [])
+
+    def test_all_comments_paginated(self):
+        response = self.client_for(self.admin).get('/api/tasks/comments/', {'page': 1, 'page_size': 2})
+        data = response.json()
+        self.assertEqual([c['comment'] for c in data['follow_comments']], ['other', 'second'])
+        self.assertEqual(data['pagination'], {'total': 3, 'page': 1, 'page_size': 2, 'pages': 2})
+
+    def test_faculty_sees_comments_on_own_tasks(self):
+        response = self.client_for(self.faculty).get('/api/tasks/comments/')
+        self.assertEqual([c['comment'] for c in response.json()['follow_comments']], ['second', 'first'])
+
+    def test_history_lists_follow_comments(self):
+        response = self.client_for(self.staff).get('/api/tasks/history/')
+        self.assertEqual([c['comment'] for c in response.json()['follow_comments']], ['other', 'second', 'first'])
+
+    def test_faculty_history_limited_to_own_tasks(self):
+        response = self.client_for(self.faculty).get('/api/tasks/history/')
+        data = response.json()
+        self.assertEqual([c['comment'] for c in data['follow_comments']], ['second', 'first'])
+        self.assertEqual({a['task'] for a in data['activities']}, {self.task.pk})
+        response = self.client_for(self.hod).get('/api/tasks/history/')
+        self.assertEqual(response.json()['follow_comments'], [])
+
+    def test_update_mirrors_follow_comment_into_column(self):
+        response = self.client_for(self.staff).put(f'/api/tasks/{self.task.pk}/', {'follow_comment': 'done?'},
+                                                   format='json')
+        self.assertEqual(response.status_code, 200)
+        entry = TaskHistory.objects.filter(task=self.task).order_by('-pk').first()
+        self.assertEqual((entry.comment, entry.details['follow_comment']), ('done?', 'done?'))
+
+
+@override_settings(DB_ITERATOR_CHUNK_SIZE=2)
+class ExportIteratorTests(TaskTestCase):
+    """Reports and notifications stream tasks in chunks (server-side cursors on PostgreSQL)"""
+
+    def test_pdf_report_includes_every_task(self):
+        for i in range(45):
+            self.make_task(f'Task {i}')
+        response = self.client_for(self.admin).get('/api/tasks/generate-pdf/')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        # 34 rows fit on the first page
+        self.assertEqual(len(re.findall(rb'/Type /Page\b(?!s)', response.content)), 2)
+
+    def test_notifications_cover_every_chunk(self):
+        for i in range(3):
+            self.make_task(f'Overdue {i}', [self.faculty], due_in=-timedelta(hours=1))
+        self.make_task('Reminder', [self.faculty, self.other_faculty], reminder1=timezone.now())
+        self.make_task('Completed', [self.faculty], due_in=-timedelta(hours=1), status='completed')
+
+        call_command('send_task_notifications', stdout=StringIO())
+
+        subjects = sorted(message.subject for message in mail.outbox)
+        self.assertEqual(subjects, ['Overdue 0', 'Overdue 1', 'Overdue 2', 'Reminder: Reminder', 'Reminder: Reminder'])
+
+
+def local(*args):
+    """Aware datetime in the project time zone"""
+    return timezone.make_aware(datetime(*args))
+
+
+class RecurrenceRuleTests(SimpleTestCase):
+    # A Monday, 9:00
+    start = local(2025, 1, 6, 9, 0)
+
+    def occurrences(self, text, before, after=None):
+        after = after or self.start - timedelta(seconds=1)
+        return list(RecurrenceRule.parse(text).between(self.start, after, before))
+
+    def test_parse(self):
+        rule = RecurrenceRule.parse('rrule:freq=weekly;interval=2;byday=mo,we')
+        self.assertEqual((rule.freq, rule.interval, rule.weekdays), ('WEEKLY', 2, [(None, 0), (None, 2)]))
+        rule = RecurrenceRule.parse('FREQ=MONTHLY;BYDAY=1MO,-1FR;COUNT=4')
+        self.assertEqual((rule.weekdays, rule.count), ([(1, 0), (-1, 4)], 4))
+
+    def test_parse_rejects_invalid_rules(self):
+        for text in ['', 'BYDAY=MO', 'FREQ=YEARLY', 'FREQ=DAILY;BYDAY=MO', 'FREQ=WEEKLY;BYDAY=1MO',
+                     'FREQ=MONTHLY;BYDAY=6MO', 'FREQ=MONTHLY;BYMONTHDAY=32', 'FREQ=WEEKLY;BYMONTHDAY=1',
+                     'FREQ=MONTHLY;BYDAY=MO;BYMONTHDAY=1', 'FREQ=DAILY;COUNT=0', 'FREQ=DAILY;INTERVAL=x',
+                     'FREQ=DAILY;UNTIL=2025-01-01', 'FREQ=DAILY;BYHOUR=9', 'FREQ=DAILY;COUNT']:
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                RecurrenceRule.parse(text)
+
+    def test_weekly_keeps_time_of_day(self):
+        self.assertEqual(self.occurrences('FREQ=WEEKLY;BYDAY=MO,WE', self.start + timedelta(days=14)), [
+            local(2025, 1, 6, 9, 0), local(2025, 1, 8, 9, 0), local(2025, 1, 13, 9, 0),
+            local(2025, 1, 15, 9, 0), local(2025, 1, 20, 9, 0),
+        ])
+
+    def test_monthly_days(self):
+        before = local(2025, 4, 30)
+        self.assertEqual(self.occurrences('FREQ=MONTHLY;BYMONTHDAY=-1', before), [
+            local(2025, 1, 31, 9, 0), local(2025, 2, 28, 9, 0), local(2025, 3, 31, 9, 0),
+        ])
+        # Months without a 31st are skipped
+        self.assertEqual(self.occurrences('FREQ=MONTHLY;BYMONTHDAY=31', before), [
+            local(2025, 1, 31, 9, 0), local(2025, 3, 31, 9, 0),
+        ])
+        self.assertEqual(self.occurrences('FREQ=MONTHLY;BYDAY=1MO,-1FR', local(2025, 2, 28)), [
+            local(2025, 1, 6, 9, 0), local(2025, 1, 31, 9, 0), local(2025, 2, 3, 9, 0),
+        ])
+
+    def test_far_future_range_keeps_interval(self):
+        after = local(2035, 1, 1)
+        occurrences = self.occurrences('FREQ=WEEKLY;INTERVAL=2', after + timedelta(days=28), after)
+        self.assertEqual(len(occurrences), 2)
+        for occurrence in occurrences:
+            self.assertEqual(occurrence.weekday(), 0)
+            self.assertEqual((occurrence.date() - self.start.date()).days % 14, 0)
+
+    def test_count(self):
+        self.assertEqual(self.occurrences('FREQ=DAILY;COUNT=3', self.start + timedelta(days=30)), [
+            local(2025, 1, 6, 9, 0), local(2025, 1, 7, 9, 0), local(2025, 1, 8, 9, 0),
+        ])
+        # Counted from the start, not from the requested range
+        after = local(2025, 1, 7, 12, 0)
+        self.assertEqual(self.occurrences('FREQ=DAILY;COUNT=3', self.start + timedelta(days=30), after),
+                         [local(2025, 1, 8, 9, 0)])
+
+    def test_until(self):
+        before = self.start + timedelta(days=30)
+        # A date includes the whole day
+        self.assertEqual(self.occurrences('FREQ=DAILY;UNTIL=20250107', before)[-1], local(2025, 1, 7, 9, 0))
+        # 03:30 UTC is 09:00 in Asia/Kolkata
+        self.assertEqual(self.occurrences('FREQ=DAILY;UNTIL=20250107T033000Z', before)[-1], local(2025, 1, 7, 9, 0))
+        self.assertEqual(self.occurrences('FREQ=DAILY;UNTIL=20250107T032959Z', before)[-1], local(2025, 1, 6, 9, 0))
+
+
+class MaterializeRecurringTests(TaskTestCase):
+    def test_materializes_horizon_once(self):
+        now = timezone.now()
+        template = RecurringTaskTemplate.objects.create(
+            title='Lab check', description='', created_by='Tester', recurrence='FREQ=DAILY;COUNT=3',
+            dtstart=now + timedelta(hours=1)
+        )
+        template.assignees.add(self.faculty)
+
+        tasks = materialize_template(template.pk, now)
+        self.assertEqual([task.due_date for task in tasks], [now + timedelta(days=i, hours=1) for i in range(3)])
+        self.assertEqual(TaskAssignment.objects.filter(task__recurring_template=template,
+                                                       assignee=self.faculty).count(), 3)
+        self.assertEqual(materialize_template(template.pk, now + timedelta(days=1)), [])
+        self.assertEqual(Task.objects.filter(recurring_template=template).count(), 3)
+
+
+class DirtyFieldsTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = self.make_task('Dirty', [self.faculty])
+
+    def updates(self, instance):
+        with CaptureQueriesContext(connection) as queries:
+            instance.save()
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+
+    def test_save_writes_changed_columns(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.title = 'Renamed'
+        [update] = self.updates(task)
+        self.assertIn('"title"', update)
+        self.assertIn('"updated_at"', update)
+        self.assertNotIn('"description"', update)
+        self.assertEqual(task.get_dirty_fields(), {})
+
+    def test_unchanged_save_writes_nothing(self):
+        assignment = TaskAssignment.objects.get(task=self.task)
+        assignment.department = assignment.department
+        self.assertEqual(self.updates(assignment), [])
+
+    def test_raw_values_compared_as_stored(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.due_date = timezone.localtime(task.due_date).isoformat()
+        self.assertEqual(task.get_dirty_fields(), {})
+
+        due_date = local(2030, 1, 1, 10, 0)
+        task.due_date = '2030-01-01T10:00:00'
+        self.assertEqual(task.get_changes(), {'due_date': {'old': str(self.task.due_date), 'new': str(due_date)}})
+
+    def test_deferred_load_keeps_changes(self):
+        task = Task.objects.only('id', 'title').get(pk=self.task.pk)
+        task.title = 'Renamed'
+        # Loads the deferred column
+        task.description
+        self.assertEqual(task.get_dirty_fields(), {'title': 'Dirty'})
+        self.updates(task)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).title, 'Renamed')
+
+    def test_completion_with_deferred_completed_at(self):
+        task = Task.objects.only('id', 'title', 'status').get(pk=self.task.pk)
+        task.status = 'completed'
+        [update] = self.updates(task)
+        self.assertIn('"completed_at"', update)
+        self.assertEqual(Task.objects.filter(pk=self.task.pk, completed_at__isnull=False).count(), 1)
+
+
+class ResponseCacheTests(TaskTestCase):
+    def versions(self):
+        return {user.email: scope_version(user) for user in (self.admin, self.hod, self.faculty, self.other_faculty)}
+
+    def changed(self, before):
+        return {email for email, version in self.versions().items() if before[email] != version}
+
+    def test_user_scopes(self):
+        self.assertEqual(user_scope(self.admin), 'all')
+        self.assertEqual(user_scope(self.staff), 'all')
+        self.assertEqual(user_scope(self.hod), 'dept:CSE')
+        self.assertEqual(user_scope(self.faculty), f'user:{self.faculty.pk}')
+        self.assertIsNone(user_scope(User(role='guest')))
+
+    def test_invalidate(self):
+        before = self.versions()
+        self.assertEqual(self.versions(), before)
+        invalidate(['ECE'])
+        self.assertEqual(self.changed(before), {'admin@example.com'})
+
+        before = self.versions()
+        invalidate(['CSE'], [self.faculty.pk])
+        self.assertEqual(self.changed(before), {'admin@example.com', 'hod@example.com', 'faculty@example.com'})
+
+        before = self.versions()
+        invalidate_all()
+        self.assertEqual(self.changed(before), set(before))
+
+    def test_signals_invalidate_visible_scopes(self):
+        before = self.versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            task = self.make_task('Signals', [self.faculty])
+        self.assertEqual(self.changed(before), {'admin@example.com', 'hod@example.com', 'faculty@example.com'})
+
+        before = self.versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = 'Renamed'
+            task.save()
+        self.assertEqual(self.changed(before), {'admin@example.com', 'hod@example.com', 'faculty@example.com'})
+
+        before = self.versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskHistory.objects.create(task=task, action='updated', performed_by=self.staff, comment='ping')
+        self.assertEqual(self.changed(before), {'admin@example.com', 'hod@example.com', 'faculty@example.com'})
+
+    def test_cached_responses(self):
+        task = self.make_task('Cached', [self.faculty])
+        client = self.client_for(self.faculty)
+        response = client.get('/api/tasks/')
+        self.assertEqual(response['X-Cache'], 'miss')
+        response = client.get('/api/tasks/')
+        self.assertEqual(response['X-Cache'], 'hit')
+        self.assertEqual([t['title'] for t in response.json()['tasks']], ['Cached'])
+        self.assertEqual(client.get('/api/tasks/', {'fields': 'id,title'})['X-Cache'], 'miss')
+        self.assertEqual(client.get('/api/dashboard/')['X-Cache'], 'miss')
+        self.assertEqual(client.get('/api/dashboard/')['X-Cache'], 'hit')
+
+        # Another faculty member has their own scope
+        response = self.client_for(self.other_faculty).get('/api/tasks/')
+        self.assertEqual((response['X-Cache'], response.json()['tasks']), ('miss', []))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = 'Renamed'
+            task.save()
+        response = client.get('/api/tasks/')
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertEqual([t['title'] for t in response.json()['tasks']], ['Renamed'])
+
+    @override_settings(RESPONSE_CACHE_LOCK_WAIT=0.1)
+    def test_stale_only_within_version(self):
+        task = self.make_task('Before', [self.faculty])
+        client = self.client_for(self.faculty)
+        client.get('/api/tasks/')
+        key = _cache_key('tasks', user_scope(self.faculty), RequestFactory().get('/api/tasks/'))
+        cache = caches['responses']
+        # Another request is rebuilding the entry
+        cache.add(key + ':lock', 1)
+
+        entry = cache.get(key)
+        cache.set(key, {**entry, 'expires': entry['expires'] - settings.RESPONSE_CACHE_TTL - 1})
+        self.assertEqual(client.get('/api/tasks/')['X-Cache'], 'stale')
+
+        # The user's own change: the old copy is not served, the request builds its own
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = 'After'
+            task.save()
+        response = client.get('/api/tasks/')
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertEqual([t['title'] for t in response.json()['tasks']], ['After'])
+
+
+class AttachmentDownloadTests(TaskTestCase):
+    content = bytes(range(256)) * 1000
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, ATTACHMENT_ACCEL_REDIRECT=''))
+        os.makedirs(os.path.join(media_root, 'attachments'))
+        with open(os.path.join(media_root, 'attachments', 'report.pdf'), 'wb') as f:
+            f.write(self.content)
+        self.task = self.make_task('Files', [self.faculty])
+        self.attachment = TaskAttachment.objects.create(
+            task=self.task, file='attachments/report.pdf', uploaded_by=self.staff, file_name='report.pdf',
+            file_size=len(self.content), sha256='ab' * 32,
+        )
+        self.url = f'/api/tasks/{self.task.pk}/attachments/{self.attachment.pk}/'
+
+    def test_whole_file(self):
+        response = self.client_for(self.faculty).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual((response['Content-Length'], response['ETag']), (str(len(self.content)), f'"{"ab" * 32}"'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_range(self):
+        client = self.client_for(self.faculty)
+        response = client.get(self.url, headers={'Range': 'bytes=100-199'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = client.get(self.url, headers={'Range': 'bytes=-10'})
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+        response = client.get(self.url, headers={'Range': f'bytes={len(self.content)}-'})
+        self.assertEqual(response.status_code, 416)
+        # The client's copy is outdated: the whole file
+        response = client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"old"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified(self):
+        response = self.client_for(self.faculty).get(self.url, headers={'If-None-Match': f'"{"ab" * 32}"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_visibility(self):
+        self.assertEqual(self.client_for(self.other_faculty).get(self.url).status_code, 403)
+        self.assertEqual(self.client_for(self.hod).get(self.url).status_code, 200)
+        response = self.client_for(self.faculty).get(self.url + 'thumbnail/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_asgi_streams_asynchronously(self):
+        request = AsyncRequestFactory().get(self.url, headers={'Range': 'bytes=1000-200999'})
+        response = attachment_response(request, self.attachment)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), self.content[1000:201000])
+
+
+class NdjsonImportTests(TaskTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.dump = os.path.join(directory, 'dump.ndjson')
+
+    def test_flush_and_reimport(self):
+        task = self.make_task('Dumped', [self.faculty])
+        created_at = timezone.now() - timedelta(days=30)
+        Task.objects.filter(pk=task.pk).update(created_at=created_at, updated_at=created_at)
+        call_command('export_ndjson', self.dump, stderr=StringIO())
+
+        # Rows pointing at users that the dump doesn't carry
+        LogEntry.objects.log_actions(self.admin.pk, [task], ADDITION)
+        self.staff.user_permissions.add(Permission.objects.first())
+        self.make_task('Not dumped')
+        # Run the foreign key checks pending in the test's transaction; PostgreSQL
+        # won't TRUNCATE tables with pending checks (a real run starts with none)
+        connection.check_constraints()
+        call_command('import_ndjson', self.dump, '--flush', stdout=StringIO())
+
+        self.assertEqual(list(Task.objects.values_list('title', flat=True)), ['Dumped'])
+        self.assertEqual(Task.objects.get().created_at, created_at)
+        self.assertFalse(LogEntry.objects.exists())
+        self.assertFalse(self.staff.user_permissions.exists())
+        self.assertEqual(TaskAssignment.objects.get().assignee_id, self.faculty.pk)
+
+    def test_timestamp_fields_restored_after_failure(self):
+        call_command('export_ndjson', self.dump, stderr=StringIO())
+        # Not empty, no --flush
+        with self.assertRaises(CommandError):
+            call_command('import_ndjson', self.dump, stdout=StringIO())
+        self.assertTrue(Task._meta.get_field('created_at').auto_now_add)
+        self.assertTrue(Task._meta.get_field('updated_at').auto_now)
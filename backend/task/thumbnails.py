@@ -0,0 +1,121 @@
+"""
+Attachment thumbnails.
+
+After an attachment is saved, a small WebP thumbnail is rendered in a background
+process pool and cached on disk next to the file (``<file>.webp``), so task detail
+pages show a few KB per attachment instead of full-size scans. Images are rendered
+with Pillow; PDFs get a first-page preview when poppler's ``pdftoppm`` is installed
+(it is in the Docker image). Content-addressed files share one thumbnail.
+
+The worker processes only receive file paths and never touch Django, so they are
+started with "spawn" and don't inherit the server's threads or DB connections.
+Once a thumbnail exists, the attachments of that file get has_thumbnail set, so
+task details don't have to look for it on disk.
+"""
+
+import functools
+import logging
+import mimetypes
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SUFFIX = '.webp'
+WEBP_QUALITY = 75
+
+_executor = None
+
+
+def thumbnail_path(path):
+    return path + THUMBNAIL_SUFFIX
+
+
+def thumbnail_kind(file_name):
+    """'image', 'pdf' or None when no thumbnail can be made for this file"""
+    content_type = mimetypes.guess_type(file_name)[0] or ''
+    if content_type == 'application/pdf':
+        return 'pdf' if shutil.which('pdftoppm') else None
+    return 'image' if content_type.startswith('image/') else None
+
+
+def render_thumbnail(source, size, kind):
+    """Write the WebP thumbnail for ``source``; runs in a worker process"""
+    from PIL import Image, ImageOps
+
+    dest = thumbnail_path(source)
+    if os.path.exists(dest):
+        return dest
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if kind == 'pdf':
+            subprocess.run(
+                ['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-png',
+                 '-scale-to', str(size), source, os.path.join(workdir, 'page')],
+                check=True, capture_output=True, timeout=60,
+            )
+            source = os.path.join(workdir, 'page.png')
+
+        with Image.open(source) as image:
+            # JPEG decoders can scale down while decoding, skipping most of the work
+            image.draft('RGB', (size, size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size))
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+            # Write and rename, so readers never see a partial file
+            temp_dest = f'{dest}.{os.getpid()}.tmp'
+            image.save(temp_dest, 'WEBP', quality=WEBP_QUALITY, method=4)
+        os.replace(temp_dest, dest)
+    return dest
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def mark_thumbnail_ready(file_name):
+    """Record that the stored file ``file_name`` has its thumbnail (for every attachment of it)"""
+    from .models import TaskAttachment
+    TaskAttachment.objects.filter(file=file_name, has_thumbnail=False).update(has_thumbnail=True)
+
+
+def _record_result(file_name, future):
+    exc = future.exception()
+    if exc is not None:
+        logger.warning('thumbnail generation failed', exc_info=exc)
+        return
+    # Runs on the executor's long-lived management thread, outside any request
+    close_old_connections()
+    try:
+        mark_thumbnail_ready(file_name)
+    except Exception:
+        logger.warning('could not record thumbnail', extra={'file_name': file_name}, exc_info=True)
+
+
+def schedule_thumbnail(attachment):
+    """Render ``attachment``'s thumbnail in the background unless it already exists"""
+    kind = thumbnail_kind(attachment.file_name)
+    if kind is None:
+        return None
+    source = attachment.file.path
+    if os.path.exists(thumbnail_path(source)):
+        # The same content was uploaded before
+        mark_thumbnail_ready(attachment.file.name)
+        return None
+    future = _get_executor().submit(render_thumbnail, source, settings.THUMBNAIL_SIZE, kind)
+    future.add_done_callback(functools.partial(_record_result, attachment.file.name))
+    return future
@@ -9,7 +9,16 @@ urlpatterns = [
     path('tasks/create/', views.create_task, name='create-task'),
     path('tasks/history/', views.get_task_history, name='get-task-history'),
     path('tasks/<int:task_id>/comments/', views.get_task_comments, name='get-task-comments'),
+    path('tasks/<int:task_id>/attachments/<int:attachment_id>/', views.download_attachment, name='download-attachment'),
+    path('tasks/<int:task_id>/attachments/<int:attachment_id>/thumbnail/', views.download_attachment,
+         {'thumbnail': True}, name='attachment-thumbnail'),
     path('tasks/comments/', views.get_all_follow_comments, name='get-all-follow-comments'),
+    path('tasks/recurring/', views.recurring_templates, name='recurring-templates'),
+    path('tasks/recurring/<int:template_id>/', views.recurring_template_detail, name='recurring-template-detail'),
+    path('tasks/recurring/occurrences/', views.recurring_occurrences, name='recurring-occurrences'),
+    path('analytics/', views.analytics, name='analytics'),
+    path('calendar/', views.calendar_subscription, name='calendar-subscription'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar-feed'),
     
     # Admin only
     path('tasks/generate-pdf/', views.generate_task_pdf, name='generate-task-pdf'),
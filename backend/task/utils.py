@@ -1,9 +1,50 @@
-from django.core.mail import send_mail
+from django.core.mail import send_mail as django_send_mail
 from django.conf import settings
 from django.utils import timezone
 from django.db.models import Q
 from datetime import timedelta
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import logging
 from staff.models import User  # Import User model for HOD lookup
+from backend.metrics import NOTIFICATIONS, SMTP_FAILURES, SMTP_LATENCY
+from backend.request_timing import timed
+
+logger = logging.getLogger(__name__)
+
+# Async views hand the blocking SMTP conversation to a dedicated thread pool,
+# so slow mail servers never tie up the event loop or the ORM threads
+_mail_executor = ThreadPoolExecutor(max_workers=settings.EMAIL_SEND_THREADS, thread_name_prefix='mail')
+
+def _deliver(notification, **kwargs):
+    """Hand one message to the mail backend, recording latency and outcome"""
+    with SMTP_LATENCY.labels(notification).time():
+        try:
+            sent = django_send_mail(**kwargs)
+        except Exception:
+            SMTP_FAILURES.labels(notification).inc()
+            raise
+    # With fail_silently=True a rejected message comes back as 0 sent
+    if sent:
+        NOTIFICATIONS.labels(notification).inc()
+    else:
+        SMTP_FAILURES.labels(notification).inc()
+    return sent
+
+def send_mail(notification, **kwargs):
+    """Django's send_mail, timed for Server-Timing and counted in /metrics by notification type"""
+    with timed('email'):
+        return _deliver(notification, **kwargs)
+
+async def asend_mail(notification, **kwargs):
+    """send_mail for async views"""
+    loop = asyncio.get_running_loop()
+    # Timed here: the executor thread does not see the request's context
+    with timed('email'):
+        return await loop.run_in_executor(_mail_executor, functools.partial(_deliver, notification, **kwargs))
+
 def get_task_assignment_html(task, assignee):
     initiated_by = task.created_by.get_full_name() if hasattr(task.created_by, "get_full_name") else str(task.created_by)
     return f"""
@@ -76,36 +117,47 @@ def get_overdue_html(task, assignee):
         <p style="margin-top: 24px;">Sincerely,<br><strong>Task Management System</strong></p>
     </div>
     """
+def get_task_assignment_recipients(assignee):
+    """Assignee plus their HOD and all admins."""
+    recipient_list = [assignee.email]
+    # Include HOD
+    if assignee.department:
+        hod = User.objects.filter(department=assignee.department, role='hod').first()
+        if hod and hod.email:
+            recipient_list.append(hod.email)
+    # Include all admins
+    admin_emails = User.objects.filter(
+        Q(role='admin') | Q(is_superuser=True)
+    ).values_list('email', flat=True).distinct()
+    recipient_list.extend(admin_emails)
+    # Remove duplicates / invalids
+    return list(set(filter(None, recipient_list)))
+def _task_assignment_message(task, assignee):
+    """send_mail arguments of the assignment email to ``assignee`` and their HOD/admins"""
+    recipient_list = get_task_assignment_recipients(assignee)
+    logger.info("sending task assignment email", extra={'task_id': task.id, 'recipients': len(recipient_list)})
+    logger.debug("task assignment recipients", extra={'task_id': task.id, 'recipient_list': recipient_list})
+    return {
+        'notification': 'assignment',
+        'subject': task.title,  # ✅ Subject is always the title
+        'message': '',
+        'html_message': get_task_assignment_html(task, assignee),
+        'from_email': settings.DEFAULT_FROM_EMAIL,
+        'recipient_list': recipient_list,
+        'fail_silently': False,
+    }
 def send_task_assignment_email(task, assignee):
     """Send email to assignee and notify HOD/admins."""
     try:
-        subject = task.title  # ✅ Subject is always the title
-        html_message = get_task_assignment_html(task, assignee)
-        recipient_list = [assignee.email]
-        # Include HOD
-        if assignee.department:
-            hod = User.objects.filter(department=assignee.department, role='hod').first()
-            if hod and hod.email:
-                recipient_list.append(hod.email)
-        # Include all admins
-        admin_emails = User.objects.filter(
-            Q(role='admin') | Q(is_superuser=True)
-        ).values_list('email', flat=True).distinct()
-        recipient_list.extend(admin_emails)
-        # Remove duplicates / invalids
-        recipient_list = list(set(filter(None, recipient_list)))
-        print(f"Sending email for task '{task.title}' to: {recipient_list}")
-        send_mail(
-            subject=subject,
-            message='',
-            html_message=html_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=recipient_list,
-            fail_silently=False
-        )
-    except Exception as e:
-        if settings.DEBUG:
-            print(f"Error sending task assignment email: {str(e)}")
+        send_mail(**_task_assignment_message(task, assignee))
+    except Exception:
+        logger.warning("error sending task assignment email", extra={'task_id': task.id}, exc_info=True)
+async def asend_task_assignment_email(task, assignee):
+    """Async variant of send_task_assignment_email for async views."""
+    try:
+        await asend_mail(**await sync_to_async(_task_assignment_message)(task, assignee))
+    except Exception:
+        logger.warning("error sending task assignment email", extra={'task_id': task.id}, exc_info=True)
 def send_deadline_reminder_email(task, assignee):
     """Send deadline reminder email."""
     try:
@@ -114,6 +166,7 @@ def send_deadline_reminder_email(task, assignee):
         hours_left = int(time_left.total_seconds() / 3600)
         html_message = get_deadline_reminder_html(task, assignee, hours_left)
         send_mail(
+            notification='reminder',
             subject=subject,
             message='',
             html_message=html_message,
@@ -121,15 +174,15 @@ def send_deadline_reminder_email(task, assignee):
             recipient_list=[assignee.email],
             fail_silently=True
         )
-    except Exception as e:
-        if settings.DEBUG:
-            print(f"Error sending deadline reminder email: {str(e)}")
+    except Exception:
+        logger.warning("error sending deadline reminder email", extra={'task_id': task.id}, exc_info=True)
 def send_overdue_notification(task, assignee):
     """Send overdue notification email."""
     try:
         subject = task.title  # ✅ Only title
         html_message = get_overdue_html(task, assignee)
         send_mail(
+            notification='overdue',
             subject=subject,
             message='',
             html_message=html_message,
@@ -137,9 +190,8 @@ def send_overdue_notification(task, assignee):
             recipient_list=[assignee.email],
             fail_silently=True
         )
-    except Exception as e:
-        if settings.DEBUG:
-            print(f"Error sending overdue notification email: {str(e)}")
+    except Exception:
+        logger.warning("error sending overdue notification email", extra={'task_id': task.id}, exc_info=True)
 
 def get_status_update_html(task, assignee, old_status, new_status):
     """Generate HTML for status update email."""
@@ -201,6 +253,7 @@ def send_status_update_email(task, assignee, old_status, new_status):
         recipient_list = list(set(filter(None, recipient_list)))
         
         send_mail(
+            notification='status',
             subject=subject,
             message='',
             html_message=html_message,
@@ -209,7 +262,6 @@ def send_status_update_email(task, assignee, old_status, new_status):
             fail_silently=True
         )
         return True
-    except Exception as e:
-        if settings.DEBUG:
-            print(f"Error sending status update email: {str(e)}")
+    except Exception:
+        logger.warning("error sending status update email", extra={'task_id': task.id}, exc_info=True)
         return False
\ No newline at end of file
@@ -1,16 +1,34 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .utils import send_task_assignment_email
+from adrf.decorators import api_view
+from asgiref.sync import sync_to_async
+from .utils import asend_task_assignment_email
 from .test_email import test_email
 from django.db.models import Q, Count
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.csrf import csrf_exempt
-from .models import Task, TaskAssignment, TaskHistory
-from .serializers import TaskSerializer, TaskDetailSerializer, TaskCreateSerializer, TaskHistorySerializer
+from django.views.decorators.http import require_GET
+from django.conf import settings
+from django.urls import reverse
+from .models import Task, TaskAssignment, TaskHistory, TaskAttachment, RecurringTaskTemplate, TaskDailyStats
+from .downloads import attachment_response
+from .serializers import TaskSerializer, TaskDetailSerializer, TaskCreateSerializer, TaskHistorySerializer, parse_field_params
+from .serializers import RecurringTaskTemplateSerializer
+from .recurring import upcoming_occurrences
+from .ical import feed_etag, get_cached_feed, new_calendar_token, stream_feed
+from .response_cache import cache_scoped_response
+from staff.models import User
 from .permissions import IsAdmin, IsHOD, IsAdminOrStaff, IsFaculty, IsStaff
-from django.http import HttpResponse
+from backend.db_routers import use_replica
+from backend.query_budget import query_budget
+from backend.throttling import ReportThrottle, TaskListThrottle
+from backend.request_timing import timed
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+import asyncio
 import csv
 from io import BytesIO
 from reportlab.pdfgen import canvas
@@ -18,293 +36,294 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Task columns the update endpoints record in history
+UPDATABLE_FIELDS = ('title', 'description', 'due_date', 'priority', 'status', 'reminder1', 'reminder2')
+
+# The read views are sync: they only query and serialize, which an async view
+# would hand to sync_to_async threads one query at a time. Views that wait on
+# SMTP or stream a response (create_task, test_email, calendar_feed) are async.
+
+@query_budget(3)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
+@cache_scoped_response('dashboard')
 def dashboard_view(request):
     """Dashboard stats for all roles"""
     user = request.user
     
-    # Get tasks based on role
-    if user.role == 'admin' or user.is_superuser:
-        tasks = Task.objects.all()
-    elif user.role == 'hod':
-        tasks = Task.objects.filter(
-            assignments__department=user.department
-        ).distinct()
-    else:  # staff (Faculty)
-        # Staff can see all tasks (consistent with get_all_tasks)
-        tasks = Task.objects.all()
-    
-    # Calculate stats based on status (not priority)
-    total_tasks = tasks.count()
-    completed_tasks = tasks.filter(status='completed').count()
-    ongoing_tasks = tasks.filter(status='pending').count()  # pending = ongoing
+    # Get tasks based on role (same scoping as get_all_tasks)
+    tasks = Task.objects.visible_to(user)
     
-    return Response({
-        'total_task': total_tasks,
-        'completed_task': completed_tasks,
-        'ongoing_task': ongoing_tasks
-    })
+    # Calculate stats based on status (not priority), in a single query
+    stats = tasks.aggregate(
+        total_task=Count('id'),
+        completed_task=Count('id', filter=Q(status='completed')),
+        ongoing_task=Count('id', filter=Q(status='pending')),  # pending = ongoing
+    )
+    
+    return Response(stats)
+
+
+def _task_list_data(tasks, params):
+    """Overdue updates and serialization for get_all_tasks"""
+    # Update overdue tasks
+    for task in tasks:
+        try:
+            task.update_status()
+        except Exception as e:
+            logger.warning("error updating task status", extra={'task_id': task.id}, exc_info=True)
+            continue
+    
+    with timed('serialize'):
+        return TaskSerializer(tasks, many=True, **params).data
 
 
+@query_budget(6)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([TaskListThrottle])
+@use_replica
+@cache_scoped_response('tasks')
 def get_all_tasks(request):
-    """Get all tasks based on user role"""
+    """Get all tasks based on user role (supports ?fields= and ?expand=assignees)"""
+    params = parse_field_params(request)
+    # Load only the columns and relations the requested fields use
+    # (raises a 400 for unknown names before anything runs)
+    tasks = TaskSerializer.optimize_queryset(Task.objects.all(), **params)
     try:
         user = request.user
         
-        # Query based on role hierarchy
-        if user.role in ['admin', 'staff']:
-            # Admin and Staff can see all tasks
-            tasks = Task.objects.all()
+        # Query based on role hierarchy: Admin and Staff see all tasks,
+        # HOD sees department tasks, Faculty sees their assigned tasks
+        tasks = list(tasks.visible_to(user))
+        
+        response = Response({'tasks': _task_list_data(tasks, params)})
+        # A cached list goes stale when the next open task turns overdue
+        response.cache_until = min(
+            (task.due_date for task in tasks if task.status not in ('completed', 'overdue')), default=None
+        )
+        return response
+    except Exception as e:
+        logger.exception("get_all_tasks failed")
+        return Response(
+            {'error': 'Failed to fetch tasks', 'detail': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _task_detail_data(task, params):
+    """GET branch of get_task"""
+    task.update_status()
+    with timed('serialize'):
+        return TaskDetailSerializer(task, **params).data
+
+
+def _update_task(request, task):
+    """PUT branch of get_task"""
+    user = request.user
+    
+    # Permission and logging block
+    try:
+        logger.info("task update requested", extra={'task_id': task.id, 'user_id': user.pk, 'role': user.role})
+        # Payload dumps only when debug logging is on; building them isn't free
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("task update payload", extra={
+                'task_id': task.id,
+                'created_by': task.created_by,
+                'assignees': [a.assignee.email for a in task.assignments.all()],
+                'payload': request.data,
+            })
+        
+        # Permission check based on hierarchy
+        can_edit = False
+        
+        if user.role in ['admin', 'staff'] or user.is_superuser:
+            # Admin and Staff can edit everything
+            can_edit = True
         elif user.role == 'hod':
-            # HOD can only see department tasks
-            tasks = Task.objects.filter(
-                Q(assignments__department=user.department)
-            ).distinct()
+            # HOD can only view, not edit
+            can_edit = False
         elif user.role == 'faculty':
-            # Faculty can only see their assigned tasks
-            tasks = Task.objects.filter(
-                assignments__assignee=user
-            ).distinct()
-        
-        # Prefetch related data for performance
-        tasks = tasks.prefetch_related('assignments__assignee')
-        
-        # Update overdue tasks
-        for task in tasks:
-            try:
-                task.update_status()
-            except Exception as e:
-                logger.warning(f"Error updating status for task {task.id}: {str(e)}")
-                continue
-        
-        serializer = TaskSerializer(tasks, many=True)
-        return Response({'tasks': serializer.data})
+            # Faculty can only view, not edit
+            can_edit = False
+        
+        # Special check for status update - only admin and staff can mark as completed
+        if request.data.get('status') == 'completed' and not (user.role in ['admin', 'staff'] or user.is_superuser):
+            return Response(
+                {'error': 'Only Admin and Staff can mark tasks as completed'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        # Safe creator and assigned checks
+        is_creator = task.created_by == user.email if isinstance(task.created_by, str) else (task.created_by == user)
+        # For assigned, use loop if filter may fail on str
+        is_assigned = any(
+            a.assignee == user if not isinstance(a.assignee, str) else a.assignee == user.email
+            for a in task.assignments.all()
+        )
+        
+        logger.debug("task update permission", extra={
+            'task_id': task.id, 'can_edit': can_edit, 'is_superuser': user.is_superuser,
+            'is_creator': is_creator, 'is_assigned': is_assigned,
+        })
+        
+        if not can_edit:
+            return Response(
+                {'error': 'You do not have permission to update this task'},
+                status=status.HTTP_403_FORBIDDEN
+            )
     except Exception as e:
-        logger.error(f"Error in get_all_tasks: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("task update permission check failed", extra={'task_id': task.id})
         return Response(
-            {'error': 'Failed to fetch tasks', 'detail': str(e)},
+            {'error': 'Error checking permissions', 'detail': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+    
+    for field in ('title', 'description', 'due_date', 'priority', 'status'):
+        if field in request.data:
+            setattr(task, field, request.data[field])
+    
+    # Reopened tasks lose their completion time; Task.save sets it on completion
+    if 'status' in task.get_dirty_fields() and task.status != 'completed' and task.completed_at:
+        task.completed_at = None
+    
+    # Old/new values of what actually changed, before saving resets the tracking
+    changes = task.get_changes(fields=UPDATABLE_FIELDS)
+    
+    # Handle assignee and department updates
+    try:
+        if 'assignee' in request.data:
+            from staff.models import User
+            
+            # Clear existing assignments
+            task.assignments.all().delete()
+            
+            # Create new assignments
+            assignees = request.data['assignee']
+            
+            logger.debug("updating assignees", extra={'task_id': task.id, 'assignees': assignees})
+            
+            # Each assignee gets assigned once with their own department
+            for email in assignees:
+                try:
+                    user_obj = User.objects.get(email=email)
+                    # Use the user's department from their profile
+                    # unique_together constraint allows only one assignment per task-assignee pair
+                    TaskAssignment.objects.create(
+                        task=task,
+                        assignee=user_obj,
+                        department=user_obj.department or 'GENERAL'  # Fallback to GENERAL if no department
+                    )
+                except User.DoesNotExist:
+                    logger.warning("assignee not found", extra={'task_id': task.id, 'email': email})
+                    continue
+                except Exception:
+                    logger.exception("error creating assignment", extra={'task_id': task.id, 'email': email})
+                    continue
+    except Exception as e:
+        logger.exception("error updating assignees", extra={'task_id': task.id})
+        return Response({'error': 'Error updating assignees', 'detail': str(e)}, status=500)
+    
+    # Capture follow_comment and decide if to save
+    follow_comment = request.data.get('follow_comment', '').strip()
+    has_changes = bool(changes)
+    should_save = has_changes or bool(follow_comment)
+    
+    if should_save:
+        task.save()
+        
+        # Build history details
+        history_details = {
+            'changes': changes,
+            'updated_fields': list(changes.keys()) if has_changes else []
+        }
+        if follow_comment:
+            history_details['follow_comment'] = follow_comment
+            logger.info("follow comment saved", extra={'task_id': task.id, 'user_id': request.user.pk})
+        
+        # Create history entry
+        TaskHistory.objects.create(
+            task=task,
+            action='updated',
+            performed_by=request.user,
+            details=history_details,
+            comment=follow_comment if follow_comment else None  # Also save to dedicated field
+        )
+    
+    return Response(TaskDetailSerializer(task).data)
 
 
+def _delete_task(request, task):
+    """DELETE branch of get_task"""
+    user = request.user
+    
+    logger.info("task delete requested", extra={'task_id': task.id, 'user_id': user.pk, 'role': user.role})
+    
+    # Permission check: Admin and Staff can delete any task, HOD can delete department tasks
+    # Safe creator check
+    is_creator = task.created_by == user.email if isinstance(task.created_by, str) else (task.created_by == user)
+    can_delete = (
+        user.role == 'admin' or 
+        user.role == 'staff' or  # Staff (Faculty) can delete all tasks
+        user.is_superuser or
+        (user.role == 'hod' and task.is_visible_to(user)) or
+        is_creator
+    )
+    
+    logger.debug("task delete permission", extra={
+        'task_id': task.id, 'can_delete': can_delete, 'is_superuser': user.is_superuser, 'is_creator': is_creator,
+    })
+    
+    if not can_delete:
+        return Response(
+            {'error': 'You do not have permission to delete this task'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    task.delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# Deleting a task with an attachment also releases its stored blob (2-3 queries)
+@query_budget(17)
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def get_task(request, task_id):
-    """Get, update, or delete a task"""
+    """Get, update, or delete a task (GET supports ?fields= and ?expand=history,attachments,assignees)"""
     user = request.user
+    if request.method == 'GET':
+        params = parse_field_params(request)
+        tasks = TaskDetailSerializer.optimize_queryset(Task.objects.all(), **params)
+    else:
+        tasks = Task.objects.prefetch_related(
+            'assignments__assignee',
+            'history__performed_by',
+            'attachments__uploaded_by'
+        )
     
     try:
-        task = Task.objects.prefetch_related(
-            'assignments__assignee',                                                                        
-            'history__performed_by',
-            'attachments'
-        ).get(id=task_id)
+        task = tasks.get(id=task_id)
         
         # Check permission - Staff can now view all tasks
-        if user.role == 'hod' and not user.is_superuser:
-            if not task.assignments.filter(department=user.department).exists():
-                return Response(
+        # (uses the prefetched assignments; one query when ?expand leaves them out)
+        if not task.is_visible_to(user):
+            return Response(
                     {'error': 'Permission denied'},
                     status=status.HTTP_403_FORBIDDEN
                 )
         
         # Handle GET request
         if request.method == 'GET':
-            task.update_status()
-            serializer = TaskDetailSerializer(task)
-            return Response(serializer.data)
+            return Response(_task_detail_data(task, params))
         
         # Handle PUT request (Update)
         elif request.method == 'PUT':
-            # Permission and logging block
-            try:
-                # Debug logging - Safe access to created_by and assignees
-                created_by_safe = task.created_by if isinstance(task.created_by, str) else (task.created_by.email if task.created_by else 'None')
-                assignee_emails = [
-                    a.assignee.email if not isinstance(a.assignee, str) else a.assignee 
-                    for a in task.assignments.all()
-                ]
-                logger.info(f"PUT request from user: {user.email}, role: {user.role}")
-                logger.info(f"Task ID: {task.id}, created_by: {created_by_safe}")
-                logger.info(f"Task assignments: {assignee_emails}")
-                logger.info(f"Request data: {request.data}")
-                
-                # Permission check based on hierarchy
-                can_edit = False
-                
-                if user.role in ['admin', 'staff'] or user.is_superuser:
-                    # Admin and Staff can edit everything
-                    can_edit = True
-                elif user.role == 'hod':
-                    # HOD can only view, not edit
-                    can_edit = False
-                elif user.role == 'faculty':
-                    # Faculty can only view, not edit
-                    can_edit = False
-                
-                # Special check for status update - only admin and staff can mark as completed
-                if request.data.get('status') == 'completed' and not (user.role in ['admin', 'staff'] or user.is_superuser):
-                    return Response(
-                        {'error': 'Only Admin and Staff can mark tasks as completed'},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-                
-                # Safe creator and assigned checks
-                is_creator = task.created_by == user.email if isinstance(task.created_by, str) else (task.created_by == user)
-                # For assigned, use loop if filter may fail on str
-                is_assigned = any(
-                    a.assignee == user if not isinstance(a.assignee, str) else a.assignee == user.email
-                    for a in task.assignments.all()
-                )
-                
-                logger.info(f"Can edit: {can_edit}")
-                logger.info(f"  - is_admin: {user.role == 'admin'}")
-                logger.info(f"  - is_superuser: {user.is_superuser}")
-                logger.info(f"  - is_creator: {is_creator}")
-                logger.info(f"  - is_assigned: {is_assigned}")
-                
-                if not can_edit:
-                    return Response(
-                        {'error': 'You do not have permission to update this task'},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-            except Exception as e:
-                logger.error(f"Error in permission check: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                return Response(
-                    {'error': 'Error checking permissions', 'detail': str(e)},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-            
-            # Capture old values
-            changes = {}
-            
-            if 'title' in request.data and task.title != request.data['title']:
-                changes['title'] = {'old': task.title, 'new': request.data['title']}
-                task.title = request.data['title']
-            
-            if 'description' in request.data and task.description != request.data['description']:
-                changes['description'] = {'old': task.description, 'new': request.data['description']}
-                task.description = request.data['description']
-            
-            if 'due_date' in request.data:
-                new_deadline = request.data['due_date']
-                if str(task.due_date) != str(new_deadline):
-                    changes['due_date'] = {'old': str(task.due_date), 'new': str(new_deadline)}
-                    task.due_date = new_deadline
-            
-            if 'priority' in request.data and task.priority != request.data['priority']:
-                changes['priority'] = {'old': task.priority, 'new': request.data['priority']}
-                task.priority = request.data['priority']
-            
-            if 'status' in request.data and task.status != request.data['status']:
-                changes['status'] = {'old': task.status, 'new': request.data['status']}
-                task.status = request.data['status']
-                
-                if task.status == 'completed' and not task.completed_at:
-                    task.completed_at = timezone.now()
-                elif task.status != 'completed' and task.completed_at:
-                    task.completed_at = None
-            
-            # Handle assignee and department updates
-            try:
-                if 'assignee' in request.data:
-                    from staff.models import User
-                    
-                    # Clear existing assignments
-                    task.assignments.all().delete()
-                    
-                    # Create new assignments
-                    assignees = request.data['assignee']
-                    
-                    logger.info(f"Updating assignees: {assignees}")
-                    
-                    # Each assignee gets assigned once with their own department
-                    for email in assignees:
-                        try:
-                            user_obj = User.objects.get(email=email)
-                            # Use the user's department from their profile
-                            # unique_together constraint allows only one assignment per task-assignee pair
-                            TaskAssignment.objects.create(
-                                task=task,
-                                assignee=user_obj,
-                                department=user_obj.department or 'GENERAL'  # Fallback to GENERAL if no department
-                            )
-                            logger.info(f"Assigned {email} with department {user_obj.department}")
-                        except User.DoesNotExist:
-                            logger.warning(f"Warning: User with email {email} not found")
-                            continue
-                        except Exception as e:
-                            logger.error(f"Error creating assignment for {email}: {str(e)}")
-                            continue
-            except Exception as e:
-                logger.error(f"Error handling assignees: {str(e)}")
-                return Response({'error': 'Error updating assignees', 'detail': str(e)}, status=500)
-            
-            # Capture follow_comment and decide if to save
-            follow_comment = request.data.get('follow_comment', '').strip()
-            has_changes = bool(changes)
-            should_save = has_changes or bool(follow_comment)
-            
-            if should_save:
-                task.save()
-                
-                # Build history details
-                history_details = {
-                    'changes': changes,
-                    'updated_fields': list(changes.keys()) if has_changes else []
-                }
-                if follow_comment:
-                    history_details['follow_comment'] = follow_comment
-                    logger.info(f"Follow comment saved for task {task.id}: {follow_comment}")
-                
-                # Create history entry
-                TaskHistory.objects.create(
-                    task=task,
-                    action='updated',
-                    performed_by=request.user,
-                    details=history_details
-                )
-            
-            return Response(TaskDetailSerializer(task).data)
+            return _update_task(request, task)
         
         # Handle DELETE request
         elif request.method == 'DELETE':
-            # Debug logging - Safe access
-            created_by_safe = task.created_by if isinstance(task.created_by, str) else (task.created_by.email if task.created_by else 'None')
-            logger.info(f"DELETE request from user: {user.email}, role: {user.role}")
-            logger.info(f"Task ID: {task.id}, created_by: {created_by_safe}")
-            
-            # Permission check: Admin and Staff can delete any task, HOD can delete department tasks
-            # Safe creator check
-            is_creator = task.created_by == user.email if isinstance(task.created_by, str) else (task.created_by == user)
-            can_delete = (
-                user.role == 'admin' or 
-                user.role == 'staff' or  # Staff (Faculty) can delete all tasks
-                user.is_superuser or
-                (user.role == 'hod' and task.assignments.filter(department=user.department).exists()) or
-                is_creator
-            )
-            
-            logger.info(f"Can delete: {can_delete}")
-            logger.info(f"  - is_admin: {user.role == 'admin'}")
-            logger.info(f"  - is_superuser: {user.is_superuser}")
-            logger.info(f"  - is_creator: {is_creator}")
-            
-            if not can_delete:
-                return Response(
-                    {'error': 'You do not have permission to delete this task'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            task.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+            return _delete_task(request, task)
         
     except Task.DoesNotExist:
         return Response(
@@ -312,36 +331,39 @@ def get_task(request, task_id):
             status=status.HTTP_404_NOT_FOUND
         )
     except Exception as e:
-        logger.error(f"Error in get_task: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("get_task failed", extra={'task_id': task_id})
         return Response(
             {'error': 'Internal server error', 'detail': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+@query_budget(20)
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsAdminOrStaff])
-def create_task(request):
+async def create_task(request):
     """Create new task (Admin/HOD/Staff can create)"""
     serializer = TaskCreateSerializer(
         data=request.data,
         context={'request': request}
     )
-    serializer.is_valid(raise_exception=True)
+    await sync_to_async(serializer.is_valid)(raise_exception=True)
     
     # Create the task with the provided created_by name
-    task = serializer.save()
+    task = await sync_to_async(serializer.save)()
     
-    # Send email notifications to assigned staff and their HODs
-    for assignment in task.assignments.all():
-        send_task_assignment_email(task, assignment.assignee)
+    # Send email notifications to assigned staff and their HODs, concurrently
+    assignments = [a async for a in task.assignments.select_related('assignee')]
+    await asyncio.gather(*(
+        asend_task_assignment_email(task, assignment.assignee)
+        for assignment in assignments
+    ))
     
     return Response(
-        TaskDetailSerializer(task).data,
+        await sync_to_async(lambda: TaskDetailSerializer(task).data)(),
         status=status.HTTP_201_CREATED
     )
 
+@query_budget(14)
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_task(request, task_id):
@@ -349,69 +371,20 @@ def update_task(request, task_id):
     try:
         task = Task.objects.get(id=task_id)
         
-        # Capture old values BEFORE updating
-        old_values = {}
-        changes = {}
+        for field in ('title', 'description', 'due_date', 'priority', 'status'):
+            if field in request.data:
+                setattr(task, field, request.data[field])
+        
+        # Handle empty strings as None
+        for field in ('reminder1', 'reminder2'):
+            if field in request.data:
+                setattr(task, field, request.data[field] or None)
+        
+        if 'status' in task.get_dirty_fields() and task.status != 'completed' and task.completed_at:
+            task.completed_at = None
         
         # Track what changed
-        if 'title' in request.data and task.title != request.data['title']:
-            old_values['title'] = task.title
-            task.title = request.data['title']
-            changes['title'] = {'old': old_values['title'], 'new': task.title}
-        
-        if 'description' in request.data and task.description != request.data['description']:
-            old_values['description'] = task.description
-            task.description = request.data['description']
-            changes['description'] = {'old': old_values['description'], 'new': task.description}
-        
-        if 'due_date' in request.data:  # Note: Your model uses 'due_date', not 'deadline'
-            new_deadline = request.data['due_date']
-            if str(task.due_date) != str(new_deadline):
-                old_values['due_date'] = str(task.due_date)
-                task.due_date = new_deadline
-                changes['due_date'] = {'old': old_values['due_date'], 'new': str(new_deadline)}
-        
-        if 'priority' in request.data and task.priority != request.data['priority']:
-            old_values['priority'] = task.priority
-            task.priority = request.data['priority']
-            changes['priority'] = {'old': old_values['priority'], 'new': task.priority}
-        
-        if 'status' in request.data and task.status != request.data['status']:
-            old_values['status'] = task.status
-            # Store this for later email notifications
-            old_status = task.status
-            new_status = request.data['status']
-            
-            task.status = new_status
-            changes['status'] = {'old': old_values['status'], 'new': task.status}
-
-            if task.status == 'completed' and not task.completed_at:
-                task.completed_at = timezone.now()
-            elif task.status != 'completed' and task.completed_at:
-                task.completed_at = None
-        
-        if 'reminder1' in request.data:
-            new_reminder1 = request.data['reminder1']
-            # Handle empty strings as None
-            if new_reminder1 == "":
-                new_reminder1 = None
-            
-            if str(task.reminder1) != str(new_reminder1):
-                old_values['reminder1'] = str(task.reminder1) if task.reminder1 else None
-                task.reminder1 = new_reminder1
-                changes['reminder1'] = {'old': old_values['reminder1'], 'new': str(new_reminder1) if new_reminder1 else None}
-        
-        if 'reminder2' in request.data:
-            new_reminder2 = request.data['reminder2']
-            # Handle empty strings as None
-            if new_reminder2 == "":
-                new_reminder2 = None
-                
-            if str(task.reminder2) != str(new_reminder2):
-                old_values['reminder2'] = str(task.reminder2) if task.reminder2 else None
-                task.reminder2 = new_reminder2
-                changes['reminder2'] = {'old': old_values['reminder2'], 'new': str(new_reminder2) if new_reminder2 else None}
-                changes['reminder2'] = {'old': old_values['reminder2'], 'new': str(new_reminder2)}
+        changes = task.get_changes(fields=UPDATABLE_FIELDS)
         
         # NEW: Capture follow_comment
         follow_comment = request.data.get('follow_comment', '').strip()
@@ -441,7 +414,7 @@ def update_task(request, task_id):
             )
             
             if follow_comment:
-                logger.info(f"Follow comment saved for task {task.id}: {follow_comment}")
+                logger.info("follow comment saved", extra={'task_id': task.id, 'user_id': request.user.pk})
         
         return Response(TaskDetailSerializer(task).data)
         
@@ -451,13 +424,12 @@ def update_task(request, task_id):
             status=status.HTTP_404_NOT_FOUND
         )
     except Exception as e:
-        logger.error(f"Error in update_task: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("update_task failed", extra={'task_id': task_id})
         return Response(
             {'error': 'Error updating task', 'detail': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+@query_budget(17)
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated, IsStaff])
 def delete_task(request, task_id):
@@ -474,11 +446,17 @@ def delete_task(request, task_id):
         )
 
 
+@query_budget(3)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdmin])
+@throttle_classes([ReportThrottle])
+@use_replica
 def generate_task_pdf(request):
     """Generate PDF report of all tasks"""
-    tasks = Task.objects.select_related('created_by').prefetch_related('assignments')
+    # Stream rows instead of loading every task (server-side cursor on PostgreSQL)
+    tasks = Task.objects.only('title', 'priority').iterator(
+        chunk_size=settings.DB_ITERATOR_CHUNK_SIZE
+    )
     
     # Create PDF
     buffer = BytesIO()
@@ -504,67 +482,53 @@ def generate_task_pdf(request):
     return response
 
 
+@query_budget(4)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
 def get_task_history(request):
     """Get recent task history/activity based on user role, including follow-up comments"""
     from .serializers import TaskHistorySerializer
     user = request.user
     
-    # Get history based on role
-    if user.role == 'admin' or user.is_superuser:
-        # Admin sees all history
-        history = TaskHistory.objects.select_related(
-            'task', 'performed_by'
-        ).all()[:10]
-        
-        # For admin, get all follow-up comments, not just from recent history
-        comment_history = TaskHistory.objects.filter(
-            action='updated',
-            details__follow_comment__isnull=False
-        ).select_related('task', 'performed_by').order_by('-timestamp')[:20]
-    elif user.role == 'hod':
-        # HOD sees history for tasks in their department
-        history = TaskHistory.objects.select_related(
-            'task', 'performed_by'
-        ).filter(
-            task__assignments__department=user.department
-        ).distinct()[:10]
-        
+    # History of the tasks the user may see: all for admin/staff, the department's
+    # for a HOD, their own tasks' for faculty
+    history = TaskHistory.objects.select_related(
+        'task', 'performed_by'
+    ).visible_to(user)[:10]
+    
+    if user.role == 'hod':
         # HODs do not see follow-up comments as per updated requirements
         comment_history = TaskHistory.objects.none()
-    else:  # staff
-        # Staff sees all task history
-        history = TaskHistory.objects.select_related(
-            'task', 'performed_by'
-        ).all()[:10]
-        
-        # Staff sees all comments
-        comment_history = TaskHistory.objects.filter(
+    else:
+        # Follow-up comments across the visible tasks, not just recent history
+        comment_history = TaskHistory.objects.visible_to(user).filter(
             action='updated',
-            details__follow_comment__isnull=False
+            comment__isnull=False
         ).select_related('task', 'performed_by').order_by('-timestamp')[:20]
     
     # Extract follow-up comments
     comments = []
     for entry in comment_history:
-        if 'follow_comment' in entry.details:
+        if entry.comment:
             comments.append({
                 'id': entry.id,
                 'task_id': entry.task.id,
-                'comment': entry.details['follow_comment'],
+                'comment': entry.comment,
                 'performed_by': entry.performed_by.email if entry.performed_by else 'System',
                 'timestamp': entry.timestamp,
                 'full_details': entry.details,  # Optional: Full history for context
             })
     
     # Serialize full history
-    serializer = TaskHistorySerializer(history, many=True)
+    with timed('serialize'):
+        activities = TaskHistorySerializer(history, many=True).data
     return Response({
-        'activities': serializer.data,
+        'activities': activities,
         'follow_comments': comments  # Dedicated list of comments from broader query
     })
 
+@query_budget(4)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_task_comments(request, task_id):
@@ -579,13 +543,13 @@ def get_task_comments(request, task_id):
         history = TaskHistory.objects.filter(
             task_id=task_id,
             action='updated',
-            details__follow_comment__isnull=False
+            comment__isnull=False
         ).select_related('performed_by').order_by('-timestamp')
         
         follow_comments = [{
             'id': entry.id,
             'task_id': task_id,
-            'comment': entry.details['follow_comment'],
+            'comment': entry.comment,
             'performed_by': entry.performed_by.email if entry.performed_by else 'System',
             'timestamp': entry.timestamp,
         } for entry in history]
@@ -594,14 +558,29 @@ def get_task_comments(request, task_id):
     except Task.DoesNotExist:
         return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        logger.error(f"Error in get_task_comments: {str(e)}")
+        logger.exception("get_task_comments failed", extra={'task_id': task_id})
         return Response(
             {'error': 'Failed to fetch comments', 'detail': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
         
+@query_budget(4)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+def download_attachment(request, task_id, attachment_id, thumbnail=False):
+    """Download a task attachment or its thumbnail (same visibility rules as get_task)"""
+    try:
+        attachment = TaskAttachment.objects.select_related('task').get(id=attachment_id, task_id=task_id)
+        if not attachment.task.is_visible_to(request.user):
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        return attachment_response(request, attachment, thumbnail=thumbnail)
+    except (TaskAttachment.DoesNotExist, FileNotFoundError):
+        return Response({'error': 'Attachment not found'}, status=status.HTTP_404_NOT_FOUND)
+
+@query_budget(4)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@use_replica
 def get_all_follow_comments(request):
     """Get all follow-up comments across tasks with pagination"""
     try:
@@ -617,8 +596,8 @@ def get_all_follow_comments(request):
         
         user = request.user
         
-        # Query for comments - check both details JSONField and comment field
-        comment_filter = Q(details__follow_comment__isnull=False) | Q(comment__isnull=False)
+        # Query for comments - follow_comment is mirrored into the comment field
+        comment_filter = Q(comment__isnull=False)
         
         # Filter based on role
         if user.role == 'admin' or user.is_superuser:
@@ -636,10 +615,9 @@ def get_all_follow_comments(request):
             query = TaskHistory.objects.none()
         else:
             # Faculty sees comments on tasks assigned to them
-            query = TaskHistory.objects.filter(
-                action='updated',
-                task__assignments__assignee=user
-            ).filter(comment_filter).distinct()
+            query = TaskHistory.objects.visible_to(user).filter(
+                action='updated'
+            ).filter(comment_filter)
             
         # Execute query with pagination
         total_count = query.count()
@@ -648,10 +626,7 @@ def get_all_follow_comments(request):
         # Format comments
         follow_comments = []
         for entry in history_entries:
-            # Get comment from either details or comment field
-            comment_text = entry.details.get('follow_comment') if entry.details else None
-            if not comment_text and entry.comment:
-                comment_text = entry.comment
+            comment_text = entry.comment
             
             if comment_text:
                 follow_comments.append({
@@ -676,8 +651,213 @@ def get_all_follow_comments(request):
         })
         
     except Exception as e:
-        logger.error(f"Error in get_all_follow_comments: {str(e)}")
+        logger.exception("get_all_follow_comments failed")
         return Response(
             {'error': 'Failed to fetch comments', 'detail': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+
+# Longest range /tasks/recurring/occurrences/ computes in one request
+MAX_OCCURRENCE_RANGE_DAYS = 366
+
+
+def _can_manage_recurring(user):
+    return user.role in ['admin', 'staff'] or user.is_superuser
+
+
+# POST: insert, assignee lookup and M2M set, then the assignees for the response
+@query_budget(6)
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def recurring_templates(request):
+    """List visible recurring task templates; Admin/Staff: create one.
+
+    Tasks are created by manage.py materialize_recurring_tasks as occurrences
+    come within the horizon.
+    """
+    if request.method == 'POST':
+        if not _can_manage_recurring(request.user):
+            return Response({'error': 'Only Admin and Staff can create recurring tasks'},
+                            status=status.HTTP_403_FORBIDDEN)
+        serializer = RecurringTaskTemplateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    templates = RecurringTaskTemplate.objects.visible_to(request.user).prefetch_related('assignees')
+    return Response(RecurringTaskTemplateSerializer(templates, many=True).data)
+
+
+@query_budget(6)
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def recurring_template_detail(request, template_id):
+    """Get a recurring task template; Admin/Staff: update or delete it (its tasks stay)"""
+    try:
+        template = RecurringTaskTemplate.objects.visible_to(request.user).get(id=template_id)
+    except RecurringTaskTemplate.DoesNotExist:
+        return Response({'error': 'Recurring task not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method == 'GET':
+        return Response(RecurringTaskTemplateSerializer(template).data)
+    if not _can_manage_recurring(request.user):
+        return Response({'error': 'Only Admin and Staff can change recurring tasks'},
+                        status=status.HTTP_403_FORBIDDEN)
+    if request.method == 'DELETE':
+        template.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    # Already created tasks keep their details; later occurrences follow the new ones
+    serializer = RecurringTaskTemplateSerializer(template, data=request.data, partial=True)
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+    return Response(serializer.data)
+
+
+@query_budget(2)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@use_replica
+def recurring_occurrences(request):
+    """Upcoming occurrences of visible templates that aren't tasks yet, for calendars.
+
+    ?start=&end= (ISO datetimes) default to the next 30 days. Computed on the
+    fly; only occurrences inside the horizon are stored, as tasks.
+    """
+    def parse(name, default):
+        value = request.GET.get(name)
+        if not value:
+            return default
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            return None
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+    
+    start = parse('start', timezone.now())
+    end = parse('end', start + timezone.timedelta(days=30)) if start else None
+    if start is None or end is None:
+        return Response({'error': 'start and end must be ISO datetimes'}, status=status.HTTP_400_BAD_REQUEST)
+    if end < start or end - start > timezone.timedelta(days=MAX_OCCURRENCE_RANGE_DAYS):
+        return Response(
+            {'error': f'end must be after start and at most {MAX_OCCURRENCE_RANGE_DAYS} days later'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    templates = RecurringTaskTemplate.objects.visible_to(request.user).filter(is_active=True)
+    return Response({'occurrences': upcoming_occurrences(templates, start, end)})
+
+
+# The token lookup; a feed that isn't cached adds the task query, which runs
+# while the response is streamed
+@query_budget(2)
+@require_GET
+async def calendar_feed(request, token):
+    """The user's tasks as an iCalendar feed, for subscribing from calendar apps.
+
+    Authenticated by the secret token in the URL (calendar apps can't send a
+    JWT); see task/ical.py for caching.
+    """
+    user = await User.objects.filter(calendar_token=token, is_active=True).afirst()
+    if user is None:
+        return HttpResponse(status=404)
+    
+    etag = await feed_etag(user)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        body = await get_cached_feed(user, etag)
+        if body is not None:
+            response = HttpResponse(body)
+        else:
+            response = StreamingHttpResponse(stream_feed(user, etag))
+        response['Content-Type'] = 'text/calendar; charset=utf-8'
+        response['Content-Disposition'] = 'inline; filename="tasks.ics"'
+    response['ETag'] = etag
+    response['Cache-Control'] = f'private, max-age={settings.CALENDAR_FEED_TTL}'
+    return response
+
+
+@query_budget(3)
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def calendar_subscription(request):
+    """URL of the user's calendar feed; POST replaces it (the old URL stops working)"""
+    user = User.objects.only('calendar_token').get(pk=request.user.pk)
+    if request.method == 'POST' or not user.calendar_token:
+        user.calendar_token = new_calendar_token()
+        user.save(update_fields=['calendar_token'])
+    url = request.build_absolute_uri(reverse('calendar-feed', args=[user.calendar_token]))
+    return Response({'url': url})
+
+
+# Longest range /analytics/ returns in one request
+MAX_ANALYTICS_RANGE_DAYS = 366
+
+
+@query_budget(2)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@use_replica
+def analytics(request):
+    """Daily task analytics from the rollup table (manage.py rollup_task_analytics).
+
+    ?dimension=all|priority|department|assignee (default all), ?key= for one
+    priority/department/assignee email, ?start=&end= (dates) default to the
+    last 30 days. HODs see the department and assignee rows of their department.
+    """
+    user = request.user
+    dimension = request.GET.get('dimension', 'all')
+    if dimension not in dict(TaskDailyStats.DIMENSION_CHOICES):
+        return Response({'error': f'Unknown dimension "{dimension}"'}, status=status.HTTP_400_BAD_REQUEST)
+    if not (user.role in ['admin', 'staff'] or user.is_superuser):
+        if user.role != 'hod' or dimension not in ['department', 'assignee']:
+            return Response({'error': 'You do not have permission to view these analytics'},
+                            status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        end = parse_date(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+        start = parse_date(request.GET['start']) if request.GET.get('start') else end - timezone.timedelta(days=29)
+    except ValueError:
+        start = end = None
+    if start is None or end is None:
+        return Response({'error': 'start and end must be dates like 2025-01-31'}, status=status.HTTP_400_BAD_REQUEST)
+    if end < start or (end - start).days >= MAX_ANALYTICS_RANGE_DAYS:
+        return Response(
+            {'error': f'end must be after start and at most {MAX_ANALYTICS_RANGE_DAYS} days later'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    rows = TaskDailyStats.objects.filter(dimension=dimension, date__gte=start, date__lte=end)
+    if user.role == 'hod' and not user.is_superuser:
+        rows = rows.filter(department=user.department)
+    if request.GET.get('key'):
+        rows = rows.filter(key=request.GET['key'])
+    
+    results = []
+    computed_at = None
+    for row in rows.values():
+        computed_at = max(computed_at or row['computed_at'], row['computed_at'])
+        results.append({
+            'date': row['date'],
+            'key': row['key'],
+            'department': row['department'],
+            'created': row['created'],
+            'completed': row['completed'],
+            'completed_on_time': row['completed_on_time'],
+            'on_time_rate': round(row['completed_on_time'] / row['completed'], 4) if row['completed'] else None,
+            'hours_to_complete_mean': row['hours_to_complete_mean'],
+            'hours_to_complete_p90': row['hours_to_complete_p90'],
+            'overdue': row['overdue'],
+            'overdue_age_days_mean': row['overdue_age_days_mean'],
+            'overdue_age_days_p90': row['overdue_age_days_p90'],
+        })
+    return Response({
+        'dimension': dimension,
+        'start': start,
+        'end': end,
+        'computed_at': computed_at,
+        'rows': results,
+    })
@@ -1,26 +1,18 @@
-#!/bin/bash
-# Restore Script for Task Schedule Application (Linux)
-
 #!/bin/bash
 # Simple Restore Script
-# Restores database + media files from backup
+# Restores database + media files from a snapshot made by backup.sh
 
 # Show available backups if none specified
 if [ -z "$1" ]; then
     echo "Available backups:"
-    ls -dt backups/backup_* 2>/dev/null | while read backup; do echo "  $backup"; done
+    docker exec backend python manage.py snapshot --list
+    ls -dt backups/backup_* 2>/dev/null | while read backup; do echo "  $backup (old format)"; done
     echo ""
-    echo "Usage: ./restore.sh backups/backup_2026-01-20_17-34-22"
+    echo "Usage: ./restore.sh snapshot_2026-01-20_17-34-22   (or: ./restore.sh latest)"
     exit
 fi
 
-BACKUP_FOLDER=$1
-
-# Check if backup exists
-if [ ! -d "$BACKUP_FOLDER" ]; then
-    echo "Error: Backup folder not found!"
-    exit
-fi
+SNAPSHOT=$1
 
 # Confirm before restoring
 echo "WARNING: This will replace all current data!"
@@ -31,25 +23,34 @@ if [ "$confirm" != "yes" ]; then
 fi
 
 echo ""
-echo "Restoring from: $BACKUP_FOLDER"
-
-# 1. Start containers
-docker-compose up -d
-sleep 5
-
-# 2. Copy database to container
-docker cp "$BACKUP_FOLDER/database.json" backend:/app/data/restore.json
+echo "Restoring from: $SNAPSHOT"
+
+# Old backups made with dumpdata (backups/backup_<date>/database.json)
+if [ -f "$SNAPSHOT/database.json" ]; then
+    docker-compose up -d
+    sleep 5
+    docker cp "$SNAPSHOT/database.json" backend:/app/data/restore.json
+    docker exec backend python manage.py flush --no-input
+    docker exec backend python manage.py loaddata /app/data/restore.json
+    if [ -d "$SNAPSHOT/media" ]; then
+        docker cp "$SNAPSHOT/media" backend:/app/
+    fi
+    docker exec backend rm /app/data/restore.json
+    echo "Done! Data restored successfully"
+    exit
+fi
 
-# 3. Clear old data and load backup
-docker exec backend python manage.py flush --no-input
-docker exec backend python manage.py loaddata /app/data/restore.json
+# 1. Stop the application so nothing writes during the swap
+docker-compose stop backend
 
-# 4. Restore media files
-if [ -d "$BACKUP_FOLDER/media" ]; then
-    docker cp "$BACKUP_FOLDER/media" backend:/app/
-fi
+# 2. Verify the snapshot and restore database + media
+docker-compose run --rm --no-deps backend python manage.py snapshot --restore "$SNAPSHOT" || {
+    echo "Restore failed; current data left in place"
+    docker-compose up -d
+    exit 1
+}
 
-# 5. Cleanup
-docker exec backend rm /app/data/restore.json
+# 3. Start again
+docker-compose up -d
 
 echo "Done! Data restored successfully"